@@ -0,0 +1,308 @@
+"""
+Benchmark of the guards managers on generated rosters, that times every stage of the solve and writes a JSON report,
+so reports of different commits can be compared.
+
+Usage: python -m assignments_model.benchmark --guards '[50,100]' --days '[30]' --output benchmark_report.json
+"""
+import concurrent.futures
+import datetime
+import json
+import multiprocessing
+import random
+import resource
+import subprocess
+import timeit
+from typing import List, Optional, Sequence, Tuple
+
+import fire
+from pydantic import BaseModel
+
+from assignments_model.entities import HogerGuard, OfficerGuard
+from assignments_model.guards_manager import BaseGuardsManager, HogerGuardsManager, OfficerGuardsManager
+from assignments_model.mock import generate_shift_types, generate_random_shifts, generate_guards, \
+    POPULATION_TYPE_BY_GUARD_TYPE
+from assignments_model.models import GuardsAssignmentsModel
+from assignments_model.telemetry import ModelTelemetry
+from constants.constants import FairnessObjective, SCALAR
+
+MANAGERS = {
+    HogerGuardsManager.__name__: (HogerGuardsManager, HogerGuard),
+    OfficerGuardsManager.__name__: (OfficerGuardsManager, OfficerGuard),
+}
+START_DATE = datetime.date(2022, 1, 2)
+
+
+class BenchmarkScenario(BaseModel):
+    """
+    Scale of a generated roster
+    """
+    num_guards: int
+    num_days: int
+    num_shift_types: int = 2
+    restriction_density: float = 0.05  # Probability of each guard to ask not to have shifts on each date
+    holiday_probability: float = 0.03  # Probability of each date to be a holiday
+    use_default_constraints: bool = True  # Whether every model gets its default constraints, as the client sends them
+    seed: int = 0
+
+
+class ModelBenchmarkResult(BaseModel):
+    num_variables: int
+    num_constraints: int
+    build_seconds: float
+    presolve_seconds: float
+    solve_seconds: float
+    status: str
+    objective_value: Optional[float] = None
+    best_objective_bound: Optional[float] = None
+    # Mean absolute deviation of guards' scores weighted by their time in duty, comparable between objective
+    # formulations
+    weighted_score_deviation: Optional[float] = None
+    error: Optional[str] = None
+    telemetry: ModelTelemetry  # Timings and sizes of every phase and constraint of the model
+
+
+class BenchmarkResult(BaseModel):
+    manager: str
+    fairness_objective: FairnessObjective
+    scenario: BenchmarkScenario
+    weekends_model: ModelBenchmarkResult
+    regular_model: ModelBenchmarkResult
+    total_seconds: float
+    peak_memory_mb: float  # Peak resident memory of the process, including the solver's
+
+
+def generate_manager(manager_name: str,
+                     scenario: BenchmarkScenario,
+                     num_search_workers: int,
+                     fairness_objective: FairnessObjective = FairnessObjective.DIVISION) -> BaseGuardsManager:
+    """
+    Generate a roster of a given scale, and create a guards manager for it
+    :param manager_name: name of guards manager class
+    :param scenario: scale of roster
+    :param num_search_workers: number of CP-SAT workers of each model
+    :param fairness_objective: formulation of the models' objective
+    :return: guards manager
+    """
+    manager_type, guard_type = MANAGERS[manager_name]
+    rng = random.Random(scenario.seed)
+
+    shift_types = generate_shift_types(num_shift_types=scenario.num_shift_types,
+                                       population_type=POPULATION_TYPE_BY_GUARD_TYPE[guard_type],
+                                       rng=rng)
+    shifts = generate_random_shifts(start_date=START_DATE,
+                                    num_days=scenario.num_days,
+                                    shift_types=shift_types,
+                                    holiday_probability=scenario.holiday_probability,
+                                    rng=rng)
+    guards = generate_guards(num_guards=scenario.num_guards,
+                             guard_type=guard_type,
+                             restriction_dates=shifts.all_dates(),
+                             restriction_density=scenario.restriction_density,
+                             rng=rng)
+
+    manager = manager_type(guards=guards,
+                           shifts=shifts,
+                           constraints=[],
+                           num_search_workers=num_search_workers,
+                           is_pipelined=False,
+                           fairness_objective=fairness_objective)
+    if scenario.use_default_constraints:
+        for model in (manager.weekends_model, manager.regular_model):
+            model.add_constraints(model.get_default_constraints())
+    return manager
+
+
+def _time_presolve(model: GuardsAssignmentsModel) -> float:
+    """
+    Time the presolve of a built model, by solving it once with a solver that stops right after presolve
+    """
+    model.solver.parameters.stop_after_presolve = True
+    try:
+        time_before_presolve = timeit.default_timer()
+        model.solver.Solve(model.model)
+        return timeit.default_timer() - time_before_presolve
+    finally:
+        model.solver.parameters.stop_after_presolve = False
+
+
+def get_weighted_score_deviation(model: GuardsAssignmentsModel) -> float:
+    """
+    Calculate the mean absolute deviation of guards' scores weighted by their time in duty, in the solution of a model
+    """
+    weighted_scores = [
+        (terms.initial_score + sum(coefficient * model.solver.Value(var)
+                                   for var, coefficient in zip(terms.variables, terms.coefficients)))
+        / terms.time_in_duty / SCALAR
+        for terms in model._get_score_terms().values()
+    ]
+    if not weighted_scores:
+        return 0.0
+    average = sum(weighted_scores) / len(weighted_scores)
+    return sum(abs(weighted_score - average) for weighted_score in weighted_scores) / len(weighted_scores)
+
+
+def benchmark_model(model: GuardsAssignmentsModel, timeout_in_seconds: float) -> Tuple[ModelBenchmarkResult, list]:
+    """
+    Build, presolve and solve a model
+    :param model: model to benchmark
+    :param timeout_in_seconds: solve timeout
+    :return: benchmark result, and assignments of the model (empty if it wasn't solved)
+    """
+    time_before_build = timeit.default_timer()
+    model.build_model()
+    build_seconds = timeit.default_timer() - time_before_build
+
+    presolve_seconds = _time_presolve(model)
+
+    model.solver.parameters.max_time_in_seconds = timeout_in_seconds
+    assignments = []
+    error = None
+    time_before_solve = timeit.default_timer()
+    try:
+        assignments = model.solve().to_list()
+    except Exception as e:
+        error = repr(e)
+    solve_seconds = timeit.default_timer() - time_before_solve
+
+    status = model.solver.StatusName()
+    has_solution = status in ("OPTIMAL", "FEASIBLE")
+    model_proto = model.model.Proto()
+    result = ModelBenchmarkResult(
+        num_variables=len(model_proto.variables),
+        num_constraints=len(model_proto.constraints),
+        build_seconds=build_seconds,
+        presolve_seconds=presolve_seconds,
+        solve_seconds=solve_seconds,
+        status=status,
+        objective_value=model.solver.ObjectiveValue() if has_solution else None,
+        best_objective_bound=model.solver.BestObjectiveBound() if has_solution else None,
+        weighted_score_deviation=get_weighted_score_deviation(model) if has_solution else None,
+        error=error,
+        telemetry=model.telemetry
+    )
+    return result, assignments
+
+
+def benchmark_manager(manager_name: str,
+                      scenario: BenchmarkScenario,
+                      num_search_workers: int = 8,
+                      timeout_in_seconds: float = 10.0,
+                      fairness_objective: FairnessObjective = FairnessObjective.DIVISION) -> BenchmarkResult:
+    """
+    Benchmark a guards manager on a generated roster, in the current process. The weekends model is solved first and
+    its assignments are enforced on the regular model, like in BaseGuardsManager.solve()
+    :param manager_name: name of guards manager class
+    :param scenario: scale of roster
+    :param num_search_workers: number of CP-SAT workers of each model
+    :param timeout_in_seconds: solve timeout of each model
+    :param fairness_objective: formulation of the models' objective
+    :return: benchmark result
+    """
+    time_before_benchmark = timeit.default_timer()
+    manager = generate_manager(manager_name=manager_name, scenario=scenario, num_search_workers=num_search_workers,
+                               fairness_objective=fairness_objective)
+
+    weekends_result, weekends_assignments = benchmark_model(manager.weekends_model,
+                                                            timeout_in_seconds=timeout_in_seconds)
+    manager.enforce_assignments(assignments=weekends_assignments)
+    regular_result, _ = benchmark_model(manager.regular_model, timeout_in_seconds=timeout_in_seconds)
+
+    return BenchmarkResult(manager=manager_name,
+                           fairness_objective=fairness_objective,
+                           scenario=scenario,
+                           weekends_model=weekends_result,
+                           regular_model=regular_result,
+                           total_seconds=timeit.default_timer() - time_before_benchmark,
+                           # ru_maxrss is in kilobytes on Linux
+                           peak_memory_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+
+def run_benchmarks(manager_names: Sequence[str],
+                   scenarios: Sequence[BenchmarkScenario],
+                   num_search_workers: int = 8,
+                   timeout_in_seconds: float = 10.0,
+                   fairness_objectives: Sequence[FairnessObjective] = (FairnessObjective.DIVISION,)
+                   ) -> List[BenchmarkResult]:
+    """
+    Benchmark every manager with every objective formulation on every scenario. Each benchmark runs in a new
+    process, so its peak memory isn't affected by the others
+    """
+    results = []
+    for scenario in scenarios:
+        for manager_name in manager_names:
+            for fairness_objective in fairness_objectives:
+                with concurrent.futures.ProcessPoolExecutor(
+                        max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                    result = executor.submit(benchmark_manager, manager_name, scenario, num_search_workers,
+                                             timeout_in_seconds, fairness_objective).result()
+                print(f"{manager_name} ({fairness_objective.value}) {scenario}: {result.total_seconds:.3f} seconds, "
+                      f"regular model {result.regular_model.status}, "
+                      f"deviation {result.regular_model.weighted_score_deviation}")
+                results.append(result)
+    return results
+
+
+def get_git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(output: str = "benchmark_report.json",
+         guards: Sequence[int] = (30, 100),
+         days: Sequence[int] = (30,),
+         shift_types: Sequence[int] = (2,),
+         restriction_density: float = 0.05,
+         holiday_probability: float = 0.03,
+         use_default_constraints: bool = True,
+         seed: int = 0,
+         managers: Sequence[str] = tuple(MANAGERS),
+         num_search_workers: int = 8,
+         timeout_in_seconds: float = 10.0,
+         fairness_objectives: Sequence[str] = tuple(FairnessObjective)):
+    """
+    Benchmark managers on every combination of scales, and write a JSON report
+    :param output: path of JSON report
+    :param guards: numbers of guards
+    :param days: numbers of days
+    :param shift_types: numbers of shift types
+    :param restriction_density: probability of each guard to ask not to have shifts on each date
+    :param holiday_probability: probability of each date to be a holiday
+    :param use_default_constraints: whether every model gets its default constraints
+    :param seed: seed of generated rosters
+    :param managers: names of guards managers to benchmark
+    :param num_search_workers: number of CP-SAT workers of each model
+    :param timeout_in_seconds: solve timeout of each model
+    :param fairness_objectives: objective formulations to compare
+    """
+    scenarios = [BenchmarkScenario(num_guards=num_guards,
+                                   num_days=num_days,
+                                   num_shift_types=num_shift_types,
+                                   restriction_density=restriction_density,
+                                   holiday_probability=holiday_probability,
+                                   use_default_constraints=use_default_constraints,
+                                   seed=seed)
+                 for num_guards in guards
+                 for num_days in days
+                 for num_shift_types in shift_types]
+
+    results = run_benchmarks(manager_names=managers,
+                             scenarios=scenarios,
+                             num_search_workers=num_search_workers,
+                             timeout_in_seconds=timeout_in_seconds,
+                             fairness_objectives=[FairnessObjective(objective) for objective in fairness_objectives])
+
+    report = {
+        "created_at": datetime.datetime.now().isoformat(),
+        "git_commit": get_git_commit(),
+        "num_search_workers": num_search_workers,
+        "timeout_in_seconds": timeout_in_seconds,
+        "results": [result.dict() for result in results],
+    }
+    with open(output, "w") as report_file:
+        json.dump(report, report_file, indent=4)
+
+
+if __name__ == '__main__':
+    fire.Fire(main)
@@ -2,8 +2,9 @@ from __future__ import annotations
 
 from abc import abstractmethod, ABCMeta
 from datetime import datetime, timedelta
-from typing import List, TYPE_CHECKING, Union, Iterable, Literal
+from typing import List, TYPE_CHECKING, Union, Iterable, Literal, Tuple
 
+from ortools.sat.python.cp_model import IntVar
 from pydantic.main import BaseModel
 
 from assignments_model.entities import Shift, OfficerGuard, BaseGuard
@@ -35,6 +36,15 @@ class BaseConstraint(BaseModel, metaclass=ABCMeta):
         """
         raise NotImplementedError
 
+    def get_ineligible_pairs(self, model: GuardsAssignmentsModel) -> Iterable[Tuple[Shift, BaseGuard]]:
+        """
+        Get (shift, guard) pairs that current constraint never allows to assign, so the model can avoid creating
+        variables for them. Called before the model's variables exist, so only model's shifts and guards can be used
+        :param model: a guards assignment model
+        :return: (shift, guard) pairs that can't be assigned
+        """
+        return []
+
 
 class GuardsPerShiftConstraint(BaseConstraint):
     """
@@ -43,14 +53,14 @@ class GuardsPerShiftConstraint(BaseConstraint):
     name: Literal["GuardsPerShiftConstraint"] = "GuardsPerShiftConstraint"
     guards_per_shift: int
 
-    def __calc_sum(self, model: GuardsAssignmentsModel, shift: Shift) -> int:
+    def __get_vars(self, model: GuardsAssignmentsModel, shift: Shift) -> List[IntVar]:
         """
-        Calculates the sum of guards of a given shift
+        Gets the assignment variables of guards for a given shift
         :param model:   the assignments model
-        :param shift:   the shift to perform the calculation on
-        :return:        the sum of guards of the given shift
+        :param shift:   the shift to get the variables for
+        :return:        the assignment variables of guards for the given shift
         """
-        return sum(model.assignment_vars[(shift, guard)] for guard in model.guards)
+        return model.get_shift_vars(shift)
 
     def validate_parameters(self):
         if self.guards_per_shift < 1:
@@ -58,8 +68,10 @@ class GuardsPerShiftConstraint(BaseConstraint):
 
     def apply_constraint(self, model: GuardsAssignmentsModel):
         for shift in model.shifts:
-            model.model.Add(self.__calc_sum(model, shift) == self.guards_per_shift) \
-                .OnlyEnforceIf(model.infeasibility_debug_var())
+            model.add_bounded_sum_constraint(self.__get_vars(model, shift),
+                                             lower_bound=self.guards_per_shift,
+                                             upper_bound=self.guards_per_shift,
+                                             shift=shift)
 
 
 class ShiftsPerGuardPerDayConstraint(BaseConstraint):
@@ -70,15 +82,15 @@ class ShiftsPerGuardPerDayConstraint(BaseConstraint):
     min_shifts_per_day: int
     max_shifts_per_day: int
 
-    def __calc_sum(self, model: GuardsAssignmentsModel, guard: BaseGuard, day: datetime.date) -> int:
+    def __get_vars(self, model: GuardsAssignmentsModel, guard: BaseGuard, day: datetime.date) -> List[IntVar]:
         """
-        Calculates the sum of shifts for a given guard in a given day
+        Gets the assignment variables of shifts for a given guard in a given day
         :param model:   the assignments model
-        :param guard:   the guard to calculate the number of shifts for
-        :param day:     the day to perform the calculation on
-        :return:        the sum of shifts for the given guard in the given day
+        :param guard:   the guard to get the variables for
+        :param day:     the day to get the variables for
+        :return:        the assignment variables of shifts for the given guard in the given day
         """
-        return sum(model.assignment_vars[(shift, guard)] for shift in model.shifts.find(date=day))
+        return model.guard_vars_by_date[guard].get(day, [])
 
     def validate_parameters(self):
         if self.min_shifts_per_day < 0:
@@ -90,13 +102,14 @@ class ShiftsPerGuardPerDayConstraint(BaseConstraint):
                              f"than min_shifts_per_day ({self.min_shifts_per_day}")
 
     def apply_constraint(self, model: GuardsAssignmentsModel):
-        for day in set(shift.date for shift in model.shifts):
-            for guard in model.guards:
-                calculated_sum = self.__calc_sum(model, guard, day)
-                model.model.Add(calculated_sum <= self.max_shifts_per_day).OnlyEnforceIf(
-                    model.infeasibility_debug_var())
-                model.model.Add(calculated_sum >= self.min_shifts_per_day).OnlyEnforceIf(
-                    model.infeasibility_debug_var())
+        for guard in model.guards:
+            # Without a minimum, days on which the guard has no eligible shifts can't violate the constraint
+            days = model.shifts_by_date if self.min_shifts_per_day > 0 else model.guard_vars_by_date[guard]
+            for day in days:
+                model.add_bounded_sum_constraint(self.__get_vars(model, guard, day),
+                                                 lower_bound=self.min_shifts_per_day,
+                                                 upper_bound=self.max_shifts_per_day,
+                                                 guard=guard)
 
 
 class ShiftsPerGuardPerMonthConstraint(BaseConstraint):
@@ -108,15 +121,15 @@ class ShiftsPerGuardPerMonthConstraint(BaseConstraint):
     max_shifts_per_month: int
     shifts_query: Union[ShiftQuery, UnionQuery] = ShiftQuery()
 
-    def __calc_sum(self, model: GuardsAssignmentsModel, guard: BaseGuard, shifts: Iterable[Shift]) -> int:
+    def __get_vars(self, model: GuardsAssignmentsModel, guard: BaseGuard, shifts: Iterable[Shift]) -> List[IntVar]:
         """
-        Calculates the sum of given shifts for a given guard over a month
+        Gets the assignment variables of given shifts for a given guard over a month
         :param model:   the assignments model
-        :param guard:   the guard to calculate the number of shifts for
+        :param guard:   the guard to get the variables for
         :param shifts:  pool of shifts
-        :return:        the sum of shifts for the given guard over a month
+        :return:        the assignment variables of given shifts for the given guard over a month
         """
-        return sum(model.assignment_vars[(shift, guard)] for shift in shifts)
+        return model.get_guard_vars(guard, shifts)
 
     def validate_parameters(self):
         if self.min_shifts_per_month < 0:
@@ -131,9 +144,10 @@ class ShiftsPerGuardPerMonthConstraint(BaseConstraint):
         shifts = self.shifts_query.evaluate(model.shifts)
 
         for guard in model.guards:
-            calculated_sum = self.__calc_sum(model, guard, shifts)
-            model.model.Add(calculated_sum <= self.max_shifts_per_month).OnlyEnforceIf(model.infeasibility_debug_var())
-            model.model.Add(calculated_sum >= self.min_shifts_per_month).OnlyEnforceIf(model.infeasibility_debug_var())
+            model.add_bounded_sum_constraint(self.__get_vars(model, guard, shifts),
+                                             lower_bound=self.min_shifts_per_month,
+                                             upper_bound=self.max_shifts_per_month,
+                                             guard=guard)
 
 
 class SpecificDayPerGuardPerMonthConstraint(BaseConstraint):
@@ -145,14 +159,14 @@ class SpecificDayPerGuardPerMonthConstraint(BaseConstraint):
     max_days_per_month: int
     day: Weekday
 
-    def __calc_sum(self, model: GuardsAssignmentsModel, guard: BaseGuard) -> int:
+    def __get_vars(self, model: GuardsAssignmentsModel, guard: BaseGuard) -> List[IntVar]:
         """
-        Calculates the sum of shifts that occur in a specific day for a given guard over a month
+        Gets the assignment variables of shifts that occur in a specific day for a given guard over a month
         :param model:   the assignments model
-        :param guard:   the guard to calculate the number of shifts for
-        :return:        the sum of shifts that occur in a specific day for the given guard over a month
+        :param guard:   the guard to get the variables for
+        :return:        the assignment variables of shifts that occur in a specific day for the given guard
         """
-        return sum(model.assignment_vars[(shift, guard)] for shift in model.shifts if shift.date.weekday() == self.day)
+        return model.get_guard_vars(guard, model.shifts.find(weekdays=(self.day,)))
 
     def validate_parameters(self):
         if self.min_days_per_month < 0:
@@ -165,9 +179,10 @@ class SpecificDayPerGuardPerMonthConstraint(BaseConstraint):
 
     def apply_constraint(self, model: GuardsAssignmentsModel):
         for guard in model.guards:
-            calculated_sum = self.__calc_sum(model, guard)
-            model.model.Add(calculated_sum <= self.max_days_per_month).OnlyEnforceIf(model.infeasibility_debug_var())
-            model.model.Add(calculated_sum >= self.min_days_per_month).OnlyEnforceIf(model.infeasibility_debug_var())
+            model.add_bounded_sum_constraint(self.__get_vars(model, guard),
+                                             lower_bound=self.min_days_per_month,
+                                             upper_bound=self.max_days_per_month,
+                                             guard=guard)
 
 
 class SpecificDayPerGuardPerMonthWithHistoryConstraint(SpecificDayPerGuardPerMonthConstraint):
@@ -196,17 +211,17 @@ class NoSpecificDayAfterSpecificDayConstraint(BaseConstraint):
     second_day: Weekday
     day_interval: int
 
-    def __calc_sum(self, model: GuardsAssignmentsModel, guard: BaseGuard,
-                   first_day_and_second_day_shifts: Iterable[Shift]) -> int:
+    def __get_vars(self, model: GuardsAssignmentsModel, guard: BaseGuard,
+                   first_day_and_second_day_shifts: Iterable[Shift]) -> List[IntVar]:
         """
-        Calculates the sum of shifts in two subsequent specific days for a given guard over a month
+        Gets the assignment variables of shifts in two subsequent specific days for a given guard over a month
         :param model:                           the assignments model
-        :param guard:                           the guard to calculate the number of shifts for
+        :param guard:                           the guard to get the variables for
         :param first_day_and_second_day_shifts: the shifts in the 1st group the are before shift in the 2nd group
-        :return:                                the sum of shifts in two subsequent specific days for the given guard
-                                                over a month
+        :return:                                the assignment variables of shifts in two subsequent specific days for
+                                                the given guard over a month
         """
-        return sum(model.assignment_vars[shift, guard] for shift in first_day_and_second_day_shifts)
+        return model.get_guard_vars(guard, first_day_and_second_day_shifts)
 
     def validate_parameters(self):
         if self.day_interval < 0:
@@ -223,7 +238,10 @@ class NoSpecificDayAfterSpecificDayConstraint(BaseConstraint):
                 weekdays=(self.second_day,)
             )
             for guard in model.guards:
-                model.model.Add(self.__calc_sum(model, guard, first_day_and_second_day_shifts) <= 1)
+                model.add_bounded_sum_constraint(self.__get_vars(model, guard, first_day_and_second_day_shifts),
+                                                 lower_bound=0,
+                                                 upper_bound=1,
+                                                 guard=guard)
 
 
 class NoSpecificShiftsAfterSpecificShiftsConstraint(BaseConstraint):
@@ -235,20 +253,19 @@ class NoSpecificShiftsAfterSpecificShiftsConstraint(BaseConstraint):
     second_shifts_query: Union[ShiftQuery, UnionQuery]
     day_interval: int
 
-    def __calc_sum(self, model: GuardsAssignmentsModel, guard: BaseGuard,
+    def __get_vars(self, model: GuardsAssignmentsModel, guard: BaseGuard,
                    first_event_shifts: List[Shift],
-                   second_event_shifts: List[Shift]):
+                   second_event_shifts: List[Shift]) -> List[IntVar]:
         """
-        Calculates the sum of shifts in two guarding group for a given guard over a month
+        Gets the assignment variables of shifts in two guarding group for a given guard over a month
         :param model:                           the assignments model
-        :param guard:                           the guard to calculate the number of shifts for
+        :param guard:                           the guard to get the variables for
         :param first_event_shifts:     the shifts in the 1st group the are before shift in the 2nd group
         :param second_event_shifts:    the shifts in the 2st group the are after shift in the 1nd group
-        :return:                                the sum of shifts of a specific guarding group for the given guard over
-                                                a month
+        :return:                                the assignment variables of shifts of a specific guarding group for
+                                                the given guard over a month
         """
-        return sum(model.assignment_vars[shift, guard] for shift in
-                   first_event_shifts + second_event_shifts)
+        return model.get_guard_vars(guard, first_event_shifts + second_event_shifts)
 
     def validate_parameters(self):
         if self.day_interval < 0:
@@ -256,22 +273,28 @@ class NoSpecificShiftsAfterSpecificShiftsConstraint(BaseConstraint):
 
     def apply_constraint(self, model: GuardsAssignmentsModel):
         first_event_shifts = self.first_shifts_query.evaluate(model.shifts)
+        second_event_shifts = self.second_shifts_query.evaluate(model.shifts)
         first_event_shifts_dates = set(shift.date for shift in first_event_shifts)
 
         for first_event_shift_date in first_event_shifts_dates:
-            second_event_after_first_event_shifts = self.second_shifts_query.evaluate(model.shifts).find(
+            second_event_after_first_event_shifts = second_event_shifts.find(
                 date=first_event_shift_date + timedelta(days=self.day_interval)
             ).to_list()
 
             if second_event_after_first_event_shifts:
-                first_event_before_second_event_shifts = self.first_shifts_query.evaluate(
-                    model.shifts.find(date=first_event_shift_date)
+                first_event_before_second_event_shifts = first_event_shifts.find(
+                    date=first_event_shift_date
                 ).to_list()
 
                 if first_event_before_second_event_shifts:
                     for guard in model.guards:
-                        model.model.Add(self.__calc_sum(model, guard, first_event_before_second_event_shifts,
-                                                        second_event_after_first_event_shifts) <= 1)
+                        model.add_bounded_sum_constraint(
+                            self.__get_vars(model, guard, first_event_before_second_event_shifts,
+                                            second_event_after_first_event_shifts),
+                            lower_bound=0,
+                            upper_bound=1,
+                            guard=guard
+                        )
 
 
 class SpecificShiftsInServiceConstraint(BaseConstraint):
@@ -287,19 +310,24 @@ class SpecificShiftsInServiceConstraint(BaseConstraint):
         if self.max_shifts_in_service < 0:
             raise ValueError(f"Invalid argument: max_shifts_in_service ({self.max_shifts_in_service}) is < 0")
 
-    def apply_constraint(self, model: GuardsAssignmentsModel):
+    def get_ineligible_pairs(self, model: GuardsAssignmentsModel) -> Iterable[Tuple[Shift, BaseGuard]]:
         current_specific_shifts = self.shifts_query.evaluate(model.shifts)
 
         for guard in model.guards:
             # Number of old shifts that answer criteria
             number_of_old_specific_shifts = len(self.shifts_query.evaluate(guard.previous_shifts))
 
-            # For every shift in current period, make sure it won't exceed the maximum of shifts
-            # of that kind that are allowed during service
+            # Guards that have reached the maximum of shifts of that kind that are allowed during service
+            # can't be assigned to any of them in current period
             if number_of_old_specific_shifts >= self.max_shifts_in_service:
                 for shift in current_specific_shifts:
-                    model.model.Add(model.assignment_vars[shift, guard] == 0) \
-                        .OnlyEnforceIf(model.infeasibility_debug_var())
+                    yield shift, guard
+
+    def apply_constraint(self, model: GuardsAssignmentsModel):
+        # Pairs are usually excluded before variables are created, this only covers variables that already existed
+        for shift, guard in self.get_ineligible_pairs(model):
+            model.add_bounded_sum_constraint(model.get_guard_vars(guard, (shift,)), lower_bound=0, upper_bound=0,
+                                             guard=guard, shift=shift)
 
 
 class LimitRealOfficerGuardingGroupPerMonthConstraint(BaseConstraint):
@@ -321,18 +349,21 @@ class LimitRealOfficerGuardingGroupPerMonthConstraint(BaseConstraint):
             raise ValueError(f"Invalid arguments: max_shifts_in_service ({self.max_shift_per_month}) is less "
                              f"than min_shift_per_month ({self.min_shift_per_month})")
 
-    def __calc_sum(self, model: Union[UnifiedScoreRegularModel, UnifiedScoreWeekendsModel], guard: OfficerGuard) -> int:
+    def __get_vars(self, model: Union[UnifiedScoreRegularModel, UnifiedScoreWeekendsModel],
+                   guard: OfficerGuard) -> List[IntVar]:
         """
-        Calculates the sum of shifts in a guarding group for real officers
+        Gets the assignment variables of shifts in a guarding group for real officers
         :param model:                           the assignments model
-        :param guard:                           the guard to calculate the number of shifts for
+        :param guard:                           the guard to get the variables for
         """
-        return sum(model.assignment_vars[shift, guard] for shift in self.shifts_query.evaluate(model.shifts))
+        return model.get_guard_vars(guard, self.shifts_query.evaluate(model.shifts))
 
     def apply_constraint(self, model: Union[UnifiedScoreRegularModel, UnifiedScoreWeekendsModel]):
         for guard in model.guards.find(has_done_bhd1=True):
-            model.model.Add(self.__calc_sum(model, guard) >= self.min_shift_per_month)
-            model.model.Add(self.__calc_sum(model, guard) <= self.max_shift_per_month)
+            model.add_bounded_sum_constraint(self.__get_vars(model, guard),
+                                             lower_bound=self.min_shift_per_month,
+                                             upper_bound=self.max_shift_per_month,
+                                             guard=guard)
 
 
 class LimitOnlyOneHolidayInService(BaseConstraint):
@@ -345,14 +376,23 @@ class LimitOnlyOneHolidayInService(BaseConstraint):
     def validate_parameters(self):
         pass
 
-    def __calc_sum(self, model: Union[UnifiedScoreRegularModel, UnifiedScoreWeekendsModel], guard: BaseGuard) -> int:
+    def __get_vars(self, model: Union[UnifiedScoreRegularModel, UnifiedScoreWeekendsModel],
+                   guard: BaseGuard) -> List[IntVar]:
         """
-        Calculates the sum of shifts in a guarding group for real officers
+        Gets the assignment variables of holiday shifts for a given guard
         :param model:                           the assignments model
-        :param guard:                           the guard to calculate the number of shifts for
+        :param guard:                           the guard to get the variables for
         """
-        return sum(model.assignment_vars[shift, guard] for shift in model.shifts.find(is_holiday=True))
+        return model.get_guard_vars(guard, model.shifts.find(is_holiday=True))
+
+    def get_ineligible_pairs(self, model: Union[UnifiedScoreRegularModel, UnifiedScoreWeekendsModel]) \
+            -> Iterable[Tuple[Shift, BaseGuard]]:
+        holiday_shifts = model.shifts.find(is_holiday=True)
+        for guard in model.guards.find(has_done_holiday=True):
+            for shift in holiday_shifts:
+                yield shift, guard
 
     def apply_constraint(self, model: Union[UnifiedScoreRegularModel, UnifiedScoreWeekendsModel]):
         for guard in model.guards.find(has_done_holiday=True):
-            model.model.Add(self.__calc_sum(model, guard) == 0)
+            model.add_bounded_sum_constraint(self.__get_vars(model, guard), lower_bound=0, upper_bound=0,
+                                             guard=guard)
@@ -0,0 +1,93 @@
+"""
+Explanation of infeasible models: every constraint instance of a model is enforced by its own assumption literal, so
+CP-SAT can point at a small set of constraints that can't hold together
+"""
+import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from beanie import PydanticObjectId
+from ortools.sat.python import cp_model
+from ortools.sat.python.cp_model import IntVar
+from pydantic import BaseModel
+
+from assignments_model.constraints import BaseConstraint
+from assignments_model.entities import BaseGuard, Shift
+
+# Sources of constraints that the models add by themselves
+RESTRICTION_SOURCE = "Restriction"
+ENFORCED_ASSIGNMENT_SOURCE = "EnforcedAssignment"
+OBJECTIVE_SOURCE = "Objective"
+
+ConstraintSource = Union[BaseConstraint, str]
+
+
+class ConflictingConstraint(BaseModel):
+    """
+    A constraint instance that is part of a conflict
+    """
+    constraint: str  # Name of constraint class, or of a constraint that the model adds by itself
+    parameters: Dict[str, Any] = {}
+    guard_id: Optional[PydanticObjectId] = None
+    guard_name: Optional[str] = None
+    shift_id: Optional[PydanticObjectId] = None
+    shift_date: Optional[datetime.date] = None
+    shift_type: Optional[str] = None
+
+
+class ConstraintAssumptions:
+    """
+    Assumption literals of a model's constraint instances. An instance is identified by its source (constraint
+    object or name) and the guard and shift it was added for, and all of its constraints share a single literal
+    """
+
+    def __init__(self, model: cp_model.CpModel):
+        self.model = model
+        self._literals: Dict[Tuple[Any, Optional[BaseGuard], Optional[Shift]], IntVar] = {}
+        self._instances: Dict[int, Tuple[ConstraintSource, Optional[BaseGuard], Optional[Shift]]] = {}
+
+    def get_literal(self,
+                    source: ConstraintSource,
+                    guard: Optional[BaseGuard] = None,
+                    shift: Optional[Shift] = None) -> IntVar:
+        """
+        Get the assumption literal of a constraint instance, creating it on first use
+        :param source: constraint object, or name of a constraint that the model adds by itself
+        :param guard: guard that the constraint was added for
+        :param shift: shift that the constraint was added for
+        :return: literal that enforces the constraint instance
+        """
+        # Constraints are pydantic models, which aren't hashable, so they are identified by object
+        key = (source if isinstance(source, str) else id(source), guard, shift)
+        literal = self._literals.get(key)
+        if literal is None:
+            literal = self.model.NewBoolVar('')
+            self.model.AddAssumption(literal)
+            self._literals[key] = literal
+            self._instances[literal.Index()] = (source, guard, shift)
+        return literal
+
+    def get_conflicts(self, literal_indices: List[int]) -> List[ConflictingConstraint]:
+        """
+        Describe the constraint instances of given assumption literals
+        :param literal_indices: indices of assumption literals, as returned by SufficientAssumptionsForInfeasibility()
+        :return: conflicting constraint instances
+        """
+        conflicts = []
+        for index in literal_indices:
+            if index not in self._instances:
+                continue
+            source, guard, shift = self._instances[index]
+            conflict = ConflictingConstraint(constraint=source) if isinstance(source, str) else \
+                ConflictingConstraint(constraint=type(source).__name__, parameters=source.dict(exclude={"name"}))
+            if guard is not None:
+                conflict.guard_id = guard.id_
+                conflict.guard_name = guard.name
+            if shift is not None:
+                conflict.shift_id = shift.id_
+                conflict.shift_date = shift.date
+                conflict.shift_type = shift.shift_type.name
+            conflicts.append(conflict)
+        return conflicts
+
+    def __len__(self):
+        return len(self._literals)
@@ -1,13 +1,16 @@
 import abc
+import bisect
 import datetime
-from typing import List, Optional, Tuple, Iterable
+from collections import defaultdict
+from typing import List, Optional, Tuple, Iterable, Dict, Set, Hashable
 
 import numpy as np
 import pandas as pd
 import tabulate
 from beanie import PydanticObjectId
 
-from assignments_model.utils.date_utils import iter_dates, parse_date_restrictions
+from assignments_model.telemetry import ModelTelemetry
+from assignments_model.utils.date_utils import parse_date_restrictions
 from models.shift_type import ShiftTypeModel
 from models.score import DayTypeEnum, ScoreDeltaModel, ScoreModel
 
@@ -85,6 +88,71 @@ class BaseCollection(abc.ABC):
     def __len__(self):
         raise NotImplementedError
 
+    def get_query_cache(self) -> Optional[Dict[Hashable, 'BaseCollection']]:
+        """
+        Get a mapping for memoizing query results over this collection, which must be cleared whenever the
+        collection changes
+        :return: query results cache, or None if results over this collection shouldn't be memoized
+        """
+        return None
+
+
+class _ShiftIndex:
+    """
+    Lookup tables over a fixed snapshot of shifts, used to answer ShiftCollection.find() without a linear scan
+
+    Every table maps a key to the positions of matching shifts in the snapshot, so results of several lookups can be
+    intersected and then returned in the snapshot's original order.
+    """
+
+    def __init__(self, shifts: Iterable[Shift]):
+        self.shifts: Tuple[Shift, ...] = tuple(shifts)
+        self.positions_by_date: Dict[datetime.date, List[int]] = defaultdict(list)
+        self.positions_by_shift_type: Dict[str, Set[int]] = defaultdict(set)
+        self.positions_by_weekday: Dict[int, Set[int]] = defaultdict(set)
+        self.positions_by_day_type: Dict[DayTypeEnum, Set[int]] = defaultdict(set)
+        self.positions_by_is_holiday: Dict[bool, Set[int]] = defaultdict(set)
+
+        for position, shift in enumerate(self.shifts):
+            self.positions_by_date[shift.date].append(position)
+            self.positions_by_shift_type[shift.shift_type.name].add(position)
+            self.positions_by_weekday[shift.date.weekday()].add(position)
+            self.positions_by_day_type[shift.day_type].add(position)
+            self.positions_by_is_holiday[shift.is_holiday].add(position)
+
+        # Sorted distinct dates, for range lookups with bisect
+        self.dates: List[datetime.date] = sorted(self.positions_by_date)
+
+    def positions_in_date_range(self,
+                                start_date: Optional[datetime.date],
+                                end_date: Optional[datetime.date]) -> Set[int]:
+        """
+        Get positions of all shifts that take place between two dates (inclusive)
+        :param start_date: starting date of range, or None for an unbounded start
+        :param end_date: ending date of range, or None for an unbounded end
+        :return: positions of shifts in range
+        """
+        low = 0 if start_date is None else bisect.bisect_left(self.dates, start_date)
+        high = len(self.dates) if end_date is None else bisect.bisect_right(self.dates, end_date)
+
+        positions = set()
+        for date in self.dates[low:high]:
+            positions.update(self.positions_by_date[date])
+        return positions
+
+    @staticmethod
+    def positions_by_keys(table: Dict, keys: Iterable) -> Set[int]:
+        """
+        Get positions of all shifts that match any of the given keys in a lookup table
+        :param table: lookup table from key to positions
+        :param keys: keys to look up
+        :return: union of positions of all given keys
+        """
+        positions = set()
+        for key in set(keys):
+            positions.update(table.get(key, ()))
+        return positions
+
 
 class ShiftCollection(BaseCollection):
     """
@@ -93,9 +161,20 @@ class ShiftCollection(BaseCollection):
 
     def __init__(self, shifts: Optional[Iterable[Shift]] = None):
         if shifts is None:
-            self.shifts = []
+            self._shifts: List[Shift] = []
         else:
-            self.shifts: List[Shift] = list(shifts)
+            self._shifts: List[Shift] = list(shifts)
+        self._index: Optional[_ShiftIndex] = None
+        self._query_cache: Dict[Hashable, 'ShiftCollection'] = {}
+
+    @property
+    def shifts(self) -> List[Shift]:
+        return self._shifts
+
+    @shifts.setter
+    def shifts(self, shifts: List[Shift]):
+        self._shifts = shifts
+        self._invalidate_index()
 
     @classmethod
     def from_df(cls, shifts_table: pd.DataFrame):
@@ -109,12 +188,39 @@ class ShiftCollection(BaseCollection):
             )
         return cls(shifts=shifts)
 
+    def _get_index(self) -> _ShiftIndex:
+        """
+        Get lookup index of the collection, building it on first use after every modification
+        :return: lookup index of current shifts
+        """
+        if self._index is None:
+            self._index = _ShiftIndex(self._shifts)
+        return self._index
+
+    def _invalidate_index(self):
+        """
+        Drop lookup index and memoized query results, should be called whenever the list of shifts is modified
+        """
+        self._index = None
+        self._query_cache = {}
+
+    def get_query_cache(self) -> Dict[Hashable, 'ShiftCollection']:
+        return self._query_cache
+
     def all_dates(self):
         """
         Return set of all relevant dates to given shifts
         :return: set of all relevant dates to given shifts
         """
-        return set(shift.date for shift in self.shifts)
+        return set(self._get_index().dates)
+
+    def group_by_date(self) -> Dict[datetime.date, List[Shift]]:
+        """
+        Group shifts by their dates
+        :return: mapping of each date (in ascending order) to the shifts that take place on it
+        """
+        index = self._get_index()
+        return {date: [index.shifts[position] for position in index.positions_by_date[date]] for date in index.dates}
 
     def find(self,
              *,
@@ -137,50 +243,66 @@ class ShiftCollection(BaseCollection):
         :return: list of shifts that fit all criteria
         """
 
-        if not self.shifts:
+        if not self._shifts:
             return ShiftCollection()
         if date is not None and start_date is None and end_date is None:
             start_date = date
             end_date = date
-        elif start_date is None:
-            start_date = min(self.all_dates())
-        if end_date is None:
-            end_date = max(self.all_dates())
 
-        found_shifts = [shift for shift in self.shifts
-                        if shift.date in iter_dates(start_date=start_date, end_date=end_date)]
+        index = self._get_index()
+        candidates: List[Set[int]] = []
+
+        if start_date is not None and end_date is not None and start_date == end_date:
+            candidates.append(set(index.positions_by_date.get(start_date, ())))
+        elif start_date is not None or end_date is not None:
+            candidates.append(index.positions_in_date_range(start_date=start_date, end_date=end_date))
 
         if shift_types is not None:
-            found_shifts = [shift for shift in found_shifts if shift.shift_type.name in shift_types]
+            candidates.append(index.positions_by_keys(index.positions_by_shift_type, shift_types))
 
         if day_types is not None:
-            found_shifts = [shift for shift in found_shifts if shift.day_type in day_types]
+            candidates.append(index.positions_by_keys(index.positions_by_day_type, day_types))
 
         if weekdays is not None:
-            found_shifts = [shift for shift in found_shifts if shift.date.weekday() in weekdays]
+            candidates.append(index.positions_by_keys(index.positions_by_weekday, weekdays))
 
         if is_holiday is not None:
-            found_shifts = [shift for shift in found_shifts if shift.is_holiday == is_holiday]
+            candidates.append(index.positions_by_keys(index.positions_by_is_holiday, (is_holiday,)))
+
+        if not candidates:
+            return ShiftCollection(index.shifts)
+
+        # Intersect starting from the smallest hit set
+        candidates.sort(key=len)
+        found_positions = candidates[0].intersection(*candidates[1:])
 
-        return ShiftCollection(found_shifts)
+        return ShiftCollection(index.shifts[position] for position in sorted(found_positions))
 
     def append(self, shift: Shift):
-        self.shifts.append(shift)
+        self._shifts.append(shift)
+        self._invalidate_index()
+
+    def sort(self, **kwargs):
+        """
+        Sort shifts in place, accepts the same arguments as list.sort()
+        """
+        self._shifts.sort(**kwargs)
+        self._invalidate_index()
 
     def to_list(self):
-        return self.shifts
+        return self._shifts
 
     def __getitem__(self, key):
-        return self.shifts[key]
+        return self._shifts[key]
 
     def __iter__(self):
-        return iter(self.shifts)
+        return iter(self._shifts)
 
     def __add__(self, other: 'ShiftCollection'):
-        return ShiftCollection(set(self.shifts + other.shifts))
+        return ShiftCollection(dict.fromkeys(self._shifts + other.shifts))
 
     def __len__(self):
-        return len(self.shifts)
+        return len(self._shifts)
 
 
 class BaseGuard(abc.ABC):
@@ -201,7 +323,7 @@ class BaseGuard(abc.ABC):
         if self.previous_shifts is None:
             self.previous_shifts = ShiftCollection()
 
-        self.previous_shifts.shifts.sort(key=lambda shift: shift.date)
+        self.previous_shifts.sort(key=lambda shift: shift.date)
 
     def last_weekend(self) -> Optional[Shift]:
         """
@@ -277,7 +399,7 @@ class BaseGuardCollection(BaseCollection):
         return iter(self.guards)
 
     def __add__(self, other: 'BaseGuardCollection'):
-        return BaseGuardCollection(set(self.guards + other.guards))
+        return BaseGuardCollection(dict.fromkeys(self.guards + other.guards))
 
     def __len__(self):
         return len(self.guards)
@@ -383,12 +505,11 @@ class UnifiedScoreGuardCollection(BaseGuardCollection):
         return UnifiedScoreGuardCollection(guards)
 
     def print_table(self):
-        headers = ["Name", "Weighted Score", "Weighted Weekend Score", "Months on Duty", "Pazam Level", "Regular Score",
-                   "Weekend Score", "Update"]
+        headers = ["Name", "Weighted Score", "Weighted Weekend Score", "Months on Duty", "Score Multiplier",
+                   "Regular Score", "Weekend Score"]
         formatted_list = [
             [guard.name, f'{guard.weighted_regular_score():.3f}', f'{guard.weighted_weekend_score():.3f}',
-             guard.time_in_duty, guard.pazam_level, guard.regular_score, guard.weekend_score,
-             ("+" + str(guard.regular_score - guard.previous_regular_score)) if guard.previous_regular_score else ""]
+             guard.time_in_duty, guard.score_multiplier, guard.score.regular_score, guard.score.weekend_score]
             for guard in sorted(self.guards, key=lambda g: g.weighted_regular_score(), reverse=True)
         ]
         print(tabulate.tabulate(formatted_list, headers=headers))
@@ -396,7 +517,7 @@ class UnifiedScoreGuardCollection(BaseGuardCollection):
         print()
 
     def __add__(self, other: 'UnifiedScoreGuardCollection'):
-        return UnifiedScoreGuardCollection(set(self.guards + other.guards))
+        return UnifiedScoreGuardCollection(dict.fromkeys(self.guards + other.guards))
 
 
 class OfficerGuardCollection(UnifiedScoreGuardCollection):
@@ -462,11 +583,18 @@ class AssignmentCollection:
     Collection of Assignment objects
     """
 
-    def __init__(self, assignments: Optional[List[Assignment]] = None):
+    def __init__(self,
+                 assignments: Optional[List[Assignment]] = None,
+                 telemetry: Optional[List[ModelTelemetry]] = None):
+        """
+        :param assignments: list of assignments
+        :param telemetry: telemetry of the models that were solved to get the assignments, in order of solving
+        """
         if assignments is None:
             self.assignments = []
         else:
             self.assignments: List[Assignment] = list(assignments)
+        self.telemetry: List[ModelTelemetry] = telemetry or []
 
     def to_df(self):
         df = pd.DataFrame([assignment.to_dict() for assignment in self.assignments])
@@ -482,7 +610,7 @@ class AssignmentCollection:
              assignment.guard.name,
              assignment.shift.shift_type.name,
              "YES" if assignment.shift.is_holiday else "",
-             f"+" + str(assignment.guard.calculate_regular_score_for_shift(assignment.shift))]
+             assignment.guard.calculate_score_for_shift(assignment.shift)]
             for assignment in self.assignments  # if assignment.shift.is_weekend()
         ]
         print(tabulate.tabulate(formatted_list, headers=headers))
@@ -1,2 +1,32 @@
+from typing import List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from assignments_model.diagnostics import ConflictingConstraint
+
+
 class InfeasibleModelException(Exception):
-    pass
+    """
+    Raised when a model is proven infeasible. If the model explained it, conflicts are constraint instances that
+    can't hold together
+    """
+
+    def __init__(self, message: str, conflicts: Optional[List['ConflictingConstraint']] = None):
+        # All arguments are passed to Exception, so the exception can be pickled back from a solver process
+        super().__init__(message, conflicts)
+        self.message = message
+        self.conflicts = conflicts or []
+
+    def __str__(self):
+        return self.message
+
+
+class NoSolutionException(InfeasibleModelException):
+    """
+    Raised when a solve ends without a solution although the model wasn't proven infeasible, e.g. on timeout
+    """
+
+
+class SolveCancelledException(Exception):
+    """
+    Raised when a solve is cancelled by the client that requested it
+    """
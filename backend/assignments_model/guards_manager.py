@@ -1,3 +1,4 @@
+import concurrent.futures
 from typing import Optional, Iterable, List
 
 from assignments_model.constraints import BaseConstraint
@@ -5,6 +6,8 @@ from assignments_model.entities import Assignment, ShiftCollection, AssignmentCo
     UnifiedScoreGuardCollection, OfficerGuardCollection
 from assignments_model.models import UnifiedScoreWeekendsModel, UnifiedScoreRegularModel, \
     GuardsAssignmentsModel, OfficersWeekendModel, OfficersRegularModel, HogersWeekendModel, HogersRegularModel
+from assignments_model.solution_stream import SolutionChannel
+from constants.constants import FairnessObjective
 
 
 class BaseGuardsManager:
@@ -18,9 +21,15 @@ class BaseGuardsManager:
                  guards: BaseGuardCollection,
                  shifts: ShiftCollection,
                  constraints: List[BaseConstraint],
+                 is_pipelined: bool = True,
                  ):
+        """
+        :param is_pipelined: whether the regular model should be built while the weekends model is being solved.
+                             Weekends assignments are then enforced on the already built regular model
+        """
         self.guards = guards
         self.shifts = shifts
+        self.is_pipelined = is_pipelined
 
         if self.guards is None:
             self.guards = BaseGuardCollection()
@@ -50,18 +59,65 @@ class BaseGuardsManager:
         for assignment in assignments:
             self.enforce_assignment(assignment=assignment)
 
-    def solve(self) -> Optional[AssignmentCollection]:
+    def _solve_weekends_and_prepare_regular_model(self, solution_channel: Optional[SolutionChannel] = None
+                                                  ) -> AssignmentCollection:
+        """
+        Solve weekends model, and build regular model at the same time. CP-SAT releases the GIL while solving, so
+        building the regular model in the current thread isn't blocked by the solve
+        :param solution_channel: channel to publish improving solutions to
+        :return: weekends assignments
+        """
         self._prepare_weekends_model()
-        weekends_assignments = self.weekends_model.solve()
 
-        if weekends_assignments:
-            self.enforce_assignments(assignments=weekends_assignments)
-
-        self._prepare_regular_model()
-        final_assignments = self.regular_model.solve()
-
-        for assignment in final_assignments:
-            assignment.guard.apply_shift(shift=assignment.shift)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            weekends_future = executor.submit(self.weekends_model.solve, solution_channel)
+            try:
+                self._prepare_regular_model()
+            finally:
+                # Don't leave the solve running in the background if building fails
+                weekends_assignments = weekends_future.result()
+
+        return weekends_assignments
+
+    def add_hints(self, assignments: Iterable[Assignment], is_repair: bool = False):
+        """
+        Hint models with given assignments, e.g. the currently saved schedule of the same shifts
+        :param assignments: assignments to hint
+        :param is_repair: whether the models should stay as close as possible to the hinted schedule
+        """
+        assignments = list(assignments)
+        self.weekends_model.add_hints(assignments=assignments, is_repair=is_repair)
+        self.regular_model.add_hints(assignments=assignments, is_repair=is_repair)
+
+    def solve(self,
+              apply_assignments: bool = True,
+              solution_channel: Optional[SolutionChannel] = None) -> Optional[AssignmentCollection]:
+        """
+        Solve weekends model, enforce its assignments on regular model and solve it
+        :param apply_assignments: whether assigned shifts should be applied to guards' scores and previous shifts
+        :param solution_channel: channel to publish improving solutions of both models to. Once the best solution is
+                                 accepted, every model that is left stops at its first solution
+        :return: assignments of both models
+        """
+        if self.is_pipelined:
+            weekends_assignments = self._solve_weekends_and_prepare_regular_model(solution_channel=solution_channel)
+            # Weekends model is already solved, so assignments only need to be fixed on the regular model
+            self.regular_model.enforce_assignments(assignments=weekends_assignments)
+        else:
+            self._prepare_weekends_model()
+            weekends_assignments = self.weekends_model.solve(solution_channel=solution_channel)
+
+            if weekends_assignments:
+                self.enforce_assignments(assignments=weekends_assignments)
+
+            self._prepare_regular_model()
+
+        final_assignments = self.regular_model.solve(solution_channel=solution_channel)
+        final_assignments.telemetry = weekends_assignments.telemetry + final_assignments.telemetry
+
+        if apply_assignments:
+            for assignment in final_assignments:
+                assignment.guard.apply_shift(shift=assignment.shift)
 
         return final_assignments
 
@@ -71,16 +127,26 @@ class UnifiedScoreGuardsManager(BaseGuardsManager):
                  guards: UnifiedScoreGuardCollection,
                  shifts: ShiftCollection,
                  constraints: List[BaseConstraint],
-                 num_search_workers: int = 8
+                 num_search_workers: int = 8,
+                 timeout_in_seconds: float = 10.0,
+                 is_pipelined: bool = True,
+                 fairness_objective: FairnessObjective = FairnessObjective.DIVISION,
+                 explain_infeasibility: bool = False
                  ):
         weekends_model = UnifiedScoreWeekendsModel(shifts=shifts,
                                                    guards=guards,
-                                                   num_search_workers=num_search_workers)
+                                                   num_search_workers=num_search_workers,
+                                                   timeout_in_seconds=timeout_in_seconds,
+                                                   fairness_objective=fairness_objective,
+                                                   explain_infeasibility=explain_infeasibility)
         regular_model = UnifiedScoreRegularModel(shifts=shifts,
                                                  guards=guards,
-                                                 num_search_workers=num_search_workers)
+                                                 num_search_workers=num_search_workers,
+                                                 timeout_in_seconds=timeout_in_seconds,
+                                                 fairness_objective=fairness_objective,
+                                                 explain_infeasibility=explain_infeasibility)
         super().__init__(weekends_model=weekends_model, regular_model=regular_model, guards=guards, shifts=shifts,
-                         constraints=constraints)
+                         constraints=constraints, is_pipelined=is_pipelined)
 
 
 # TODO these should probably be deleted
@@ -89,16 +155,26 @@ class OfficerGuardsManager(BaseGuardsManager):
                  guards: OfficerGuardCollection,
                  shifts: ShiftCollection,
                  constraints: List[BaseConstraint],
-                 num_search_workers: int = 8
+                 num_search_workers: int = 8,
+                 timeout_in_seconds: float = 10.0,
+                 is_pipelined: bool = True,
+                 fairness_objective: FairnessObjective = FairnessObjective.DIVISION,
+                 explain_infeasibility: bool = False
                  ):
         weekends_model = OfficersWeekendModel(shifts=shifts,
                                               guards=guards,
-                                              num_search_workers=num_search_workers)
+                                              num_search_workers=num_search_workers,
+                                              timeout_in_seconds=timeout_in_seconds,
+                                              fairness_objective=fairness_objective,
+                                              explain_infeasibility=explain_infeasibility)
         regular_model = OfficersRegularModel(shifts=shifts,
                                              guards=guards,
-                                             num_search_workers=num_search_workers)
+                                             num_search_workers=num_search_workers,
+                                             timeout_in_seconds=timeout_in_seconds,
+                                             fairness_objective=fairness_objective,
+                                             explain_infeasibility=explain_infeasibility)
         super().__init__(weekends_model=weekends_model, regular_model=regular_model, guards=guards, shifts=shifts,
-                         constraints=constraints)
+                         constraints=constraints, is_pipelined=is_pipelined)
 
 
 class HogerGuardsManager(BaseGuardsManager):
@@ -106,13 +182,23 @@ class HogerGuardsManager(BaseGuardsManager):
                  guards: UnifiedScoreGuardCollection,
                  shifts: ShiftCollection,
                  constraints: List[BaseConstraint],
-                 num_search_workers: int = 8
+                 num_search_workers: int = 8,
+                 timeout_in_seconds: float = 10.0,
+                 is_pipelined: bool = True,
+                 fairness_objective: FairnessObjective = FairnessObjective.DIVISION,
+                 explain_infeasibility: bool = False
                  ):
         weekends_model = HogersWeekendModel(shifts=shifts,
                                             guards=guards,
-                                            num_search_workers=num_search_workers)
+                                            num_search_workers=num_search_workers,
+                                            timeout_in_seconds=timeout_in_seconds,
+                                            fairness_objective=fairness_objective,
+                                            explain_infeasibility=explain_infeasibility)
         regular_model = HogersRegularModel(shifts=shifts,
                                            guards=guards,
-                                           num_search_workers=num_search_workers)
+                                           num_search_workers=num_search_workers,
+                                           timeout_in_seconds=timeout_in_seconds,
+                                           fairness_objective=fairness_objective,
+                                           explain_infeasibility=explain_infeasibility)
         super().__init__(weekends_model=weekends_model, regular_model=regular_model, guards=guards, shifts=shifts,
-                         constraints=constraints)
+                         constraints=constraints, is_pipelined=is_pipelined)
@@ -1,15 +1,18 @@
 import random
 from datetime import datetime, timedelta
 from random import randrange
-from typing import List, Iterable
+from typing import List, Iterable, Optional, Type
 
 import tabulate
 
-from assignments_model.entities import Shift, HogerGuard, Assignment
+from assignments_model.entities import Shift, HogerGuard, Assignment, ShiftCollection, UnifiedScoreGuard, \
+    OfficerGuard, HogerGuardCollection, OfficerGuardCollection, UnifiedScoreGuardCollection
 from assignments_model.guards_manager import OfficerGuardsManager
 from assignments_model.stats import guards_score_stddev
 from assignments_model.utils.date_utils import iter_dates
-from constants.constants import GuardingType
+from models.score import DayTypeEnum, ScoreModel
+from models.shift_type import ShiftTypeModel
+from models.structs import PopulationType
 
 MIN_SHIFTS = 15
 MAX_SHIFTS = 17
@@ -19,6 +22,15 @@ FRIDAY_WEEKNO = 4
 SATURDAY_WEEKNO = 5
 GUARDS = ["alice", "bob"]
 
+GUARD_COLLECTION_BY_TYPE = {
+    HogerGuard: HogerGuardCollection,
+    OfficerGuard: OfficerGuardCollection,
+}
+POPULATION_TYPE_BY_GUARD_TYPE = {
+    HogerGuard: PopulationType.HOGER,
+    OfficerGuard: PopulationType.OFFICER,
+}
+
 
 def random_date(start: datetime.date, end: datetime.date) -> datetime.date:
     delta = end - start
@@ -27,40 +39,82 @@ def random_date(start: datetime.date, end: datetime.date) -> datetime.date:
     return start + timedelta(seconds=random_second)
 
 
-def generate_random_shifts(start_date: datetime.date, end_date: datetime.date) -> List[Shift]:
-    shifts = []
-
-    all_possible_dates = list(iter_dates(start_date=start_date, end_date=end_date))
-    all_possible_dates = [date for date in all_possible_dates if date.weekday() != SATURDAY_WEEKNO]
-
-    num_shifts = random.randint(MIN_SHIFTS, MAX_SHIFTS)
-    for _ in range(num_shifts):
-        date = random.choice(all_possible_dates)
-
-        if date.weekday() == THURSDAY_WEEKNO:
-            shift_type = random.choices(
-                population=[GuardingType.YADIN_THURSDAY, GuardingType.LOTEM_THURSDAY],
-                weights=[0.3, 0.6]
-            )[0]
-        elif date.weekday() == FRIDAY_WEEKNO:
-            shift_type = random.choices(
-                population=[GuardingType.LOTEM_KAFKAF_WEEKEND, GuardingType.YADIN_WEEKEND, GuardingType.LOTEM_WEEKEND],
-                weights=[0.1, 0.4, 0.6]
-            )[0]
-        else:
-            shift_type = random.choices(
-                population=[GuardingType.LOTEM_KAFKAF_REGULAR, GuardingType.YADIN_REGULAR, GuardingType.LOTEM_REGULAR],
-                weights=[0.1, 0.4, 0.6]
-            )[0]
-
-        shift = Shift(date=date, shift_type=shift_type)
-        shifts.append(shift)
-
-    return shifts
+def generate_shift_types(num_shift_types: int,
+                         population_type: PopulationType = PopulationType.HOGER,
+                         rng: Optional[random.Random] = None) -> List[ShiftTypeModel]:
+    """
+    Generate shift types with random default scores
+    :param num_shift_types: number of shift types
+    :param population_type: population type of shift types
+    :param rng: random number generator, for reproducible results
+    :return: list of shift types
+    """
+    rng = rng or random.Random()
+    # Shift types are only used as values in the model, so they are created without validation
+    return [
+        ShiftTypeModel.construct(name=f"SHIFT_TYPE_{i}",
+                                 slots_count=1,
+                                 population_type=population_type,
+                                 score_config={DayTypeEnum.REGULAR_DAY: rng.choice((1, 2)),
+                                               DayTypeEnum.THURSDAY: rng.choice((2, 3)),
+                                               DayTypeEnum.WEEKEND: rng.choice((3, 4))})
+        for i in range(num_shift_types)
+    ]
 
 
-def generate_guards() -> List[HogerGuard]:
-    pass
+def generate_random_shifts(start_date: datetime.date,
+                           num_days: int,
+                           shift_types: List[ShiftTypeModel],
+                           holiday_probability: float = 0.0,
+                           rng: Optional[random.Random] = None) -> ShiftCollection:
+    """
+    Generate a shift of every shift type on every date
+    :param start_date: date of the first shifts
+    :param num_days: number of days with shifts
+    :param shift_types: types of shifts on each date
+    :param holiday_probability: probability of each date to be a holiday
+    :param rng: random number generator, for reproducible results
+    :return: collection of shifts, ordered by date
+    """
+    rng = rng or random.Random()
+    shifts = []
+    for date in iter_dates(start_date=start_date, end_date=start_date + timedelta(days=num_days - 1)):
+        is_holiday = rng.random() < holiday_probability
+        for shift_type in shift_types:
+            shifts.append(Shift(date=date, shift_type=shift_type, is_holiday=is_holiday, num_days=1))
+    return ShiftCollection(shifts)
+
+
+def generate_guards(num_guards: int,
+                    guard_type: Type[UnifiedScoreGuard] = HogerGuard,
+                    restriction_dates: Iterable[datetime.date] = (),
+                    restriction_density: float = 0.0,
+                    rng: Optional[random.Random] = None) -> UnifiedScoreGuardCollection:
+    """
+    Generate guards with random scores, time in duty and restrictions
+    :param num_guards: number of guards
+    :param guard_type: HogerGuard or OfficerGuard
+    :param restriction_dates: dates that guards may ask not to have shifts on
+    :param restriction_density: probability of each guard to ask not to have shifts on each of the dates
+    :param rng: random number generator, for reproducible results
+    :return: collection of guards of the matching type
+    """
+    rng = rng or random.Random()
+    restriction_dates = list(restriction_dates)
+
+    guards = []
+    for i in range(num_guards):
+        kwargs = dict(name=f"guard_{i}",
+                      time_in_duty=rng.randint(1, 36),
+                      score_multiplier=rng.randint(1, 3),
+                      score=ScoreModel(regular_score=rng.randint(0, 20), weekend_score=rng.randint(0, 10)),
+                      num_holidays=rng.randint(0, 2),
+                      restrictions=[date for date in restriction_dates if rng.random() < restriction_density])
+        if guard_type is OfficerGuard:
+            kwargs["has_done_bhd1"] = rng.random() < 0.5
+        guards.append(guard_type(**kwargs))
+
+    return GUARD_COLLECTION_BY_TYPE[guard_type](guards)
 
 
 def print_shifts(shifts: Iterable[Shift]):
@@ -103,44 +157,36 @@ def print_assignments(assignments: Iterable[Assignment]):
 
 
 def main():
+    rng = random.Random(0)
     start_date = datetime.today().date()
-    end_date = start_date + timedelta(days=30)
+    num_days = 30
+
+    shift_types = generate_shift_types(num_shift_types=2, population_type=PopulationType.OFFICER, rng=rng)
+    guards = generate_guards(num_guards=10, guard_type=OfficerGuard, rng=rng)
 
     for _ in range(5):
-        for guard in GUARDS:
+        for guard in guards:
             guard.previous_regular_score = None
 
-        shifts = generate_random_shifts(start_date=start_date, end_date=end_date)
-        shifts.sort(key=lambda shift: shift.date)
+        shifts = generate_random_shifts(start_date=start_date, num_days=num_days, shift_types=shift_types, rng=rng)
 
         # Before assignments
         print("******** Before assignments ********")
         print_shifts(shifts=shifts)
         print()
-        print_guards(guards=GUARDS)
+        guards.print_table()
         print()
 
-        # weekends_manager = WeekendsModel(guards=GUARDS, shifts=shifts)
-        # weekends_manager.build_model()
-        # weekends_assignments = weekends_manager.solve()
-        # print_assignments(assignments=weekends_assignments)
-        # print()
-        # 
-        # for guard in GUARDS:
-        #     guard.previous_regular_score = None
-
-        manager = OfficerGuardsManager(guards=GUARDS, shifts=shifts)
+        manager = OfficerGuardsManager(guards=guards, shifts=shifts, constraints=[])
         assignments = manager.solve()
 
         # After assignments
         print("******** After assignments ********")
-        GUARDS.sort(key=lambda g: g.regular_score, reverse=True)
-        print_assignments(assignments=assignments)
+        assignments.print_table()
         print()
-        print_guards(guards=GUARDS)
+        guards.print_table()
 
-        start_date += timedelta(days=31)
-        end_date = start_date + timedelta(days=30)
+        start_date += timedelta(days=num_days)
 
 
 if __name__ == '__main__':
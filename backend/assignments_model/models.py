@@ -1,9 +1,10 @@
 import abc
-import inspect
-import timeit
+import datetime
+import logging
 from abc import abstractmethod
+from collections import defaultdict
 from itertools import product
-from typing import Dict, Tuple, List, Iterable
+from typing import Dict, Tuple, List, Iterable, Optional, Set, NamedTuple
 
 from ortools.linear_solver.linear_solver_natural_api import SumArray
 from ortools.sat.python import cp_model
@@ -16,13 +17,36 @@ from assignments_model.constraints import GuardsPerShiftConstraint, ShiftsPerGua
     LimitOnlyOneHolidayInService
 from assignments_model.entities import BaseGuardCollection, UnifiedScoreGuardCollection
 from assignments_model.entities import Shift, BaseGuard, Assignment, ShiftCollection, AssignmentCollection
-from assignments_model.errors import InfeasibleModelException
+from assignments_model.diagnostics import ConstraintAssumptions, ConstraintSource, ConflictingConstraint, \
+    RESTRICTION_SOURCE, ENFORCED_ASSIGNMENT_SOURCE, OBJECTIVE_SOURCE
+from assignments_model.errors import InfeasibleModelException, NoSolutionException, SolveCancelledException
 from assignments_model.query import UnionQuery, ShiftQuery
+from assignments_model.solution_stream import SolutionChannel, SolutionStreamCallback
+from assignments_model.telemetry import ModelTelemetry, measure_phase, SOLUTION_STATUSES
 from assignments_model.utils import model_utils
-from constants.constants import SCALAR, Weekday
+from constants.constants import SCALAR, Weekday, FairnessObjective
 from models.score import DayTypeEnum
 from models.structs import ShiftTypeNameEnum
 
+logger = logging.getLogger(__name__)
+
+# Maximal number of solves, and time of each of them, that shrink the conflict of an infeasible model
+MAX_CONFLICT_SHRINK_SOLVES = 64
+CONFLICT_SOLVE_TIMEOUT_IN_SECONDS = 2.0
+# Maximal common multiple of guards' times in duty in the linear fairness objective, larger ones are approximated
+MAX_TIME_IN_DUTY_COMMON_MULTIPLE = 10 ** 4
+
+
+class GuardScoreTerms(NamedTuple):
+    """
+    A guard's score after assignment, as a linear expression of his assignment variables, and the time in duty that
+    it's weighted by
+    """
+    initial_score: int
+    variables: List[IntVar]
+    coefficients: List[int]
+    time_in_duty: int
+
 
 class GuardsAssignmentsModel(abc.ABC):
     """
@@ -30,6 +54,10 @@ class GuardsAssignmentsModel(abc.ABC):
 
     The problem that the model should solve is to place True or False on a 2D boolean array of guards
     and allocated shifts, where True means that a guard was assigned to a shift, and False means that he wasn't.
+
+    The array is sparse: variables are only created for eligible (shift, guard) pairs, i.e. pairs that aren't
+    excluded in advance by guards' restrictions or by the constraints' get_ineligible_pairs(). Variables are created
+    on first access, so all constraints should be added before that.
     """
 
     def __init__(self,
@@ -38,36 +66,188 @@ class GuardsAssignmentsModel(abc.ABC):
                  *,
                  num_search_workers: int = 8,
                  timeout_in_seconds: float = 10.0,
+                 fairness_objective: FairnessObjective = FairnessObjective.DIVISION,
+                 explain_infeasibility: bool = False,
                  is_debug: bool = False):
+        """
+        :param explain_infeasibility: whether every constraint instance should be enforced by an assumption literal,
+                                      so an infeasible solve can be explained by the instances that conflict. Pairs
+                                      that can't be assigned are then constrained instead of having no variables
+        :param is_debug: whether variables should be named, also explains infeasibility
+        """
         self.model = cp_model.CpModel()
         self.solver = cp_model.CpSolver()
         self.shifts = shifts
         self.guards = guards
         self.is_debug = is_debug
+        self.fairness_objective = fairness_objective
+
+        # Assumption literals of constraint instances, and the constraint that is currently applied
+        self.assumptions = ConstraintAssumptions(self.model) if explain_infeasibility or is_debug else None
+        self._applied_constraint: Optional[BaseConstraint] = None
+        # Constraints that only define the objective's variables, they can't make the model infeasible
+        self._objective_constraints = range(0)
 
         self.solver.parameters.num_search_workers = num_search_workers  # Number of allocated solver threads
         self.solver.parameters.max_time_in_seconds = timeout_in_seconds  # Timeout in seconds
 
-        # 2D mapping of given shifts and guards to booleans
-        self.assignment_vars: Dict[Tuple[Shift, BaseGuard], IntVar] = {
-            (shift, guard): self.model.NewBoolVar(f'{shift.formatted_date()}_guard_{guard.name}')
-            for shift, guard in product(self.shifts, self.guards)
-        }
+        # Sparse 2D mapping of eligible shifts and guards to booleans, and its adjacency by shift and by guard
+        self._assignment_vars: Optional[Dict[Tuple[Shift, BaseGuard], IntVar]] = None
+        self._vars_by_shift: Optional[Dict[Shift, Dict[BaseGuard, IntVar]]] = None
+        self._vars_by_guard: Optional[Dict[BaseGuard, Dict[Shift, IntVar]]] = None
+
+        # Hinted values of assignment variables, e.g. from a previous schedule
+        self.hints: Dict[Tuple[Shift, BaseGuard], bool] = {}
+
+        # Groupings shared by constraints, computed on first use
+        self._shifts_by_date: Optional[Dict[datetime.date, List[Shift]]] = None
+        self._guard_vars_by_date: Optional[Dict[BaseGuard, Dict[datetime.date, List[IntVar]]]] = None
 
         # Initialize constraints list
         self.constraints: List[BaseConstraint] = []
 
+        # Timings and sizes of the model's phases, and the solver's response
+        self.telemetry = ModelTelemetry(model=type(self).__name__)
+
+    @property
+    def assignment_vars(self) -> Dict[Tuple[Shift, BaseGuard], IntVar]:
+        """
+        Mapping of eligible (shift, guard) pairs to their assignment variables
+        """
+        if self._assignment_vars is None:
+            self._create_assignment_vars()
+        return self._assignment_vars
+
+    @property
+    def vars_by_shift(self) -> Dict[Shift, Dict[BaseGuard, IntVar]]:
+        """
+        Mapping of every shift to the assignment variables of guards that are eligible for it
+        """
+        if self._vars_by_shift is None:
+            self._create_assignment_vars()
+        return self._vars_by_shift
+
+    @property
+    def vars_by_guard(self) -> Dict[BaseGuard, Dict[Shift, IntVar]]:
+        """
+        Mapping of every guard to the assignment variables of shifts that he is eligible for
+        """
+        if self._vars_by_guard is None:
+            self._create_assignment_vars()
+        return self._vars_by_guard
+
+    @property
+    def shifts_by_date(self) -> Dict[datetime.date, List[Shift]]:
+        """
+        Mapping of every date (in ascending order) to the model's shifts on it
+        """
+        if self._shifts_by_date is None:
+            self._shifts_by_date = self.shifts.group_by_date()
+        return self._shifts_by_date
+
+    @property
+    def guard_vars_by_date(self) -> Dict[BaseGuard, Dict[datetime.date, List[IntVar]]]:
+        """
+        Mapping of every guard to the assignment variables of his eligible shifts, grouped by the shifts' dates
+        """
+        if self._guard_vars_by_date is None:
+            self._guard_vars_by_date = {}
+            for guard, guard_vars in self.vars_by_guard.items():
+                vars_by_date = defaultdict(list)
+                for shift, var in guard_vars.items():
+                    vars_by_date[shift.date].append(var)
+                self._guard_vars_by_date[guard] = dict(vars_by_date)
+        return self._guard_vars_by_date
+
+    def _get_ineligible_pairs(self) -> Set[Tuple[Shift, BaseGuard]]:
+        """
+        Find all (shift, guard) pairs that can't be assigned, according to guards' restrictions and to constraints
+        :return: set of ineligible (shift, guard) pairs
+        """
+        ineligible_pairs = set()
+        if self.assumptions is not None:
+            # Exclusions are applied as constraints, so they can be part of an explanation
+            return ineligible_pairs
+
+        # Guards can't be assigned to shifts on dates from their requests
+        for guard in self.guards:
+            for date in set(guard.restrictions):
+                ineligible_pairs.update((shift, guard) for shift in self.shifts.find(date=date))
+
+        for constraint in self.constraints:
+            ineligible_pairs.update(constraint.get_ineligible_pairs(self))
+
+        return ineligible_pairs
+
+    def _create_assignment_vars(self):
+        """
+        Create a BoolVar for every eligible (shift, guard) pair
+        """
+        ineligible_pairs = self._get_ineligible_pairs()
+
+        self._assignment_vars = {}
+        self._vars_by_shift = {shift: {} for shift in self.shifts}
+        self._vars_by_guard = {guard: {} for guard in self.guards}
+        for shift, guard in product(self.shifts, self.guards):
+            if (shift, guard) in ineligible_pairs:
+                continue
+
+            # Naming variables is only useful for debugging, and is costly on large models
+            name = f'{shift.formatted_date()}_guard_{guard.name}' if self.is_debug else ''
+            var = self.model.NewBoolVar(name)
+            self._assignment_vars[shift, guard] = var
+            self._vars_by_shift[shift][guard] = var
+            self._vars_by_guard[guard][shift] = var
+
+    def get_guard_vars(self, guard: BaseGuard, shifts: Iterable[Shift]) -> List[IntVar]:
+        """
+        Get assignment variables of a guard for given shifts, skipping shifts that the guard isn't eligible for
+        :param guard: a guard
+        :param shifts: shifts to get variables for
+        :return: list of assignment variables
+        """
+        guard_vars = self.vars_by_guard[guard]
+        return [guard_vars[shift] for shift in shifts if shift in guard_vars]
+
+    def get_shift_vars(self, shift: Shift) -> List[IntVar]:
+        """
+        Get assignment variables of all guards that are eligible for a given shift
+        :param shift: a shift
+        :return: list of assignment variables
+        """
+        return list(self.vars_by_shift[shift].values())
+
     @abstractmethod
     def build_model(self):
         raise NotImplementedError
 
+    def measure_phase(self, name: str):
+        """
+        Context manager that records the time and the model size added by the wrapped code as a phase of the model
+        :param name: name of phase
+        """
+        return measure_phase(self.telemetry.phases, name=name, model=self.model)
+
     def apply_constraints(self):
         """
         Iterates throw the model's constrains and applies it
         """
+        # Variables are created on first access, so they are measured separately from the first constraint
+        with self.measure_phase("assignment_vars"):
+            _ = self.assignment_vars
+
+        # Restricted pairs have variables when explaining infeasibility, or when the restrictions were added after the
+        # variables were created (e.g. by enforcing assignments or adding hints). Other pairs are skipped
+        for guard in self.guards:
+            for date in set(guard.restrictions):
+                self.add_restrictions(shifts=self.shifts.find(date=date), guard=guard)
+
         for constraint in self.constraints:
             constraint.validate_parameters()
-            constraint.apply_constraint(self)
+            self._applied_constraint = constraint
+            with measure_phase(self.telemetry.constraints, name=type(constraint).__name__, model=self.model):
+                constraint.apply_constraint(self)
+        self._applied_constraint = None
 
     @abstractmethod
     def add_base_constraints(self):
@@ -92,23 +272,69 @@ class GuardsAssignmentsModel(abc.ABC):
         """
         raise NotImplementedError
 
+    def add_bounded_sum_constraint(self,
+                                   variables: List[IntVar],
+                                   lower_bound: int,
+                                   upper_bound: int,
+                                   guard: Optional[BaseGuard] = None,
+                                   shift: Optional[Shift] = None):
+        """
+        Constrain the number of given boolean variables that are True to a range, using the most specific
+        constraint that CP-SAT has for it. Constraints that always hold are skipped
+        :param variables: boolean variables, e.g. assignment variables
+        :param lower_bound: minimal number of True variables (inclusive)
+        :param upper_bound: maximal number of True variables (inclusive)
+        :param guard: guard that the constraint is added for, identifies it when explaining infeasibility
+        :param shift: shift that the constraint is added for, identifies it when explaining infeasibility
+        """
+        if lower_bound <= 0 and upper_bound >= len(variables):
+            return
+
+        if self.assumptions is not None:
+            # Specific constraints can't be enforced by a literal, so assumption literals are only supported on a
+            # linear constraint
+            self.model.AddLinearConstraint(cp_model.LinearExpr.Sum(variables), lower_bound, upper_bound) \
+                .OnlyEnforceIf(self.infeasibility_debug_var(guard=guard, shift=shift))
+        elif lower_bound == upper_bound == 1:
+            self.model.AddExactlyOne(variables)
+        elif lower_bound <= 0 and upper_bound == 1:
+            self.model.AddAtMostOne(variables)
+        elif lower_bound <= 0 and upper_bound == 0:
+            self.model.AddBoolAnd([var.Not() for var in variables])
+        else:
+            self.model.AddLinearConstraint(cp_model.LinearExpr.Sum(variables), lower_bound, upper_bound)
+
     def add_restrictions(self, shifts: Iterable[Shift], guard: BaseGuard):
         """
         Restrict model to not assign a guard to a given list of shifts
         :param shifts: list of shifts
         :param guard: a guard that won't be assigned to given shifts
         """
+        guard_vars = self.vars_by_guard[guard]
         for shift in shifts:
-            self.model.Add(self.assignment_vars[shift, guard] == 0).OnlyEnforceIf(self.infeasibility_debug_var())
+            if shift in guard_vars:
+                self.model.Add(guard_vars[shift] == 0).OnlyEnforceIf(
+                    self.infeasibility_debug_var(source=RESTRICTION_SOURCE, guard=guard, shift=shift)
+                )
 
     def enforce_assignment(self, assignment: Assignment):
         """
         Enforce given assignment on model
         :param assignment: assignment to be enforced when model is solved
         """
-        assert (assignment.shift, assignment.guard) in self.assignment_vars, "No variable was found for assignment"
-        self.model.Add(self.assignment_vars[assignment.shift, assignment.guard] == 1).OnlyEnforceIf(
-            self.infeasibility_debug_var())
+        assert assignment.shift in self.vars_by_shift and assignment.guard in self.vars_by_guard, \
+            "No variable was found for assignment"
+
+        debug_var = self.infeasibility_debug_var(source=ENFORCED_ASSIGNMENT_SOURCE,
+                                                 guard=assignment.guard,
+                                                 shift=assignment.shift)
+        var = self.assignment_vars.get((assignment.shift, assignment.guard))
+        if var is None:
+            # Guard isn't eligible for the shift, so the model can't satisfy this assignment
+            self.model.Add(cp_model.LinearExpr.Sum([]) == 1).OnlyEnforceIf(debug_var)
+            return
+
+        self.model.Add(var == 1).OnlyEnforceIf(debug_var)
 
     def enforce_assignments(self, assignments: List[Assignment]):
         """
@@ -119,6 +345,34 @@ class GuardsAssignmentsModel(abc.ABC):
         for assignment in assignments:
             self.enforce_assignment(assignment=assignment)
 
+    def add_hints(self, assignments: Iterable[Assignment], is_repair: bool = False):
+        """
+        Hint the solver with given assignments (e.g. a previous schedule of the same shifts), so it can start its
+        search from them. Other guards of hinted shifts are hinted as not assigned
+        :param assignments: assignments to hint
+        :param is_repair: whether the solver should try to repair the hinted schedule before searching elsewhere,
+                          which keeps the solution close to it
+        """
+        for assignment in assignments:
+            if assignment.shift not in self.vars_by_shift:
+                continue
+
+            for guard in self.vars_by_shift[assignment.shift]:
+                self.hints.setdefault((assignment.shift, guard), False)
+            if (assignment.shift, assignment.guard) in self.assignment_vars:
+                self.hints[assignment.shift, assignment.guard] = True
+
+        if is_repair:
+            self.solver.parameters.repair_hint = True
+
+    def _apply_hints(self):
+        """
+        Add hints to model, replacing any hints that were added before
+        """
+        self.model.ClearHints()
+        for pair, value in self.hints.items():
+            self.model.AddHint(self.assignment_vars[pair], int(value))
+
     def _calculate_square_from_expression(self, expr):
         """
         Calculate variable that will equal to the square of a given ortools expression
@@ -147,59 +401,207 @@ class GuardsAssignmentsModel(abc.ABC):
         sum_expressions = self.model.NewIntVar(0, 100000000, 'sum_expressions')
 
         # Calculate sum of weekend scores post assignment
-        self.model.Add(sum_expressions == sum(linear_expressions)).OnlyEnforceIf(self.infeasibility_debug_var())
+        self.model.Add(sum_expressions == cp_model.LinearExpr.Sum(linear_expressions)) \
+            .OnlyEnforceIf(self.infeasibility_debug_var(source=OBJECTIVE_SOURCE))
 
         # Divide the sum by the number of guards
         self.model.AddDivisionEquality(avg_expressions, sum_expressions, len(linear_expressions))
 
-        function_to_minimize = sum(
+        function_to_minimize = cp_model.LinearExpr.Sum([
             self._calculate_abs_min_from_expression(expr=expression - avg_expressions)
             for expression in linear_expressions
-        )
+        ])
 
         return function_to_minimize
 
-    def infeasibility_debug_var(self):
+    def _get_score_terms(self) -> Dict[BaseGuard, GuardScoreTerms]:
         """
-        An ortools' BoolVar that is useful for debugging the model when it's INFEASIBLE
-        :return: a debug variable with useful information
+        Get the score of every guard after assignment, which the objective should balance
+        :return: mapping of guards to their score terms
         """
-        if not self.is_debug:
-            return True
+        raise NotImplementedError
+
+    def _generate_post_assignment_vars(self, score_terms: Dict[BaseGuard, GuardScoreTerms]) -> Dict[BaseGuard, IntVar]:
+        """
+        Calculate justice table to be used for calculation of score variance
+        :param score_terms: mapping of guards to their score terms
+        :return: mapping of guards to their new theoretic scores divided by their time in duty, as ortools' IntVars
+        """
+        post_assignment_scores = {}
+
+        for guard, terms in score_terms.items():
+            score_to_add = cp_model.LinearExpr.WeightedSum(terms.variables, terms.coefficients)
+
+            new_score = self.model.NewIntVar(0, 1000000000, '')
+            self.model.Add(new_score == (terms.initial_score + score_to_add))
+
+            weighted_score = self.model.NewIntVar(0, 1000000000, '')
+            self.model.AddDivisionEquality(weighted_score, new_score, terms.time_in_duty)
+
+            post_assignment_scores[guard] = weighted_score
+
+        return post_assignment_scores
+
+    def calculate_linear_objective_deviation(self, score_terms: List[GuardScoreTerms]):
+        """
+        Calculate the deviation of guards' scores weighted by their time in duty, without divisions: every score is
+        multiplied by (common multiple / time in duty) instead of being divided by its time in duty, and compared
+        to the sum of all scores instead of to their average. The result is the sum of absolute deviations of
+        weighted scores from their average, multiplied by the common multiple and by the number of guards.
+        Variables' domains are derived from the scores' actual bounds. **only** should the deviation be an objective
+        function that will be minimized
+        :param score_terms: score terms of guards
+        :return: expression of a deviation function to minimize
+        """
+        if not score_terms:
+            return cp_model.LinearExpr.Sum([])
+
+        weights = model_utils.get_common_multiple_weights([terms.time_in_duty for terms in score_terms],
+                                                          max_common_multiple=MAX_TIME_IN_DUTY_COMMON_MULTIPLE)
+        scaled_scores = []
+        for weight, terms in zip(weights, score_terms):
+            expression = cp_model.LinearExpr.WeightedSum(terms.variables,
+                                                         [weight * coefficient for coefficient in terms.coefficients])
+            lower_bound = weight * (terms.initial_score + sum(min(0, coef) for coef in terms.coefficients))
+            upper_bound = weight * (terms.initial_score + sum(max(0, coef) for coef in terms.coefficients))
+            scaled_scores.append((expression + weight * terms.initial_score, lower_bound, upper_bound))
+
+        # Sum of all scaled scores, as a single variable so every deviation only refers to its guard's variables
+        sum_lower_bound = sum(lower_bound for _, lower_bound, _ in scaled_scores)
+        sum_upper_bound = sum(upper_bound for _, _, upper_bound in scaled_scores)
+        sum_scores = self.model.NewIntVar(sum_lower_bound, sum_upper_bound, 'sum_scaled_scores')
+        self.model.Add(sum_scores == cp_model.LinearExpr.Sum([expression for expression, _, _ in scaled_scores]))
+
+        num_guards = len(scaled_scores)
+        deviations = []
+        for expression, lower_bound, upper_bound in scaled_scores:
+            max_deviation = max(num_guards * upper_bound - sum_lower_bound, sum_upper_bound - num_guards * lower_bound)
+            deviation = self.model.NewIntVar(0, max(0, max_deviation), '')
+            self.model.Add(deviation >= num_guards * expression - sum_scores)
+            self.model.Add(deviation >= sum_scores - num_guards * expression)
+            deviations.append(deviation)
 
-        caller_function_name = inspect.stack()[1][3]
-        caller_function_line_number = inspect.stack()[1].lineno
-        name = f"{caller_function_name}_line_{caller_function_line_number}"
-        var = self.model.NewBoolVar(name)
-        self.model.AddAssumption(var)
-        return var
+        return cp_model.LinearExpr.Sum(deviations)
 
-    def solve(self) -> AssignmentCollection:
+    def add_fairness_objective(self):
+        """
+        Minimize the deviation of guards' scores weighted by their time in duty, using the model's formulation
+        """
+        num_constraints_before = len(self.model.Proto().constraints)
+        score_terms = self._get_score_terms()
+        if self.fairness_objective == FairnessObjective.LINEAR:
+            function_to_minimize = self.calculate_linear_objective_deviation(list(score_terms.values()))
+        else:
+            post_assignment_vars = self._generate_post_assignment_vars(score_terms)
+            function_to_minimize = self.calculate_objective_variance_from_expressions(
+                list(post_assignment_vars.values())
+            )
+        self.model.Minimize(function_to_minimize)
+        self._objective_constraints = range(num_constraints_before, len(self.model.Proto().constraints))
+
+    def infeasibility_debug_var(self,
+                                source: Optional[ConstraintSource] = None,
+                                guard: Optional[BaseGuard] = None,
+                                shift: Optional[Shift] = None):
+        """
+        An ortools' BoolVar that is useful for explaining the model when it's INFEASIBLE. All constraints of the same
+        source, guard and shift share the same variable
+        :param source: constraint that the variable enforces, defaults to the currently applied constraint
+        :param guard: guard that the constraint is added for
+        :param shift: shift that the constraint is added for
+        :return: an assumption literal that enforces the constraint, or True if infeasibility isn't explained
+        """
+        if self.assumptions is None:
+            return True
+
+        if source is None:
+            source = self._applied_constraint if self._applied_constraint is not None else type(self).__name__
+        return self.assumptions.get_literal(source=source, guard=guard, shift=shift)
+
+    def _explain_infeasibility(self) -> List[ConflictingConstraint]:
+        """
+        Find constraint instances that can't hold together, after the model was found INFEASIBLE. CP-SAT returns all
+        assumptions when the conflict is found before search, so the conflict is shrunk by removing chunks of it and
+        checking that the rest is still infeasible, on a copy of the model without objective
+        :return: conflicting constraint instances
+        """
+        feasibility_model = cp_model.CpModel()
+        feasibility_model.Proto().CopyFrom(self.model.Proto())
+        feasibility_model.Proto().ClearField("objective")
+        del feasibility_model.Proto().constraints[self._objective_constraints.start:self._objective_constraints.stop]
+        solver = cp_model.CpSolver()
+        solver.parameters.CopyFrom(self.solver.parameters)
+        solver.parameters.num_search_workers = 1
+        solver.parameters.max_time_in_seconds = min(solver.parameters.max_time_in_seconds,
+                                                    CONFLICT_SOLVE_TIMEOUT_IN_SECONDS)
+
+        conflict = list(self.solver.SufficientAssumptionsForInfeasibility())
+        chunk_size = max(1, len(conflict) // 2)
+        position = 0
+        for _ in range(MAX_CONFLICT_SHRINK_SOLVES):
+            if position >= len(conflict):
+                if chunk_size == 1:
+                    break
+                chunk_size //= 2
+                position = 0
+                continue
+
+            candidate = conflict[:position] + conflict[position + chunk_size:]
+            feasibility_model.Proto().ClearField("assumptions")
+            feasibility_model.Proto().assumptions.extend(candidate)
+            if solver.Solve(feasibility_model) == cp_model.INFEASIBLE:
+                # Cores of later solves aren't used, a single worker may return an empty one
+                conflict = candidate
+            else:
+                # Removed chunk is needed for the conflict (or the solve timed out)
+                position += chunk_size
+
+        return self.assumptions.get_conflicts(conflict)
+
+    def solve(self, solution_channel: Optional[SolutionChannel] = None) -> AssignmentCollection:
         """
         Solve assignements for model, and end program if the model is infeasible with debugging information for model
-        :return: list of assignments
+        :param solution_channel: channel to publish improving solutions to, that can also stop the search early
+        :return: collection of assignments, with the model's telemetry
         """
+        self._apply_hints()
         self.model.Validate()
 
-        time_before_solve = timeit.default_timer()
-        status = self.solver.Solve(self.model)
-        time_after_solve = timeit.default_timer()
-        # print(self.solver.ResponseStats())
+        solution_callback = None
+        if solution_channel is not None:
+            if solution_channel.is_cancelled():
+                raise SolveCancelledException("Solve was cancelled")
+            solution_callback = SolutionStreamCallback(model=self, channel=solution_channel)
+
+        with self.measure_phase("solve"):
+            if solution_callback is None:
+                status = self.solver.Solve(self.model)
+            else:
+                with solution_callback.watch_channel():
+                    status = self.solver.Solve(self.model, solution_callback)
+        self.telemetry.record_model_size(self.model)
+        self.telemetry.record_response(solver=self.solver, status=status)
+        logger.info(self.telemetry.summary())
+        logger.debug(self.solver.ResponseStats())
+
+        if solution_channel is not None and solution_channel.is_cancelled():
+            raise SolveCancelledException("Solve was cancelled")
 
         if status == cp_model.INFEASIBLE:
-            sufficient_assumptions = self.solver.SufficientAssumptionsForInfeasibility()
-            for ass in sufficient_assumptions:
-                print(self.model.GetBoolVarFromProtoIndex(ass))
-            raise InfeasibleModelException("Model is infeasible with given parameters")
+            conflicts = self._explain_infeasibility() if self.assumptions is not None else []
+            for conflict in conflicts:
+                logger.warning(f"Conflicting constraint: {conflict}")
+            raise InfeasibleModelException("Model is infeasible with given parameters", conflicts=conflicts)
 
-        else:
-            print(f"Solving took {time_after_solve - time_before_solve:.3f} seconds.")
-            # print("Objective", self.solver.ObjectiveValue())
-            assignments = []
-            for shift, guard in product(self.shifts, self.guards):
-                if self.solver.Value(self.assignment_vars[shift, guard]):
-                    assignments.append(Assignment(shift=shift, guard=guard))
-            return AssignmentCollection(assignments=assignments)
+        if status not in SOLUTION_STATUSES:
+            # E.g. the solver timed out before finding any solution
+            raise NoSolutionException(f"No solution was found for model ({self.telemetry.status})")
+
+        assignments = []
+        for (shift, guard), var in self.assignment_vars.items():
+            if self.solver.Value(var):
+                assignments.append(Assignment(shift=shift, guard=guard))
+        return AssignmentCollection(assignments=assignments, telemetry=[self.telemetry])
 
 
 class UnifiedScoreRegularModel(GuardsAssignmentsModel):
@@ -215,52 +617,43 @@ class UnifiedScoreRegularModel(GuardsAssignmentsModel):
         """
         Add all constraints and objective function to model
         """
-        self.add_base_constraints()
+        with self.measure_phase("base_constraints"):
+            self.add_base_constraints()
+        # Every constraint is measured on its own
         self.apply_constraints()
-        self.add_objective_function()
+        with self.measure_phase("objective"):
+            self.add_objective_function()
+        self.telemetry.record_model_size(self.model)
 
     def add_base_constraints(self):
         """
         Add constraints relevant to assigning "regular" shifts
         """
+        # Restrictions to dates from guards' requests are applied when creating the assignment variables
         super().add_base_constraints()
 
-        # Apply restrictions to dates from guards' requests
-        for guard in self.guards:
-            for date in guard.restrictions:
-                self.add_restrictions(shifts=self.shifts.find(date=date), guard=guard)
-
-    def _generate_post_assignment_vars(self):
+    def _get_score_terms(self) -> Dict[BaseGuard, GuardScoreTerms]:
         """
-        Calculate regular justice table to be used for calculation of score variance
-        :return: mapping of guards to their new theoretic regular scores as an ortools' IntVar expression
+        Get the regular score of every guard after assignment, weighted by his time in duty + 1
+        :return: mapping of guards to their regular score terms
         """
-        post_assignment_regular_scores = {}
-
+        score_terms = {}
         for guard in self.guards:
-            score_to_add = sum(
-                int(SCALAR * guard.calculate_score_for_shift(shift=shift).regular_score)
-                * self.assignment_vars[shift, guard]
-                for shift in self.shifts
+            guard_vars = self.vars_by_guard[guard]
+            score_terms[guard] = GuardScoreTerms(
+                initial_score=int(SCALAR * guard.score.regular_score),
+                variables=list(guard_vars.values()),
+                coefficients=[int(SCALAR * guard.calculate_score_for_shift(shift=shift).regular_score)
+                              for shift in guard_vars],
+                time_in_duty=guard.time_in_duty + 1
             )
-
-            new_regular_score = self.model.NewIntVar(0, 1000000000, '')
-            self.model.Add(new_regular_score == (int(SCALAR * guard.score.regular_score) + score_to_add))
-
-            weighted_regular_score = self.model.NewIntVar(0, 1000000000, '')
-            self.model.AddDivisionEquality(weighted_regular_score, new_regular_score, guard.time_in_duty + 1)
-
-            post_assignment_regular_scores[guard] = weighted_regular_score
-
-        return post_assignment_regular_scores
+        return score_terms
 
     def add_objective_function(self):
         """
         Adds objective function to model
         """
-        post_assignment_vars = self._generate_post_assignment_vars()
-        function_to_minimize = self.calculate_objective_variance_from_expressions(list(post_assignment_vars.values()))
-        self.model.Minimize(function_to_minimize)
+        self.add_fairness_objective()
 
     @staticmethod
     def get_default_constraints() -> List[BaseConstraint]:
@@ -302,51 +695,43 @@ class UnifiedScoreWeekendsModel(GuardsAssignmentsModel):
         """
         Add all constraints and objective function to model
         """
-        self.add_base_constraints()
+        with self.measure_phase("base_constraints"):
+            self.add_base_constraints()
+        # Every constraint is measured on its own
         self.apply_constraints()
-        self.add_objective_function()
+        with self.measure_phase("objective"):
+            self.add_objective_function()
+        self.telemetry.record_model_size(self.model)
 
     def add_base_constraints(self):
         """
         Add constraints relevant to assigning weekends & holiday shifts
         """
+        # Restrictions to dates from guards' requests are applied when creating the assignment variables
         super().add_base_constraints()
 
-        # Apply restrictions to dates from guards' requests
-        for guard in self.guards:
-            for date in guard.restrictions:
-                self.add_restrictions(shifts=self.shifts.find(date=date).to_list(), guard=guard)
-
-    def _generate_post_assignment_vars(self):
+    def _get_score_terms(self) -> Dict[BaseGuard, GuardScoreTerms]:
         """
-        Calculate weekend justice table to be used for calculation of score variance
-        :return: mapping of guards to their new theoretic weekend scores as an ortools' IntVar expression
+        Get the weekend score of every guard after assignment, weighted by his time in duty
+        :return: mapping of guards to their weekend score terms
         """
-        post_assignment_weekend_scores = {}
-
+        score_terms = {}
         for guard in self.guards:
-            score_to_add = sum(
-                int(SCALAR * guard.calculate_score_for_shift(shift=shift).weekend_score)
-                * self.assignment_vars[shift, guard]
-                for shift in self.shifts
+            guard_vars = self.vars_by_guard[guard]
+            score_terms[guard] = GuardScoreTerms(
+                initial_score=int(SCALAR * guard.score.weekend_score),
+                variables=list(guard_vars.values()),
+                coefficients=[int(SCALAR * guard.calculate_score_for_shift(shift=shift).weekend_score)
+                              for shift in guard_vars],
+                time_in_duty=guard.time_in_duty
             )
-            new_weekend_score = self.model.NewIntVar(0, 1000000000, '')
-            self.model.Add(new_weekend_score == (int(SCALAR * guard.score.weekend_score) + score_to_add))
-
-            weighted_weekend_score = self.model.NewIntVar(0, 1000000000, '')
-            self.model.AddDivisionEquality(weighted_weekend_score, new_weekend_score, guard.time_in_duty)
-
-            post_assignment_weekend_scores[guard] = weighted_weekend_score
-
-        return post_assignment_weekend_scores
+        return score_terms
 
     def add_objective_function(self):
         """
         Adds objective function to model
         """
-        post_assignment_vars = self._generate_post_assignment_vars()
-        function_to_minimize = self.calculate_objective_variance_from_expressions(list(post_assignment_vars.values()))
-        self.model.Minimize(function_to_minimize)
+        self.add_fairness_objective()
 
     @staticmethod
     def get_default_constraints() -> List[BaseConstraint]:
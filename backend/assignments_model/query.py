@@ -1,7 +1,7 @@
 import datetime
-from functools import reduce
-from typing import List, Optional, Tuple, Literal, Union
+from typing import List, Optional, Tuple, Literal, Union, NamedTuple, Any
 
+from pydantic import PrivateAttr
 from pydantic.main import BaseModel
 
 from assignments_model.entities import BaseCollection
@@ -10,12 +10,98 @@ from models.score import DayTypeEnum
 DISCRIMINATOR_FIELD = "name"
 
 
-class BaseQuery(BaseModel):
+class FindQueryPlan(NamedTuple):
     """
-    A base class for a query over a single collection that can be answered using a find() function
+    A compiled query over a single collection, answered by a single find() call
+    """
+    find_kwargs: Tuple[Tuple[str, Any], ...]
+
+    def execute(self, collection: BaseCollection) -> BaseCollection:
+        return collection.find(**dict(self.find_kwargs))
+
+
+class UnionQueryPlan(NamedTuple):
+    """
+    A compiled union of queries over a single collection
+    """
+    plans: Tuple[Union[FindQueryPlan, 'UnionQueryPlan'], ...]
+
+    def execute(self, collection: BaseCollection) -> BaseCollection:
+        """
+        Evaluates all sub-plans and merges their results in a single pass over the collection, so the result is
+        free of repetitions and keeps the collection's order
+        :param collection: given collection to search
+        :return: unified, non-repeating collection of results
+        """
+        selected_ids = set()
+        for plan in self.plans:
+            selected_ids.update(id(item) for item in evaluate_plan(plan, collection))
+        return type(collection)([item for item in collection if id(item) in selected_ids])
+
+
+def evaluate_plan(plan: Union[FindQueryPlan, UnionQueryPlan], collection: BaseCollection) -> BaseCollection:
+    """
+    Evaluate a compiled query plan on a collection, reusing a memoized result if the collection supports it.
+    Memoized results are shared between callers and must not be modified
+    :param plan: compiled query plan
+    :param collection: given collection to search
+    :return: results of plan on collection
+    """
+    cache = collection.get_query_cache()
+    if cache is None:
+        return plan.execute(collection)
+
+    # Plans of different types may be equal as plain tuples, so the type is a part of the key
+    key = (type(plan), plan)
+    if key not in cache:
+        cache[key] = plan.execute(collection)
+    return cache[key]
+
+
+def _freeze(value):
+    """
+    Convert a query parameter to a hashable equivalent, so it can be used as part of a plan's key
     """
+    if isinstance(value, (list, tuple, set)):
+        return tuple(value)
+    return value
+
+
+class CompiledQueryMixin(BaseModel):
+    """
+    Compiles a query into a plan once, and recompiles it only if one of its fields is changed
+    """
+    _plan: Optional[Union[FindQueryPlan, UnionQueryPlan]] = PrivateAttr(default=None)
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self.__fields__:
+            self._plan = None
+
+    def _compile(self) -> Union[FindQueryPlan, UnionQueryPlan]:
+        raise NotImplementedError
+
+    def compile(self) -> Union[FindQueryPlan, UnionQueryPlan]:
+        """
+        Get the compiled plan of the query
+        :return: compiled query plan
+        """
+        if self._plan is None:
+            self._plan = self._compile()
+        return self._plan
+
     def evaluate(self, collection: BaseCollection) -> BaseCollection:
-        return collection.find(**{k: v for k, v in self.dict(exclude_unset=True).items() if k != DISCRIMINATOR_FIELD})
+        return evaluate_plan(self.compile(), collection)
+
+
+class BaseQuery(CompiledQueryMixin):
+    """
+    A base class for a query over a single collection that can be answered using a find() function
+    """
+    def _compile(self) -> FindQueryPlan:
+        return FindQueryPlan(find_kwargs=tuple(
+            (k, _freeze(v)) for k, v in sorted(self.dict(exclude_unset=True).items()) if k != DISCRIMINATOR_FIELD
+        ))
 
 
 class BaseGuardQuery(BaseQuery):
@@ -58,19 +144,12 @@ class ShiftQuery(BaseQuery):
     is_holiday: Optional[bool] = None
 
 
-class UnionQuery(BaseModel):
+class UnionQuery(CompiledQueryMixin):
     name: Literal["UnionQuery"] = "UnionQuery"
     queries: List[Union[ShiftQuery, OfficerGuardQuery, GuardQuery]]
     """
     Represents union of evaluated query results on multiple collections of the same type
     """
 
-    def evaluate(self, collection: BaseCollection) -> BaseCollection:
-        """
-        Evaluates unified query results on given collection
-        :param collection: given collection to search
-        :return: unified, non-repeating collection of query results
-        """
-        collections = [query.evaluate(collection) for query in self.queries]
-        if collections:
-            return reduce(lambda a, b: a + b, collections)
+    def _compile(self) -> UnionQueryPlan:
+        return UnionQueryPlan(plans=tuple(query.compile() for query in self.queries))
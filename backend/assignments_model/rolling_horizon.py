@@ -0,0 +1,187 @@
+"""
+Rolling-horizon solving of long schedules: the horizon is split into overlapping windows that are solved one after
+another, so the size of every model is bounded by the window and solve time grows linearly with the horizon
+"""
+import bisect
+import datetime
+import logging
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+from assignments_model.entities import Assignment, AssignmentCollection, ShiftCollection
+from assignments_model.errors import InfeasibleModelException, NoSolutionException
+from assignments_model.guards_manager import BaseGuardsManager
+from assignments_model.solution_stream import SolutionChannel
+from constants.constants import Weekday
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_DAYS = 35
+DEFAULT_OVERLAP_DAYS = 7
+
+
+class HorizonWindow(NamedTuple):
+    """
+    Shifts of a single window, and the date until which its assignments are final
+    """
+    shifts: ShiftCollection
+    commit_end_date: Optional[datetime.date]  # Assignments of shifts before this date are final, None for all
+
+
+def get_horizon_span(shifts: ShiftCollection) -> int:
+    """
+    Get the number of days between the first and the last shifts (inclusive)
+    """
+    dates = shifts.all_dates()
+    if not dates:
+        return 0
+    return (max(dates) - min(dates)).days + 1
+
+
+def split_horizon(shifts: ShiftCollection,
+                  window_days: int = DEFAULT_WINDOW_DAYS,
+                  overlap_days: int = DEFAULT_OVERLAP_DAYS) -> List[HorizonWindow]:
+    """
+    Split shifts into windows, where every window overlaps the next one. Only assignments of a window's shifts that
+    don't overlap the next window are final, the overlapping shifts are solved again with the next window.
+    Windows start on Sundays where possible, so weekends aren't split between windows
+    :param shifts: shifts of the whole horizon
+    :param window_days: number of days of every window
+    :param overlap_days: number of days that every window shares with the next one
+    :return: windows, in order of dates
+    """
+    if overlap_days < 0:
+        raise ValueError(f"Invalid argument: overlap_days ({overlap_days}) is < 0")
+    if window_days <= overlap_days:
+        raise ValueError(f"Invalid arguments: window_days ({window_days}) is not more than overlap_days "
+                         f"({overlap_days})")
+
+    dates = sorted(shifts.all_dates())
+    windows = []
+    start_date = dates[0] if dates else None
+    while start_date is not None:
+        end_date = start_date + datetime.timedelta(days=window_days - 1)
+        window_shifts = shifts.find(start_date=start_date, end_date=end_date)
+        if end_date >= dates[-1]:
+            windows.append(HorizonWindow(shifts=window_shifts, commit_end_date=None))
+            break
+
+        step_days = window_days - overlap_days
+        days_after_sunday = (start_date.weekday() + step_days - Weekday.SUNDAY_WEEKDAY) % 7
+        if days_after_sunday < step_days:
+            step_days -= days_after_sunday
+        commit_end_date = start_date + datetime.timedelta(days=step_days)
+        windows.append(HorizonWindow(shifts=window_shifts, commit_end_date=commit_end_date))
+
+        # Dates without shifts are skipped, so every window starts on a shift
+        start_date = dates[bisect.bisect_left(dates, commit_end_date)]
+
+    return windows
+
+
+class RollingHorizonManager:
+    """
+    Solves a long horizon as overlapping windows, each of them with its own guards manager. Guards are shared by all
+    windows, so final assignments of a window are applied to their scores and previous shifts before the next window
+    is built. Constraints apply to every window separately, and only see earlier windows through guards' previous
+    shifts. A horizon that isn't longer than a window is solved as a single window
+    """
+
+    def __init__(self,
+                 shifts: ShiftCollection,
+                 create_manager: Callable[..., BaseGuardsManager],
+                 window_days: int = DEFAULT_WINDOW_DAYS,
+                 overlap_days: int = DEFAULT_OVERLAP_DAYS,
+                 explain_infeasibility: bool = False):
+        """
+        :param shifts: shifts of the whole horizon
+        :param create_manager: creates a guards manager for the shifts of a window, e.g. with a bounded timeout.
+                               It's called with the window's shifts and an explain_infeasibility keyword argument
+        :param window_days: number of days of every window
+        :param overlap_days: number of days that every window shares with the next one
+        :param explain_infeasibility: whether an infeasible window should be solved again to find conflicting
+                                      constraints. Feasible windows are solved once either way
+        """
+        self.shifts = shifts
+        self.create_manager = create_manager
+        self.windows = split_horizon(shifts=shifts, window_days=window_days, overlap_days=overlap_days)
+        self.explain_infeasibility = explain_infeasibility
+
+        self.enforced_assignments: List[Assignment] = []
+        self.hints: List[Assignment] = []
+        self.is_repair_hints = False
+
+    def enforce_assignments(self, assignments: Iterable[Assignment]):
+        self.enforced_assignments.extend(assignments)
+
+    def add_hints(self, assignments: Iterable[Assignment], is_repair: bool = False):
+        """
+        Hint windows with given assignments, e.g. the currently saved schedule of the same shifts
+        :param assignments: assignments to hint
+        :param is_repair: whether the models should stay as close as possible to the hinted schedule
+        """
+        self.hints.extend(assignments)
+        self.is_repair_hints = self.is_repair_hints or is_repair
+
+    def _create_window_manager(self,
+                               window: HorizonWindow,
+                               overlap_assignments: List[Assignment],
+                               explain_infeasibility: bool = False) -> BaseGuardsManager:
+        """
+        Create a guards manager for a window, with its enforced assignments and hints
+        :param window: window to create the manager for
+        :param overlap_assignments: assignments of the previous window that overlap this one, and aren't final
+        :param explain_infeasibility: whether the manager's models should find conflicting constraints when they're
+                                      infeasible
+        :return: guards manager of the window
+        """
+        manager = self.create_manager(window.shifts, explain_infeasibility=explain_infeasibility)
+
+        window_shifts = set(window.shifts)
+        manager.enforce_assignments(assignments=[assignment for assignment in self.enforced_assignments
+                                                 if assignment.shift in window_shifts])
+        hints = [assignment for assignment in self.hints if assignment.shift in window_shifts]
+        hinted_shifts = {assignment.shift for assignment in hints}
+        hints.extend(assignment for assignment in overlap_assignments if assignment.shift not in hinted_shifts)
+        if hints:
+            manager.add_hints(assignments=hints, is_repair=self.is_repair_hints)
+        return manager
+
+    def solve(self, solution_channel: Optional[SolutionChannel] = None) -> AssignmentCollection:
+        """
+        Solve windows one after another. Assignments of the overlap that aren't final hint the next window
+        :param solution_channel: channel to publish improving solutions of all windows to
+        :return: final assignments of all windows, with telemetry of all solved models
+        """
+        final_assignments = []
+        telemetry = []
+        overlap_assignments = []
+
+        for window_number, window in enumerate(self.windows, start=1):
+            manager = self._create_window_manager(window=window, overlap_assignments=overlap_assignments)
+            try:
+                window_assignments = manager.solve(apply_assignments=False, solution_channel=solution_channel)
+            except NoSolutionException:
+                raise
+            except InfeasibleModelException:
+                if not self.explain_infeasibility:
+                    raise
+                # Explaining slows the solve down, so only the window that's already known to be infeasible is solved
+                # again. The solve raises an exception with the conflicts, the original one is only raised if it
+                # somehow succeeds
+                logger.info(f"Window {window_number}/{len(self.windows)} is infeasible, explaining it")
+                self._create_window_manager(window=window, overlap_assignments=overlap_assignments,
+                                            explain_infeasibility=True).solve(apply_assignments=False)
+                raise
+            telemetry.extend(window_assignments.telemetry)
+
+            overlap_assignments = []
+            for assignment in window_assignments:
+                if window.commit_end_date is None or assignment.shift.date < window.commit_end_date:
+                    assignment.guard.apply_shift(shift=assignment.shift)
+                    final_assignments.append(assignment)
+                else:
+                    overlap_assignments.append(assignment)
+
+            logger.info(f"Solved window {window_number}/{len(self.windows)} ({len(window.shifts)} shifts)")
+
+        return AssignmentCollection(assignments=final_assignments, telemetry=telemetry)
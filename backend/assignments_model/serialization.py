@@ -0,0 +1,253 @@
+"""
+Compact representation of the assignments model's entities, used to send a solve to another process and get its
+assignments back without pickling DB documents or whole entity graphs.
+Shifts and guards are sent as tuples of plain values, and are referenced by their index in the payload
+"""
+import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from beanie import PydanticObjectId
+
+from assignments_model.constraints import BaseConstraint
+from assignments_model.entities import Assignment, BaseGuard, HogerGuard, OfficerGuard, Shift, ShiftCollection
+from models.score import ScoreDeltaModel, ScoreModel
+from models.shift_type import ShiftTypeModel
+from models.structs import PopulationType
+
+GUARD_TYPES = (HogerGuard, OfficerGuard)
+
+# (id, name, slots count, population type, score config items)
+ShiftTypeRow = Tuple[Optional[str], str, int, str, Tuple[Tuple[str, float], ...]]
+# (date ordinal, shift type index, is holiday, number of days, (regular score, weekend score) or None, id)
+ShiftRow = Tuple[int, int, bool, int, Optional[Tuple[float, float]], Optional[str]]
+# (guard type index, id, name, time in duty, score multiplier, (regular score, weekend score), number of holidays,
+#  restricted date ordinals, previous shifts indices, has done bhd1)
+GuardRow = Tuple[int, Optional[str], str, int, int, Tuple[float, float], int, Tuple[int, ...], Tuple[int, ...],
+                 Optional[bool]]
+# (shift index, guard index)
+AssignmentRow = Tuple[int, int]
+
+
+class SolvePayload(NamedTuple):
+    """
+    Everything needed to build and solve a guards manager. The first num_shifts shifts are the shifts to assign,
+    the rest are previous shifts of guards
+    """
+    population_type: str
+    shift_types: Tuple[ShiftTypeRow, ...]
+    shifts: Tuple[ShiftRow, ...]
+    num_shifts: int
+    guards: Tuple[GuardRow, ...]
+    constraints: Tuple[BaseConstraint, ...]
+    enforced_assignments: Tuple[AssignmentRow, ...]
+    hints: Tuple[AssignmentRow, ...]
+    is_repair_hints: bool
+
+
+class SolveInput(NamedTuple):
+    """
+    Entities decoded from a SolvePayload
+    """
+    population_type: PopulationType
+    shifts: List[Shift]
+    guards: List[BaseGuard]
+    constraints: List[BaseConstraint]
+    enforced_assignments: List[Assignment]
+    hints: List[Assignment]
+    is_repair_hints: bool
+
+
+def _encode_id(id_: Optional[PydanticObjectId]) -> Optional[str]:
+    return None if id_ is None else str(id_)
+
+
+def _decode_id(id_: Optional[str]) -> Optional[PydanticObjectId]:
+    return None if id_ is None else PydanticObjectId(id_)
+
+
+class _ShiftTable:
+    """
+    Assigns indices to shifts and shift types, in order of addition
+    """
+
+    def __init__(self):
+        self.shift_types: List[ShiftTypeRow] = []
+        self.shifts: List[ShiftRow] = []
+        self._shift_type_indices: Dict[int, int] = {}
+        self._shift_indices: Dict[int, int] = {}
+
+    def _add_shift_type(self, shift_type: ShiftTypeModel) -> int:
+        if id(shift_type) not in self._shift_type_indices:
+            self._shift_type_indices[id(shift_type)] = len(self.shift_types)
+            self.shift_types.append((
+                _encode_id(shift_type.id),
+                shift_type.name,
+                shift_type.slots_count,
+                shift_type.population_type,
+                tuple((day_type, score) for day_type, score in shift_type.score_config.items())
+            ))
+        return self._shift_type_indices[id(shift_type)]
+
+    def add(self, shift: Shift) -> int:
+        if id(shift) not in self._shift_indices:
+            self._shift_indices[id(shift)] = len(self.shifts)
+            score = None if shift.score is None else (shift.score.regular_score, shift.score.weekend_score)
+            self.shifts.append((
+                shift.date.toordinal(),
+                self._add_shift_type(shift.shift_type),
+                shift.is_holiday,
+                shift.num_days,
+                score,
+                _encode_id(shift.id_)
+            ))
+        return self._shift_indices[id(shift)]
+
+
+def _encode_guard(guard: BaseGuard, table: _ShiftTable) -> GuardRow:
+    return (
+        GUARD_TYPES.index(type(guard)),
+        _encode_id(guard.id_),
+        guard.name,
+        guard.time_in_duty,
+        guard.score_multiplier,
+        (guard.score.regular_score, guard.score.weekend_score),
+        guard.num_holidays,
+        tuple(date.toordinal() for date in guard.restrictions),
+        tuple(table.add(shift) for shift in guard.previous_shifts),
+        getattr(guard, "has_done_bhd1", None)
+    )
+
+
+def _encode_assignments(assignments: Iterable[Assignment],
+                        shift_indices: Dict[int, int],
+                        guard_indices: Dict[int, int]) -> Tuple[AssignmentRow, ...]:
+    return tuple((shift_indices[id(assignment.shift)], guard_indices[id(assignment.guard)])
+                 for assignment in assignments)
+
+
+def encode_solve_payload(population_type: PopulationType,
+                         shifts: Sequence[Shift],
+                         guards: Sequence[BaseGuard],
+                         constraints: Iterable[BaseConstraint],
+                         enforced_assignments: Iterable[Assignment] = (),
+                         hints: Iterable[Assignment] = (),
+                         is_repair_hints: bool = False) -> SolvePayload:
+    """
+    Encode a solve's input
+    :param population_type: population type of guards and shifts
+    :param shifts: shifts to assign
+    :param guards: guards to assign to shifts
+    :param constraints: constraints that should be enforced in the model
+    :param enforced_assignments: assignments that should be enforced in the model
+    :param hints: assignments that the model should be hinted with
+    :param is_repair_hints: whether the solver should stay as close as possible to the hinted assignments
+    :return: encoded payload
+    """
+    table = _ShiftTable()
+    for shift in shifts:
+        table.add(shift)
+    num_shifts = len(table.shifts)
+    encoded_guards = tuple(_encode_guard(guard=guard, table=table) for guard in guards)
+
+    shift_indices = {id(shift): i for i, shift in enumerate(shifts)}
+    guard_indices = {id(guard): i for i, guard in enumerate(guards)}
+
+    return SolvePayload(
+        population_type=population_type.value,
+        shift_types=tuple(table.shift_types),
+        shifts=tuple(table.shifts),
+        num_shifts=num_shifts,
+        guards=encoded_guards,
+        constraints=tuple(constraints),
+        enforced_assignments=_encode_assignments(enforced_assignments, shift_indices, guard_indices),
+        hints=_encode_assignments(hints, shift_indices, guard_indices),
+        is_repair_hints=is_repair_hints
+    )
+
+
+def _decode_shift_type(row: ShiftTypeRow) -> ShiftTypeModel:
+    id_, name, slots_count, population_type, score_config = row
+    # Shift types are only used as values in the model, so they are created without validation
+    return ShiftTypeModel.construct(id=_decode_id(id_),
+                                    name=name,
+                                    slots_count=slots_count,
+                                    population_type=population_type,
+                                    score_config=dict(score_config))
+
+
+def _decode_shift(row: ShiftRow, shift_types: List[ShiftTypeModel]) -> Shift:
+    date_ordinal, shift_type_index, is_holiday, num_days, score, id_ = row
+    return Shift(date=datetime.date.fromordinal(date_ordinal),
+                 shift_type=shift_types[shift_type_index],
+                 is_holiday=is_holiday,
+                 num_days=num_days,
+                 score=None if score is None else ScoreDeltaModel(regular_score=score[0], weekend_score=score[1]),
+                 id_=_decode_id(id_))
+
+
+def _decode_guard(row: GuardRow, shifts: List[Shift]) -> BaseGuard:
+    guard_type_index, id_, name, time_in_duty, score_multiplier, score, num_holidays, restrictions, \
+        previous_shifts, has_done_bhd1 = row
+
+    kwargs = dict(id_=_decode_id(id_),
+                  name=name,
+                  time_in_duty=time_in_duty,
+                  score_multiplier=score_multiplier,
+                  score=ScoreModel(regular_score=score[0], weekend_score=score[1]),
+                  num_holidays=num_holidays,
+                  restrictions=[datetime.date.fromordinal(date_ordinal) for date_ordinal in restrictions],
+                  previous_shifts=ShiftCollection([shifts[i] for i in previous_shifts]))
+    guard_type = GUARD_TYPES[guard_type_index]
+    if guard_type is OfficerGuard:
+        return OfficerGuard(has_done_bhd1=has_done_bhd1, **kwargs)
+    return guard_type(**kwargs)
+
+
+def decode_assignments(rows: Iterable[AssignmentRow],
+                       shifts: Sequence[Shift],
+                       guards: Sequence[BaseGuard]) -> List[Assignment]:
+    """
+    Decode assignments by the indices of their shifts and guards
+    :param rows: encoded assignments
+    :param shifts: shifts to assign, in the order they were encoded
+    :param guards: guards, in the order they were encoded
+    :return: list of assignments
+    """
+    return [Assignment(shift=shifts[shift_index], guard=guards[guard_index]) for shift_index, guard_index in rows]
+
+
+def encode_assignments(assignments: Iterable[Assignment],
+                       shifts: Sequence[Shift],
+                       guards: Sequence[BaseGuard]) -> Tuple[AssignmentRow, ...]:
+    """
+    Encode assignments by the indices of their shifts and guards
+    :param assignments: assignments to encode
+    :param shifts: shifts to assign, in the order they were encoded
+    :param guards: guards, in the order they were encoded
+    :return: encoded assignments
+    """
+    return _encode_assignments(assignments,
+                               shift_indices={id(shift): i for i, shift in enumerate(shifts)},
+                               guard_indices={id(guard): i for i, guard in enumerate(guards)})
+
+
+def decode_solve_payload(payload: SolvePayload) -> SolveInput:
+    """
+    Decode a solve's input into new entities
+    :param payload: encoded payload
+    :return: decoded entities
+    """
+    shift_types = [_decode_shift_type(row) for row in payload.shift_types]
+    all_shifts = [_decode_shift(row, shift_types=shift_types) for row in payload.shifts]
+    shifts = all_shifts[:payload.num_shifts]
+    guards = [_decode_guard(row, shifts=all_shifts) for row in payload.guards]
+
+    return SolveInput(
+        population_type=PopulationType(payload.population_type),
+        shifts=shifts,
+        guards=guards,
+        constraints=list(payload.constraints),
+        enforced_assignments=decode_assignments(payload.enforced_assignments, shifts=shifts, guards=guards),
+        hints=decode_assignments(payload.hints, shifts=shifts, guards=guards),
+        is_repair_hints=payload.is_repair_hints
+    )
@@ -0,0 +1,136 @@
+"""
+Streaming of intermediate solutions out of a running solve, so clients don't wait for the whole timeout to see a
+schedule, and can accept the best solution so far or cancel the solve
+"""
+import contextlib
+import threading
+from typing import Any, List, Optional, Set, Tuple, TYPE_CHECKING
+
+from beanie import PydanticObjectId
+from ortools.sat.python import cp_model
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    from assignments_model.models import GuardsAssignmentsModel
+
+# Assignment as (shift id, guard id)
+AssignmentIds = Tuple[Optional[PydanticObjectId], Optional[PydanticObjectId]]
+
+# Longest time it takes a running solve to notice that its channel was accepted
+CHANNEL_POLL_INTERVAL_IN_SECONDS = 0.1
+
+
+class SolutionEvent(BaseModel):
+    """
+    An improving solution of a model, as the difference from the previous solution of the same model
+    """
+    task_index: int = 0  # Index of assignment problem, in a batch of problems that are solved together
+    model: str
+    solution_number: int  # Number of solution in model, starting at 1
+    objective_value: float
+    best_objective_bound: float
+    wall_time: float
+    added: List[AssignmentIds] = []  # Assignments that weren't part of the previous solution
+    removed: List[AssignmentIds] = []  # Assignments of the previous solution that aren't part of this one
+
+
+class SolutionChannel:
+    """
+    Connects a solve to the server: improving solutions are put on a queue, and the server can ask the solve to stop,
+    either keeping its best solution (accept) or dropping it (cancel). Queue and events are proxies of a
+    multiprocessing manager, so the channel can be passed to solver processes
+    """
+
+    def __init__(self, queue: Any, accepted: Any, cancelled: Any, task_index: int = 0):
+        """
+        :param queue: queue of SolutionEvent objects
+        :param accepted: event that is set when the best solution so far should be kept
+        :param cancelled: event that is set when the solve should be dropped
+        :param task_index: index of assignment problem, in a batch of problems that are solved together
+        """
+        self.queue = queue
+        self.accepted = accepted
+        self.cancelled = cancelled
+        self.task_index = task_index
+
+    def publish(self, event: SolutionEvent):
+        self.queue.put(event)
+
+    def is_accepted(self) -> bool:
+        return self.accepted.is_set()
+
+    def is_cancelled(self) -> bool:
+        return self.cancelled.is_set()
+
+    def wait_for_cancel(self, timeout: float) -> bool:
+        """
+        Wait until the solve is cancelled
+        :param timeout: maximal time to wait, in seconds
+        :return: whether the solve was cancelled
+        """
+        return self.cancelled.wait(timeout)
+
+
+class SolutionStreamCallback(cp_model.CpSolverSolutionCallback):
+    """
+    Publishes every solution of a model to a channel, and stops the search when the channel asks to. The search is
+    stopped through the callback rather than CpSolver.StopSearch(), which doesn't reach a running Solve() in OR-Tools
+    9.5
+    """
+
+    def __init__(self, model: 'GuardsAssignmentsModel', channel: SolutionChannel):
+        super().__init__()
+        self.model_name = type(model).__name__
+        self.channel = channel
+        self.solution_number = 0
+        self._vars = [(var, (shift.id_, guard.id_)) for (shift, guard), var in model.assignment_vars.items()]
+        self._previous_assignments: Set[AssignmentIds] = set()
+
+    def on_solution_callback(self):
+        assignments = {assignment_ids for var, assignment_ids in self._vars if self.BooleanValue(var)}
+        self.solution_number += 1
+        self.channel.publish(SolutionEvent(task_index=self.channel.task_index,
+                                           model=self.model_name,
+                                           solution_number=self.solution_number,
+                                           objective_value=self.ObjectiveValue(),
+                                           best_objective_bound=self.BestObjectiveBound(),
+                                           wall_time=self.WallTime(),
+                                           added=list(assignments - self._previous_assignments),
+                                           removed=list(self._previous_assignments - assignments)))
+        self._previous_assignments = assignments
+
+        if self.channel.is_accepted() or self.channel.is_cancelled():
+            self.StopSearch()
+
+    def _should_stop(self) -> bool:
+        """
+        Check whether the search should stop. An accepted search keeps going until its first solution
+        :return: whether the search should stop
+        """
+        return self.channel.wait_for_cancel(timeout=CHANNEL_POLL_INTERVAL_IN_SECONDS) or \
+            (self.solution_number > 0 and self.channel.is_accepted())
+
+    @contextlib.contextmanager
+    def watch_channel(self):
+        """
+        Stop the wrapped search as soon as the channel asks to, even if no improving solution is found anymore
+        """
+        lock = threading.Lock()
+        is_solved = False
+
+        def watch():
+            while not is_solved:
+                if self._should_stop():
+                    with lock:
+                        if not is_solved:
+                            self.StopSearch()
+                    return
+
+        watcher = threading.Thread(target=watch, name="solution-channel-watcher", daemon=True)
+        watcher.start()
+        try:
+            yield
+        finally:
+            with lock:
+                is_solved = True
+            watcher.join()
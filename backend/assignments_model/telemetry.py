@@ -0,0 +1,109 @@
+"""
+Structured measurements of building and solving a model, so slow phases and constraints can be found
+"""
+import contextlib
+import timeit
+from typing import List, Optional
+
+from ortools.sat.python import cp_model
+from pydantic import BaseModel
+
+SOLUTION_STATUSES = (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+
+class PhaseTelemetry(BaseModel):
+    """
+    Time spent in a phase of building or solving a model, and the size it added to the model
+    """
+    name: str
+    seconds: float
+    num_variables: int = 0  # Number of variables added in phase
+    num_constraints: int = 0  # Number of constraints added in phase
+
+
+class ModelTelemetry(BaseModel):
+    """
+    Measurements of a single model, and the response of CP-SAT to its solve
+    """
+    model: str
+    num_variables: int = 0
+    num_constraints: int = 0
+    phases: List[PhaseTelemetry] = []
+    constraints: List[PhaseTelemetry] = []  # Applied constraints, in order of application
+
+    status: Optional[str] = None
+    objective_value: Optional[float] = None
+    best_objective_bound: Optional[float] = None
+    gap: Optional[float] = None  # Relative gap between objective and bound, 0 when the solution is proven optimal
+    num_conflicts: Optional[int] = None
+    num_branches: Optional[int] = None
+    wall_time: Optional[float] = None  # Solve time as measured by CP-SAT
+
+    def record_model_size(self, model: cp_model.CpModel):
+        model_proto = model.Proto()
+        self.num_variables = len(model_proto.variables)
+        self.num_constraints = len(model_proto.constraints)
+
+    def record_response(self, solver: cp_model.CpSolver, status: int):
+        """
+        Record the response of a finished solve
+        :param solver: solver that solved the model
+        :param status: status returned by the solve
+        """
+        self.status = solver.StatusName(status)
+        self.num_conflicts = solver.NumConflicts()
+        self.num_branches = solver.NumBranches()
+        self.wall_time = solver.WallTime()
+
+        if status in SOLUTION_STATUSES:
+            self.objective_value = solver.ObjectiveValue()
+            self.best_objective_bound = solver.BestObjectiveBound()
+            self.gap = abs(self.objective_value - self.best_objective_bound) / max(1.0, abs(self.objective_value))
+
+    def get_phase(self, name: str) -> Optional[PhaseTelemetry]:
+        return next((phase for phase in self.phases if phase.name == name), None)
+
+    def summary(self) -> str:
+        """
+        A single line description of the model's telemetry, for logs
+        """
+        phases = ", ".join(f"{phase.name}={phase.seconds:.3f}s" for phase in self.phases)
+        slowest_constraint = max(self.constraints, key=lambda constraint: constraint.seconds, default=None)
+        slowest = "" if slowest_constraint is None else \
+            f", slowest constraint {slowest_constraint.name}={slowest_constraint.seconds:.3f}s"
+        return f"{self.model}: {self.status}, objective={self.objective_value}, bound={self.best_objective_bound}, " \
+               f"conflicts={self.num_conflicts}, {self.num_variables} variables, " \
+               f"{self.num_constraints} constraints, {phases}{slowest}"
+
+
+@contextlib.contextmanager
+def measure_phase(phases: List[PhaseTelemetry], name: str, model: cp_model.CpModel):
+    """
+    Measure the time of the wrapped code and the variables and constraints it adds to the model, and append it to a
+    list of phases
+    :param phases: list to append the measured phase to
+    :param name: name of phase
+    :param model: model that the code adds to
+    """
+    model_proto = model.Proto()
+    num_variables_before = len(model_proto.variables)
+    num_constraints_before = len(model_proto.constraints)
+    time_before = timeit.default_timer()
+    try:
+        yield
+    finally:
+        phases.append(PhaseTelemetry(name=name,
+                                     seconds=timeit.default_timer() - time_before,
+                                     num_variables=len(model_proto.variables) - num_variables_before,
+                                     num_constraints=len(model_proto.constraints) - num_constraints_before))
+
+
+def to_server_timing(telemetry: List[ModelTelemetry]) -> str:
+    """
+    Format the phases of solved models as a Server-Timing header value, so they show up in browser dev tools
+    :param telemetry: telemetry of solved models
+    :return: header value
+    """
+    return ", ".join(f"{model_telemetry.model}_{phase.name};dur={phase.seconds * 1000:.1f}"
+                     for model_telemetry in telemetry
+                     for phase in model_telemetry.phases)
@@ -1,3 +1,7 @@
+import functools
+import math
+from typing import List
+
 from ortools.sat.python import cp_model
 
 
@@ -20,3 +24,19 @@ def calculate_abs_from_expression(model: cp_model.CpModel, expr):
     model.Add(abs_intvar >= -expr)
 
     return abs_intvar
+
+
+def get_common_multiple_weights(divisors: List[int], max_common_multiple: int) -> List[int]:
+    """
+    Get integer weights that scale each divisor to the same common multiple, so a value can be compared with others
+    after being divided by its divisor without dividing. If the least common multiple of divisors is larger than a
+    given maximum, the maximum is used instead and weights are rounded
+    :param divisors: positive divisors
+    :param max_common_multiple: maximal common multiple
+    :return: weight of each divisor
+    """
+    # math.lcm() only exists from Python 3.9
+    common_multiple = functools.reduce(lambda a, b: a * b // math.gcd(a, b), divisors, 1)
+    if common_multiple <= max_common_multiple:
+        return [common_multiple // divisor for divisor in divisors]
+    return [max(1, round(max_common_multiple / divisor)) for divisor in divisors]
@@ -1,21 +1,126 @@
 import asyncio
 import concurrent.futures
-from typing import List, Dict
+import logging
+import multiprocessing
+from typing import List, Dict, Callable, Optional, Tuple, NamedTuple, Iterable
 
 from beanie import PydanticObjectId
 from beanie.odm.operators.find.comparison import In
 from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
 
 from assignments_model.constraints import BaseConstraint
 from assignments_model.entities import HogerGuard, ShiftCollection, Shift, OfficerGuard, \
-    OfficerGuardCollection, BaseGuard, Assignment, HogerGuardCollection
-from assignments_model.errors import InfeasibleModelException
+    OfficerGuardCollection, BaseGuard, Assignment, HogerGuardCollection, AssignmentCollection
+from assignments_model.errors import InfeasibleModelException, SolveCancelledException
 from assignments_model.guards_manager import BaseGuardsManager, HogerGuardsManager, \
     OfficerGuardsManager
+from assignments_model.rolling_horizon import RollingHorizonManager
+from assignments_model.serialization import SolvePayload, SolveInput, AssignmentRow, encode_solve_payload, \
+    decode_solve_payload, encode_assignments, decode_assignments
+from assignments_model.solution_stream import SolutionChannel
+from assignments_model.telemetry import ModelTelemetry
+from config import settings
+from constants.constants import FairnessObjective
 from models.branch import BranchModel
 from models.shift import ShiftModel
 from models.structs import PopulationType
 from models.user import UserModel
+from utils.solution_stream import SolutionStream
+
+logger = logging.getLogger(__name__)
+
+# Shared by all solves, so concurrent requests don't use more CPU cores than the configured budget
+_solver_executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+
+def get_solver_executor() -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Get the persistent pool of processes that build and solve models, creating it on first use.
+    Processes are spawned rather than forked, so they don't inherit the event loop and DB client of the server
+    :return: solver process pool
+    """
+    global _solver_executor
+    if _solver_executor is None:
+        _solver_executor = concurrent.futures.ProcessPoolExecutor(max_workers=settings.max_concurrent_solves,
+                                                                  mp_context=multiprocessing.get_context("spawn"))
+    return _solver_executor
+
+
+def _solve_input(solve_input: SolveInput,
+                 num_search_workers: int,
+                 fairness_objective: FairnessObjective = FairnessObjective.DIVISION,
+                 explain_infeasibility: bool = False,
+                 solution_channel: Optional[SolutionChannel] = None) -> AssignmentCollection:
+    """
+    Build and solve guards managers from a decoded payload. Horizons longer than a window are solved as overlapping
+    windows, one after another
+    :param solve_input: decoded solve input
+    :param num_search_workers: number of CP-SAT workers of each model
+    :param fairness_objective: formulation of the models' objective
+    :param explain_infeasibility: whether an infeasible window should be solved again to find conflicting constraints.
+                                  Feasible windows are solved once either way
+    :param solution_channel: channel to publish improving solutions to, that can also stop the solve early
+    :return: assignments, with telemetry of the solved models
+    """
+    def create_manager(shifts: Iterable[Shift], explain_infeasibility: bool = False) -> BaseGuardsManager:
+        return create_guards_manager(population_type=solve_input.population_type,
+                                     guards=solve_input.guards,
+                                     shifts=list(shifts),
+                                     constraints=solve_input.constraints,
+                                     num_search_workers=num_search_workers,
+                                     timeout_in_seconds=settings.solver_timeout_in_seconds,
+                                     fairness_objective=fairness_objective,
+                                     explain_infeasibility=explain_infeasibility)
+
+    guards_manager = RollingHorizonManager(shifts=ShiftCollection(shifts=solve_input.shifts),
+                                           create_manager=create_manager,
+                                           window_days=settings.solver_window_days,
+                                           overlap_days=settings.solver_window_overlap_days,
+                                           explain_infeasibility=explain_infeasibility)
+    if solve_input.enforced_assignments:
+        guards_manager.enforce_assignments(assignments=solve_input.enforced_assignments)
+    if solve_input.hints:
+        guards_manager.add_hints(assignments=solve_input.hints, is_repair=solve_input.is_repair_hints)
+
+    return guards_manager.solve(solution_channel=solution_channel)
+
+
+def solve_payload(payload: SolvePayload,
+                  num_search_workers: int,
+                  fairness_objective: FairnessObjective = FairnessObjective.DIVISION,
+                  explain_infeasibility: bool = False,
+                  solution_channel: Optional[SolutionChannel] = None
+                  ) -> Tuple[Tuple[AssignmentRow, ...], List[ModelTelemetry]]:
+    """
+    Build and solve guards managers from an encoded payload, runs in a solver process
+    :param payload: encoded solve input
+    :param num_search_workers: number of CP-SAT workers of each model
+    :param fairness_objective: formulation of the models' objective
+    :param explain_infeasibility: whether an infeasible window should be solved again to find conflicting constraints.
+                                  Feasible windows are solved once either way
+    :param solution_channel: channel to publish improving solutions to, that can also stop the solve early
+    :return: encoded assignments, and telemetry of the solved models
+    """
+    solve_input = decode_solve_payload(payload)
+    assignments = _solve_input(solve_input, num_search_workers=num_search_workers,
+                               fairness_objective=fairness_objective, explain_infeasibility=explain_infeasibility,
+                               solution_channel=solution_channel)
+    return encode_assignments(assignments, shifts=solve_input.shifts, guards=solve_input.guards), \
+        assignments.telemetry
+
+
+class AutoAssignTask(NamedTuple):
+    """
+    An independent assignment problem: shifts and guards of a single branch and population type
+    """
+    branch: BranchModel
+    population_type: PopulationType
+    db_shifts_ids: List[PydanticObjectId]
+    db_users_ids: List[PydanticObjectId]
+    constraints: List[BaseConstraint]
+    overwrite_manual_assignments: bool
+    repair_previous_assignments: bool = False
 
 
 async def auto_assign_shifts(population_type: PopulationType,
@@ -23,7 +128,11 @@ async def auto_assign_shifts(population_type: PopulationType,
                              db_users_ids: List[PydanticObjectId],
                              constraints: List[BaseConstraint],
                              overwrite_manual_assignments: bool,
-                             branch: BranchModel):
+                             branch: BranchModel,
+                             repair_previous_assignments: bool = False,
+                             report_progress: Optional[Callable[[str], None]] = None,
+                             report_telemetry: Optional[Callable[[List[ModelTelemetry]], None]] = None,
+                             solution_stream: Optional[SolutionStream] = None):
     """
     Assign shifts to guards with automatic assignments model
     :param population_type: population type of users to assign to shifts
@@ -32,76 +141,226 @@ async def auto_assign_shifts(population_type: PopulationType,
     :param constraints: List of constraint objects that should be enforced in the model
     :param overwrite_manual_assignments: whether already assigned shifts should be reassigned
     :param branch: branch of guards to assign to shifts
+    :param repair_previous_assignments: whether reassigned shifts should stay as close as possible to their previous
+                                        assignments (only relevant when overwriting manual assignments)
+    :param report_progress: callback that is called with the name of each stage when it starts
+    :param report_telemetry: callback that is called with the telemetry of the solved models
+    :param solution_stream: stream to publish improving solutions to, that can also stop the solve early
     :return: list of assigned shifts
     """
-    # Get DB objects for shifts & guards
-    db_shifts = await ShiftModel.find(In(ShiftModel.id, db_shifts_ids), ShiftModel.branch == branch.id).to_list()
-    db_users = await UserModel.find(In(UserModel.id, db_users_ids), UserModel.branch == branch.id).to_list()
+    task = AutoAssignTask(branch=branch,
+                          population_type=population_type,
+                          db_shifts_ids=db_shifts_ids,
+                          db_users_ids=db_users_ids,
+                          constraints=constraints,
+                          overwrite_manual_assignments=overwrite_manual_assignments,
+                          repair_previous_assignments=repair_previous_assignments)
 
-    assert len(db_shifts) == len(db_shifts_ids) and len(db_users) == len(db_users_ids), \
-        "Mismatch between number of given ids and number of found users/shifts in DB"
-    assert all(population_type in user.population_types for user in db_users), \
-        f"Not all users are part of a '{population_type}' population"
-    # TODO: check that all shifts belong to population_type
+    def report_task_telemetry(telemetry: List[List[ModelTelemetry]]):
+        if report_telemetry is not None:
+            report_telemetry(telemetry[0])
 
-    # Map DB object id to object
+    return await auto_assign_shifts_batch(tasks=[task],
+                                          report_progress=report_progress,
+                                          report_telemetry=report_task_telemetry,
+                                          solution_stream=solution_stream)
+
+
+async def auto_assign_shifts_batch(tasks: List[AutoAssignTask],
+                                   report_progress: Optional[Callable[[str], None]] = None,
+                                   report_telemetry: Optional[Callable[[List[List[ModelTelemetry]]], None]] = None,
+                                   solution_stream: Optional[SolutionStream] = None):
+    """
+    Assign shifts to guards in many independent problems (e.g. all branches and populations at the end of a month).
+    Shifts and users of all problems are fetched together, problems are solved in parallel by the solver processes,
+    and all assignments are saved together. If any problem fails, nothing is saved
+    :param tasks: assignment problems, each of a different branch and population type
+    :param report_progress: callback that is called with the name of each stage when it starts
+    :param report_telemetry: callback that is called with the telemetry of the solved models of each problem, in order
+                             of tasks
+    :param solution_stream: stream to publish improving solutions of all problems to, that can also stop the solves
+                            early. Once the best solutions are accepted, every model that is left stops at its first
+                            solution. Nothing is saved if the solves are cancelled
+    :return: list of assigned shifts of all problems, in order of tasks
+    """
+    if report_progress is None:
+        def report_progress(_: str):
+            pass
+
+    all_db_shifts_ids = [db_shift_id for task in tasks for db_shift_id in task.db_shifts_ids]
+    assert len(set(all_db_shifts_ids)) == len(all_db_shifts_ids), "A shift can't be assigned in more than one task"
+    assert len({(task.branch.id, task.population_type) for task in tasks}) == len(tasks), \
+        "A branch and population type can't be assigned in more than one task"
+
+    # Get DB objects for shifts & guards of all tasks
+    report_progress("loading")
+    db_shifts = await ShiftModel.find(In(ShiftModel.id, all_db_shifts_ids)).to_list()
+    db_users = await UserModel.find(In(UserModel.id, list({db_user_id
+                                                           for task in tasks
+                                                           for db_user_id in task.db_users_ids}))).to_list()
     db_shifts_by_id: Dict[PydanticObjectId, ShiftModel] = {db_shift.id: db_shift for db_shift in db_shifts}
+    db_users_by_id: Dict[PydanticObjectId, UserModel] = {db_user.id: db_user for db_user in db_users}
+    model_shifts = await ShiftModel.to_shifts(db_shifts)
+    model_shifts_by_id = {db_shift.id: shift for db_shift, shift in zip(db_shifts, model_shifts)}
+    old_assigned_user_ids = {db_shift.id: db_shift.assigned_user_id for db_shift in db_shifts}
+
+    problems = [_create_problem(task=task,
+                                db_shifts_by_id=db_shifts_by_id,
+                                db_users_by_id=db_users_by_id,
+                                model_shifts_by_id=model_shifts_by_id)
+                for task in tasks]
+
+    # Build and solve models in solver processes, so the event loop isn't blocked by the builds, and independent
+    # problems are solved at the same time (as much as the solver processes allow)
+    report_progress("solving")
+    if solution_stream is not None and solution_stream.is_cancelled():
+        raise HTTPException(status_code=409, detail="Auto assignment was cancelled")
+    results = await asyncio.gather(*(
+        _solve_in_solver_process(problem.payload,
+                                 solution_channel=None if solution_stream is None else
+                                 solution_stream.create_channel(task_index=task_index))
+        for task_index, problem in enumerate(problems)
+    ))
+
+    for task, problem, (assignment_rows, telemetry) in zip(tasks, problems, results):
+        for assignment in decode_assignments(assignment_rows, shifts=problem.shifts, guards=problem.guards):
+            db_shift = db_shifts_by_id[assignment.shift.id_]
+            db_shift.assigned_user_id = assignment.guard.id_
+            db_shift.score = assignment.guard.calculate_score_for_shift(assignment.shift)
+
+        for model_telemetry in telemetry:
+            logger.info(f"Auto assignment of {len(problem.shifts)} shifts to {len(problem.guards)} "
+                        f"{task.population_type.value} guards of branch {task.branch.id}, {model_telemetry.summary()}")
+    if report_telemetry is not None:
+        report_telemetry([telemetry for _, telemetry in results])
+
+    report_progress("saving")
+    assigned_db_shifts = [db_shifts_by_id[db_shift_id] for db_shift_id in all_db_shifts_ids]
+    await ShiftModel.save_assignments(assigned_db_shifts)  # Save assignments of all tasks to DB
+
+    # Update calculated score of guards of all tasks, and of guards that were previously assigned to their shifts
+    user_populations = [(db_users_by_id[db_user_id], task.population_type)
+                        for task in tasks
+                        for db_user_id in task.db_users_ids]
+    old_user_populations = {(old_assigned_user_ids[db_shift_id], task.population_type)
+                            for task in tasks
+                            for db_shift_id in task.db_shifts_ids
+                            if old_assigned_user_ids[db_shift_id] is not None}
+    missing_user_ids = {user_id for user_id, _ in old_user_populations} - set(db_users_by_id)
+    if missing_user_ids:
+        db_users_by_id.update({db_user.id: db_user
+                               for db_user in await UserModel.find(In(UserModel.id, list(missing_user_ids))).to_list()})
+    user_populations += [(db_users_by_id[user_id], population_type)
+                         for user_id, population_type in old_user_populations
+                         if user_id in db_users_by_id]
+    await UserModel.bulk_recalculate_scores(user_populations)
+
+    return assigned_db_shifts
+
+
+class _AssignmentProblem(NamedTuple):
+    """
+    Model entities of an AutoAssignTask, and their encoded payload
+    """
+    shifts: List[Shift]
+    guards: List[BaseGuard]
+    payload: SolvePayload
+
+
+def _create_problem(task: AutoAssignTask,
+                    db_shifts_by_id: Dict[PydanticObjectId, ShiftModel],
+                    db_users_by_id: Dict[PydanticObjectId, UserModel],
+                    model_shifts_by_id: Dict[PydanticObjectId, Shift]) -> _AssignmentProblem:
+    """
+    Validate a task against the fetched DB objects, and convert it to model entities
+    :param task: assignment task
+    :param db_shifts_by_id: dict that maps DB id of shifts to DB ShiftModel objects, of all tasks
+    :param db_users_by_id: dict that maps DB id of users to DB UserModel objects, of all tasks
+    :param model_shifts_by_id: dict that maps DB id of shifts to assignments model Shift objects, of all tasks
+    :return: the task's assignment problem
+    """
+    db_shifts = [db_shifts_by_id[db_shift_id] for db_shift_id in task.db_shifts_ids
+                 if db_shift_id in db_shifts_by_id and db_shifts_by_id[db_shift_id].branch == task.branch.id]
+    db_users = [db_users_by_id[db_user_id] for db_user_id in task.db_users_ids
+                if db_user_id in db_users_by_id and db_users_by_id[db_user_id].branch == task.branch.id]
+
+    assert len(db_shifts) == len(task.db_shifts_ids) and len(db_users) == len(task.db_users_ids), \
+        "Mismatch between number of given ids and number of found users/shifts in DB"
+    assert all(task.population_type in user.population_types for user in db_users), \
+        f"Not all users are part of a '{task.population_type}' population"
+    # TODO: check that all shifts belong to population_type
 
     # Map DB object id to converted assignments_model objects
-    model_shifts_by_id = {db_shift.id: await db_shift.to_shift() for db_shift in db_shifts}
-    model_guards_by_id = {db_user.id: db_user.to_guard(population_type=population_type) for db_user in db_users}
+    task_db_shifts_by_id = {db_shift.id: db_shift for db_shift in db_shifts}
+    task_model_shifts_by_id = {db_shift.id: model_shifts_by_id[db_shift.id] for db_shift in db_shifts}
+    model_guards_by_id = {db_user.id: db_user.to_guard(population_type=task.population_type) for db_user in db_users}
 
-    shifts: List[Shift] = list(model_shifts_by_id.values())
+    shifts: List[Shift] = list(task_model_shifts_by_id.values())
     guards: List[BaseGuard] = list(model_guards_by_id.values())
 
-    guards_manager: BaseGuardsManager = create_guards_manager(population_type=population_type,
-                                                              guards=guards,
-                                                              shifts=shifts,
-                                                              constraints=constraints)
-
-    if not overwrite_manual_assignments:
-        manual_assignments = get_manual_assignments(db_shifts_by_id=db_shifts_by_id,
-                                                    model_shifts_by_id=model_shifts_by_id,
-                                                    model_guards_by_id=model_guards_by_id)
+    manual_assignments = []
+    previous_assignments = []
+    if not task.overwrite_manual_assignments:
         # Enforce manual assignments set in advance
-        if manual_assignments:
-            guards_manager.enforce_assignments(assignments=manual_assignments)
+        manual_assignments = get_manual_assignments(db_shifts_by_id=task_db_shifts_by_id,
+                                                    model_shifts_by_id=task_model_shifts_by_id,
+                                                    model_guards_by_id=model_guards_by_id)
+    else:
+        # Start searching from the current schedule instead of enforcing it
+        previous_assignments = get_manual_assignments(db_shifts_by_id=task_db_shifts_by_id,
+                                                      model_shifts_by_id=task_model_shifts_by_id,
+                                                      model_guards_by_id=model_guards_by_id,
+                                                      skip_unknown_guards=True)
+
+    payload = encode_solve_payload(population_type=task.population_type,
+                                   shifts=shifts,
+                                   guards=guards,
+                                   constraints=task.constraints,
+                                   enforced_assignments=manual_assignments,
+                                   hints=previous_assignments,
+                                   is_repair_hints=task.repair_previous_assignments)
+    return _AssignmentProblem(shifts=shifts, guards=guards, payload=payload)
 
-    # Solve model
+
+async def _solve_in_solver_process(payload: SolvePayload,
+                                   solution_channel: Optional[SolutionChannel] = None
+                                   ) -> Tuple[Tuple[AssignmentRow, ...], List[ModelTelemetry]]:
+    """
+    Solve an encoded payload in the shared solver processes
+    :param payload: encoded solve input
+    :param solution_channel: channel to publish improving solutions to, that can also stop the solve early
+    :return: encoded assignments, and telemetry of the solved models
+    """
     try:
         loop = asyncio.get_event_loop()
-        with concurrent.futures.ThreadPoolExecutor() as pool:
-            assignments = await loop.run_in_executor(pool, guards_manager.solve)
+        return await loop.run_in_executor(get_solver_executor(), solve_payload, payload,
+                                          settings.solver_num_search_workers, settings.solver_fairness_objective,
+                                          settings.solver_explain_infeasibility, solution_channel)
+    except SolveCancelledException:
+        raise HTTPException(status_code=409, detail="Auto assignment was cancelled")
     except InfeasibleModelException as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-    old_assigned_user_ids = set(db_shift.assigned_user_id for db_shift in db_shifts if db_shift.assigned_user_id)
-    for assignment in assignments:
-        db_shifts_by_id[assignment.shift.id_].assigned_user_id = assignment.guard.id_
-        db_shifts_by_id[assignment.shift.id_].score = assignment.guard.calculate_score_for_shift(assignment.shift)
-
-    await ShiftModel.replace_many(list(db_shifts_by_id.values()))  # Save assignments to DB
-
-    # Update calculated score of relevant users
-    for user in db_users:
-        await user.recalculate_score(population_type=population_type)
-    old_db_users_assigned = await UserModel.find(In(UserModel.id, old_assigned_user_ids)).to_list()
-    for user in old_db_users_assigned:
-        await user.recalculate_score(population_type=population_type)
-
-    return db_shifts
+        raise HTTPException(status_code=500,
+                            detail={"message": str(e), "conflicts": jsonable_encoder(e.conflicts)})
 
 
 def create_guards_manager(population_type: PopulationType,
                           guards: List[BaseGuard],
                           shifts: List[Shift],
-                          constraints: List[BaseConstraint]) -> BaseGuardsManager:
+                          constraints: List[BaseConstraint],
+                          num_search_workers: int = 8,
+                          timeout_in_seconds: float = 10.0,
+                          fairness_objective: FairnessObjective = FairnessObjective.DIVISION,
+                          explain_infeasibility: bool = False) -> BaseGuardsManager:
     """
     Create and initialize a GuardsManager according to its type
     :param population_type: population type that will be mapped to guards manager
     :param guards: guards for manager's initialization
     :param shifts: shifts for manager's initialization
     :param constraints: List of constraint objects that should be enforced in the model
+    :param num_search_workers: number of CP-SAT workers of each model
+    :param timeout_in_seconds: solve timeout of each model
+    :param fairness_objective: formulation of the models' objective
+    :param explain_infeasibility: whether the models should find conflicting constraints when they're infeasible
     :return: a subclass of BaseGuardsManager of the specified type
     """
     # TODO: validate all shifts are from the same branch and relate to the same model type
@@ -109,23 +368,34 @@ def create_guards_manager(population_type: PopulationType,
         assert all(isinstance(guard, HogerGuard) for guard in guards), "Guard types don't match guards manager type"
         guards: List[HogerGuard]
         return HogerGuardsManager(guards=HogerGuardCollection(guards=guards),
-                                  shifts=ShiftCollection(shifts=shifts), constraints=constraints)
+                                  shifts=ShiftCollection(shifts=shifts), constraints=constraints,
+                                  num_search_workers=num_search_workers,
+                                  timeout_in_seconds=timeout_in_seconds,
+                                  fairness_objective=fairness_objective,
+                                  explain_infeasibility=explain_infeasibility)
 
     elif population_type == PopulationType.OFFICER:
         assert all(isinstance(guard, OfficerGuard) for guard in guards), "Guard types don't match guards manager type"
         guards: List[OfficerGuard]
         return OfficerGuardsManager(guards=OfficerGuardCollection(guards=guards),
-                                    shifts=ShiftCollection(shifts=shifts), constraints=constraints)
+                                    shifts=ShiftCollection(shifts=shifts), constraints=constraints,
+                                    num_search_workers=num_search_workers,
+                                    timeout_in_seconds=timeout_in_seconds,
+                                    fairness_objective=fairness_objective,
+                                    explain_infeasibility=explain_infeasibility)
 
 
 def get_manual_assignments(db_shifts_by_id: Dict[PydanticObjectId, ShiftModel],
                            model_shifts_by_id: Dict[PydanticObjectId, Shift],
-                           model_guards_by_id: Dict[PydanticObjectId, BaseGuard]) -> List[Assignment]:
+                           model_guards_by_id: Dict[PydanticObjectId, BaseGuard],
+                           skip_unknown_guards: bool = False) -> List[Assignment]:
     """
     Retrieve assignments set in advance and were saved in DB
     :param db_shifts_by_id: dict that maps DB id of shifts to DB ShiftModel objects
     :param model_shifts_by_id: dict that maps DB id of shifts to assignments model Shift objects
     :param model_guards_by_id: dict that maps DB id of guards to assignments model Guard objects
+    :param skip_unknown_guards: whether assignments of guards that aren't on guards list should be skipped, instead of
+                                failing
     :return: list of manual Assignment objects
     """
     manual_assignments = []
@@ -133,6 +403,8 @@ def get_manual_assignments(db_shifts_by_id: Dict[PydanticObjectId, ShiftModel],
         # If assignment was manually set
         if db_shift.assigned_user_id:
             assigned_user_id = db_shift.assigned_user_id
+            if skip_unknown_guards and assigned_user_id not in model_guards_by_id:
+                continue
             assert assigned_user_id in model_guards_by_id, f"Assigned guard with id {assigned_user_id}" \
                                                            f" isn't on guards list"
             manual_assignments.append(
@@ -1,9 +1,38 @@
+import os
+
 from pydantic import BaseSettings
 
+from constants.constants import FairnessObjective
+
 
 class Settings(BaseSettings):
     microsoft_login_redirect_uri: str = ""
     environment: str = "development"
 
+    # Number of CPU cores that all running solves may use together
+    solver_cpu_budget: int = os.cpu_count() or 1
+    # Number of CP-SAT workers of each solve
+    solver_num_search_workers: int = 8
+    # Formulation of the objective of auto assignment models
+    solver_fairness_objective: FairnessObjective = FairnessObjective.DIVISION
+    # Solve timeout of each model
+    solver_timeout_in_seconds: float = 10.0
+    # Horizons longer than a window are solved as overlapping windows, one after another
+    solver_window_days: int = 35
+    solver_window_overlap_days: int = 7
+    # Whether infeasible auto assignments are solved again to find the constraints that conflict
+    solver_explain_infeasibility: bool = True
+    # How long a finished auto assignment job can be queried
+    assignment_jobs_retention_seconds: int = 60 * 60
+    # How long responses of read-mostly endpoints are cached
+    read_cache_ttl_seconds: int = 5 * 60
+    # How long, and for how many users, authenticated users are cached
+    auth_cache_ttl_seconds: int = 30
+    auth_cache_max_size: int = 1024
+
+    @property
+    def max_concurrent_solves(self) -> int:
+        return max(1, self.solver_cpu_budget // self.solver_num_search_workers)
+
 
 settings = Settings()
@@ -1,4 +1,4 @@
-from enum import IntEnum
+from enum import Enum, IntEnum
 
 
 class Weekday(IntEnum):
@@ -11,6 +11,15 @@ class Weekday(IntEnum):
     SUNDAY_WEEKDAY = 6
 
 
+class FairnessObjective(str, Enum):
+    """
+    Formulation of the models' objective, that minimizes the deviation of guards' scores weighted by their time in
+    duty
+    """
+    DIVISION = "division"  # Divide every guard's score by his time in duty, with integer division constraints
+    LINEAR = "linear"  # Multiply every guard's score by a common multiple of all times in duty, with linear constraints
+
+
 USER_NOT_FOUND = "User not found"
 
 SCALAR = 100
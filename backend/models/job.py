@@ -0,0 +1,30 @@
+import datetime
+from enum import Enum
+from typing import Any, Dict, Optional
+
+from beanie import PydanticObjectId
+from pydantic import BaseModel, Field
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobModel(BaseModel):
+    """
+    Public state of a background job
+    """
+    id: str
+    owner_id: PydanticObjectId
+    status: JobStatus = JobStatus.QUEUED
+    progress: Optional[str] = None  # Current stage of the job
+    error: Optional[str] = None
+    details: Dict[str, Any] = {}  # Job specific details, e.g. telemetry of an auto assignment
+    created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+    finished_at: Optional[datetime.datetime] = None
+
+    def is_finished(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
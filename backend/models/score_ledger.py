@@ -0,0 +1,65 @@
+"""
+Incremental maintenance of users' scores. Instead of recalculating a user's score from all of his shifts, every
+change of a shift's assignee or score is applied as a signed delta with an atomic $inc.
+A full recalculation (UserModel.recalculate_score, UserModel.bulk_recalculate_score) remains the way to reconcile
+scores with the shifts in DB
+"""
+from collections import defaultdict
+from typing import Optional, Dict, Tuple, Iterable
+
+from models.score import ScoreDeltaModel, ScoreModel
+from models.shift import ShiftModel
+from models.structs import PopulationType, UserKey
+from models.user import UserModel
+
+
+def score_difference(new_score: ScoreModel, old_score: ScoreModel) -> ScoreDeltaModel:
+    return ScoreDeltaModel(regular_score=new_score.regular_score - old_score.regular_score,
+                           weekend_score=new_score.weekend_score - old_score.weekend_score)
+
+
+async def apply_score_delta(user_id: UserKey, population_type: PopulationType, delta: ScoreDeltaModel) -> bool:
+    """
+    Atomically add a delta to a user's score
+    :param user_id: id of the user
+    :param population_type: population type of the score
+    :param delta: signed score delta
+    :return: whether the user's score was modified
+    """
+    if delta.regular_score == 0 and delta.weekend_score == 0:
+        return False
+
+    result = await UserModel.get_motor_collection().update_one(
+        {"_id": user_id, "population_settings.population_type": population_type.value},
+        {"$inc": {"population_settings.$.score.regular_score": delta.regular_score,
+                  "population_settings.$.score.weekend_score": delta.weekend_score}}
+    )
+    return result.modified_count > 0
+
+
+async def apply_score_deltas(deltas: Iterable[Tuple[UserKey, PopulationType, ScoreDeltaModel]]):
+    """
+    Sum deltas of the same user and population type, and apply them
+    :param deltas: (user id, population type, signed score delta) tuples
+    """
+    summed_deltas: Dict[Tuple[UserKey, PopulationType], ScoreDeltaModel] = defaultdict(ScoreDeltaModel)
+    for user_id, population_type, delta in deltas:
+        summed_deltas[user_id, population_type] += delta
+
+    for (user_id, population_type), delta in summed_deltas.items():
+        await apply_score_delta(user_id=user_id, population_type=population_type, delta=delta)
+
+
+async def apply_shift_change(old_shift: Optional[ShiftModel], new_shift: Optional[ShiftModel]):
+    """
+    Apply the change of a shift to its assignees' scores: the old assignee loses the old score, and the new assignee
+    gets the new score
+    :param old_shift: shift before the change, or None if it was created
+    :param new_shift: shift after the change, or None if it was deleted
+    """
+    deltas = []
+    if old_shift is not None and old_shift.assigned_user_id is not None:
+        deltas.append((old_shift.assigned_user_id, old_shift.population_type, old_shift.score * -1))
+    if new_shift is not None and new_shift.assigned_user_id is not None:
+        deltas.append((new_shift.assigned_user_id, new_shift.population_type, new_shift.score))
+    await apply_score_deltas(deltas)
@@ -1,8 +1,12 @@
 from datetime import timedelta
-from typing import Optional
+from typing import Optional, List, Dict, Tuple, Type, Union
 
-from beanie import Document
+from beanie import Document, PydanticObjectId
+from beanie.odm.operators.find.comparison import In
+from beanie.odm.queries.find import FindMany
 from fastapi_permissions import Allow, Authenticated
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING, UpdateOne
 
 from assignments_model.entities import Shift
 from models.utils import user_role_to_string
@@ -14,6 +18,21 @@ from models.shift_type import ShiftTypeKey, ShiftTypeModel
 from models.structs import Date, PopulationType, UserKey
 
 
+class ShiftScoreView(BaseModel):
+    """
+    Projection of a shift for summing scores
+    """
+    score: ScoreDeltaModel
+
+
+class ShiftCalendarView(BaseModel):
+    """
+    Projection of a shift for calendar exports
+    """
+    date: Date
+    shift_type: ShiftTypeKey
+
+
 class ShiftModel(Document):
     date: Date
     shift_type: ShiftTypeKey
@@ -28,6 +47,17 @@ class ShiftModel(Document):
 
     class Collection:
         name = "shifts"
+        indexes = [
+            # Shifts in a date range, optionally of a branch and population, in pages (get_shifts, by_date)
+            IndexModel([("date", ASCENDING), ("_id", ASCENDING)], name="date_id"),
+            IndexModel([("branch", ASCENDING), ("population_type", ASCENDING), ("date", ASCENDING),
+                        ("_id", ASCENDING)],
+                       name="branch_population_type_date_id"),
+            # Shifts of a user, and sums of scores per user (get_shifts, sum_scores_by_user)
+            IndexModel([("assigned_user_id", ASCENDING), ("population_type", ASCENDING), ("date", ASCENDING),
+                        ("_id", ASCENDING)],
+                       name="assigned_user_id_population_type_date_id"),
+        ]
 
     async def to_shift(self) -> Shift:
         """
@@ -35,6 +65,24 @@ class ShiftModel(Document):
         :return: assignments' model Shift object
         """
         shift_type_model = await ShiftTypeModel.get(self.shift_type)
+        return self._to_shift(shift_type_model=shift_type_model)
+
+    @classmethod
+    async def to_shifts(cls, db_shifts: List['ShiftModel']) -> List[Shift]:
+        """
+        Convert DB shift objects to assignments' model Shift objects, fetching all of their shift types in a single
+        query. Shifts of the same type share the same ShiftTypeModel object
+        :param db_shifts: DB shift objects
+        :return: assignments' model Shift objects, in the same order
+        """
+        shift_type_ids = list({db_shift.shift_type for db_shift in db_shifts})
+        shift_types: Dict[ShiftTypeKey, ShiftTypeModel] = {
+            shift_type.id: shift_type
+            for shift_type in await ShiftTypeModel.find(In(ShiftTypeModel.id, shift_type_ids)).to_list()
+        }
+        return [db_shift._to_shift(shift_type_model=shift_types.get(db_shift.shift_type)) for db_shift in db_shifts]
+
+    def _to_shift(self, shift_type_model: Optional[ShiftTypeModel]) -> Shift:
         date = self.date.date()
 
         return Shift(
@@ -47,22 +95,24 @@ class ShiftModel(Document):
         )
 
     @classmethod
-    async def get_shifts(cls,
-                         start_date: Optional[Date] = None,
-                         end_date: Optional[Date] = None,
-                         branch_name: Optional[str] = None,
-                         user_id: Optional[UserKey] = None,
-                         population_type: Optional[PopulationType] = None):
+    def find_shifts(cls,
+                    *extra_filters,
+                    start_date: Optional[Date] = None,
+                    end_date: Optional[Date] = None,
+                    branch_name: Optional[str] = None,
+                    user_id: Optional[UserKey] = None,
+                    population_type: Optional[PopulationType] = None) -> FindMany:
         """
-        Get all shifts by given criteria
+        Query of all shifts by given criteria, ordered by date and then by id
+        :param extra_filters: more filters of shifts
         :param start_date: limit results to shifts from this date
         :param end_date: limit results to shifts until this date (inclusive)
         :param branch_name: limit results by shift's branch name
         :param user_id: filter shifts by specific user
         :param population_type: filter shifts by specific population type
-        :return: list of shifts as they are saved in DB
+        :return: query of shifts
         """
-        filters = []
+        filters = list(extra_filters)
         if start_date is not None:
             filters.append(ShiftModel.date >= start_date)
         if end_date is not None:
@@ -74,9 +124,125 @@ class ShiftModel(Document):
         if population_type is not None:
             filters.append(ShiftModel.population_type == population_type)
 
-        shifts = await cls.find(*filters).sort("+date").to_list()
+        return cls.find(*filters).sort("+date", "+_id")
+
+    @classmethod
+    async def get_shifts(cls,
+                         start_date: Optional[Date] = None,
+                         end_date: Optional[Date] = None,
+                         branch_name: Optional[str] = None,
+                         user_id: Optional[UserKey] = None,
+                         population_type: Optional[PopulationType] = None,
+                         projection_model: Optional[Type[BaseModel]] = None):
+        """
+        Get all shifts by given criteria
+        :param start_date: limit results to shifts from this date
+        :param end_date: limit results to shifts until this date (inclusive)
+        :param branch_name: limit results by shift's branch name
+        :param user_id: filter shifts by specific user
+        :param population_type: filter shifts by specific population type
+        :param projection_model: model of the fields to fetch, instead of whole shifts
+        :return: list of shifts as they are saved in DB, or of their projections
+        """
+        query = cls.find_shifts(start_date=start_date,
+                                end_date=end_date,
+                                branch_name=branch_name,
+                                user_id=user_id,
+                                population_type=population_type)
+        if projection_model is not None:
+            query = query.project(projection_model)
+        shifts = await query.to_list()
         return shifts
 
+    @classmethod
+    async def group_by_date(cls,
+                            start_date: Optional[Date] = None,
+                            end_date: Optional[Date] = None,
+                            branch_name: Optional[str] = None,
+                            population_type: Optional[PopulationType] = None,
+                            is_compact: bool = False) -> List[Union['ShiftsDateBucket', 'CompactShiftsDateBucket']]:
+        """
+        Group shifts by their date in a single aggregation
+        :param start_date: limit results to shifts from this date
+        :param end_date: limit results to shifts until this date (inclusive)
+        :param branch_name: limit results by shift's branch name
+        :param population_type: filter shifts by specific population type
+        :param is_compact: whether only the id, type and assignee of shifts should be returned
+        :return: buckets of shifts of each date, ordered by date
+        """
+        if is_compact:
+            shift_fields = {"_id": "$_id", "shift_type": "$shift_type", "assigned_user_id": "$assigned_user_id"}
+            bucket_model = CompactShiftsDateBucket
+        else:
+            shift_fields = "$$ROOT"
+            bucket_model = ShiftsDateBucket
+
+        pipeline = [
+            {"$sort": {"date": 1, "_id": 1}},
+            # Shifts are grouped by calendar day, so shifts of the same date with different times share a bucket
+            {"$group": {"_id": {"$dateFromParts": {"year": {"$year": "$date"},
+                                                   "month": {"$month": "$date"},
+                                                   "day": {"$dayOfMonth": "$date"}}},
+                        "shifts": {"$push": shift_fields}}},
+            {"$sort": {"_id": 1}},
+            {"$project": {"_id": 0, "date": "$_id", "shifts": 1}},
+        ]
+        query = cls.find_shifts(start_date=start_date,
+                                end_date=end_date,
+                                branch_name=branch_name,
+                                population_type=population_type)
+        return await query.aggregate(pipeline, projection_model=bucket_model).to_list()
+
+    @classmethod
+    async def sum_scores_by_user(cls,
+                                 user_ids: Optional[List[UserKey]] = None,
+                                 population_type: Optional[PopulationType] = None
+                                 ) -> Dict[Tuple[UserKey, PopulationType], ScoreDeltaModel]:
+        """
+        Sum the scores of assigned shifts per user and population type, in a single aggregation
+        :param user_ids: limit results to shifts assigned to these users
+        :param population_type: limit results to shifts of a specific population type
+        :return: dict that maps (user id, population type) to the sum of his shifts' scores. Users without shifts
+                 are missing from it
+        """
+        match = {"assigned_user_id": {"$ne": None}}
+        if user_ids is not None:
+            match["assigned_user_id"] = {"$in": list(user_ids)}
+        if population_type is not None:
+            match["population_type"] = population_type.value
+
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"user_id": "$assigned_user_id", "population_type": "$population_type"},
+                "regular_score": {"$sum": "$score.regular_score"},
+                "weekend_score": {"$sum": "$score.weekend_score"},
+            }},
+        ]
+        return {
+            (group["_id"]["user_id"], PopulationType(group["_id"]["population_type"])):
+                ScoreDeltaModel(regular_score=group["regular_score"], weekend_score=group["weekend_score"])
+            for group in await cls.aggregate(pipeline).to_list()
+        }
+
+    @classmethod
+    async def save_assignments(cls, db_shifts: List['ShiftModel']) -> int:
+        """
+        Save the assigned guards and scores of many shifts with a single bulk write, without replacing the shifts
+        :param db_shifts: shifts to save
+        :return: number of modified shifts
+        """
+        if not db_shifts:
+            return 0
+
+        operations = [
+            UpdateOne({"_id": db_shift.id},
+                      {"$set": {"assigned_user_id": db_shift.assigned_user_id, "score": db_shift.score.dict()}})
+            for db_shift in db_shifts
+        ]
+        result = await cls.get_motor_collection().bulk_write(operations, ordered=False)
+        return result.modified_count
+
     async def default_score(self) -> ScoreDeltaModel:
         """
         Default score for shift with given parameters
@@ -109,13 +275,16 @@ class ShiftModel(Document):
         Update shift's score
         :param score: new score
         """
+        from models.score_ledger import score_difference, apply_score_delta
+
+        old_score = self.score
         self.score = score
         await self.save()
 
         if self.assigned_user_id:
-            from models.user import UserModel
-            guard = await UserModel.get(self.assigned_user_id)
-            await guard.recalculate_score(population_type=self.population_type)
+            await apply_score_delta(user_id=self.assigned_user_id,
+                                    population_type=self.population_type,
+                                    delta=score_difference(new_score=score, old_score=old_score))
 
         return self.score
 
@@ -124,19 +293,13 @@ class ShiftModel(Document):
         Update shift's score
         :param new_assigned_user_id: new assigned user id
         """
+        from models.score_ledger import apply_shift_change
 
-        old_assigned_user_id = self.assigned_user_id
+        old_shift = self.copy()
         self.assigned_user_id = new_assigned_user_id
         await self.save()
 
-        if old_assigned_user_id:
-            from models.user import UserModel
-            guard = await UserModel.get(old_assigned_user_id)
-            await guard.recalculate_score(population_type=self.population_type)
-        if self.assigned_user_id:
-            from models.user import UserModel
-            guard = await UserModel.get(self.assigned_user_id)
-            await guard.recalculate_score(population_type=self.population_type)
+        await apply_shift_change(old_shift=old_shift, new_shift=self)
 
         return self
 
@@ -158,3 +321,36 @@ class ShiftModel(Document):
             (Allow, user_role_to_string(role=Role.Admin), Action.Create),
             (Allow, user_role_to_string(role=Role.Admin), Action.Delete)
         ]
+
+
+class ShiftsPage(BaseModel):
+    """
+    A page of shifts, ordered by date and then by id
+    """
+    shifts: List[ShiftModel]
+    next_cursor: Optional[str] = None  # Cursor of the next page, None if this is the last page
+
+
+class ShiftsDateBucket(BaseModel):
+    """
+    Shifts of a single date
+    """
+    date: Date
+    shifts: List[ShiftModel]
+
+
+class CompactShiftView(BaseModel):
+    """
+    Projection of a shift for calendar views, that only identifies it
+    """
+    id: PydanticObjectId = Field(alias="_id")
+    shift_type: ShiftTypeKey
+    assigned_user_id: Optional[UserKey] = None
+
+
+class CompactShiftsDateBucket(BaseModel):
+    """
+    Compact shifts of a single date
+    """
+    date: Date
+    shifts: List[CompactShiftView]
@@ -2,7 +2,7 @@ from typing import Optional, Dict
 
 from beanie import Document, PydanticObjectId
 from fastapi import HTTPException
-from pydantic import NonNegativeInt
+from pydantic import NonNegativeInt, BaseModel, Field
 from fastapi_permissions import Allow, Authenticated
 from models.utils import user_role_to_string
 from models.score import DayTypeEnum, ScoreDeltaModel
@@ -13,6 +13,14 @@ from models.structs import PopulationType, Location
 REGULAR_DAYS = (DayTypeEnum.REGULAR_DAY, DayTypeEnum.THURSDAY)
 WEEKEND_DAYS = (DayTypeEnum.WEEKEND,)
 
+class ShiftTypeNameView(BaseModel):
+    """
+    Projection of a shift type to its name
+    """
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
+
+
 class ShiftTypeModel(Document):
     """
     Maximum number of shifts on a generic day in given base
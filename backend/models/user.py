@@ -1,10 +1,12 @@
+import asyncio
 import math
 from datetime import timedelta
-from typing import List, Union, Optional
+from typing import List, Union, Optional, Dict, Tuple, Iterable
 
 from beanie import Document, Indexed
 from fastapi_permissions import Allow, Authenticated
 from pydantic import validator
+from pymongo import UpdateOne, IndexModel, ASCENDING
 from pydantic.main import BaseModel
 
 from assignments_model.entities import HogerGuard, OfficerGuard, BaseGuard
@@ -13,8 +15,8 @@ from models.permissions import RoleManagerParameters, UserRole
 from constants.permissions import Role, Action
 from models.branch import BranchKey
 from models.score import ScoreModel, ScoreDeltaModel
-from models.shift import ShiftModel
-from models.structs import Date, PopulationType
+from models.shift import ShiftModel, ShiftScoreView
+from models.structs import Date, PopulationType, UserKey
 
 
 class DateRestrictionModel(BaseModel):
@@ -51,6 +53,12 @@ class UserModel(Document):
 
     class Collection:
         name = "users"
+        indexes = [
+            # Users of a branch, optionally of a population, sorted by name (get_users, auto_assign_shifts)
+            IndexModel([("branch", ASCENDING), ("population_types", ASCENDING), ("name", ASCENDING)],
+                       name="branch_population_types_name"),
+            IndexModel([("population_types", ASCENDING), ("name", ASCENDING)], name="population_types_name"),
+        ]
 
     @property
     def principals(self) -> List[str]:
@@ -145,7 +153,8 @@ class UserModel(Document):
         shifts = await ShiftModel.get_shifts(start_date=start_date,
                                              end_date=end_date,
                                              user_id=self.id,
-                                             population_type=population_type)
+                                             population_type=population_type,
+                                             projection_model=ShiftScoreView)
 
         new_initial_score = await self.get_initial_score(population_type=population_type)
         new_score = new_initial_score + sum([shift.score for shift in shifts], ScoreDeltaModel())
@@ -163,12 +172,198 @@ class UserModel(Document):
                                      f"for user '{self.username}'"
 
         settings.score = score
-        await self.save()
+        await self.get_motor_collection().update_one(
+            {"_id": self.id, "population_settings.population_type": population_type.value},
+            {"$set": {"population_settings.$.score": score.dict()}}
+        )
+
+    async def save_population_settings(self,
+                                       population_type: PopulationType,
+                                       score_delta: Optional[ScoreDeltaModel] = None):
+        """
+        Save the settings of a population type, except for its score, which is only changed by atomic updates
+        :param population_type: population type
+        :param score_delta: signed delta to add to the score in the same update, e.g. the change in initial score
+        """
+        settings = self.get_population_settings(population_type=population_type)
+        assert settings is not None, f"Couldn't find settings for population type {population_type} " \
+                                     f"for user '{self.username}'"
+
+        update = {"$set": {f"population_settings.$.{field}": value
+                           for field, value in settings.dict(exclude={"population_type", "score"}).items()}}
+        if score_delta is not None:
+            update["$inc"] = {"population_settings.$.score.regular_score": score_delta.regular_score,
+                              "population_settings.$.score.weekend_score": score_delta.weekend_score}
+        await self.get_motor_collection().update_one(
+            {"_id": self.id, "population_settings.population_type": population_type.value}, update
+        )
+
+    async def save_restrictions(self, population_type: PopulationType):
+        """
+        Save the restrictions of a population type, without the rest of the user
+        :param population_type: population type
+        """
+        settings = self.get_population_settings(population_type=population_type)
+        assert settings is not None, f"Couldn't find settings for population type {population_type} " \
+                                     f"for user '{self.username}'"
+
+        await self.get_motor_collection().update_one(
+            {"_id": self.id, "population_settings.population_type": population_type.value},
+            {"$set": {"population_settings.$.restrictions": [restriction.dict()
+                                                             for restriction in settings.restrictions]}}
+        )
+
+    async def save_roles(self):
+        """
+        Save the roles of the user, without the rest of the user
+        """
+        await self.get_motor_collection().update_one({"_id": self.id}, {"$set": {"roles": self.roles}})
+
+    async def save_without_scores(self) -> Optional['UserModel']:
+        """
+        Save the user without overwriting the scores of populations that it already has, which are only changed by
+        atomic updates. Changes in their initial scores are added to the scores, and scores of new populations are
+        calculated from their shifts
+        :return: the user as it was saved before, or None if it wasn't saved yet
+        """
+        saved_user = await UserModel.get(self.id)
+        saved_settings = {} if saved_user is None else {settings.population_type: settings
+                                                        for settings in saved_user.population_settings}
+        for settings in self.population_settings:
+            if settings.population_type not in saved_settings:
+                settings.score = await self.calculate_shifts_score(population_type=settings.population_type)
+
+        if saved_user is None:
+            await self.save()
+            return None
+
+        collection = self.get_motor_collection()
+        await collection.update_one(
+            {"_id": self.id},
+            {"$set": self.dict(exclude={"id", "revision_id", "population_settings"}),
+             "$pull": {"population_settings": {"population_type": {
+                 "$nin": [settings.population_type.value for settings in self.population_settings]
+             }}}}
+        )
+        new_settings = [settings for settings in self.population_settings
+                        if settings.population_type not in saved_settings]
+        if new_settings:
+            await collection.update_one({"_id": self.id},
+                                        {"$push": {"population_settings": {
+                                            "$each": [settings.dict() for settings in new_settings]
+                                        }}})
+        for settings in self.population_settings:
+            saved = saved_settings.get(settings.population_type)
+            if saved is not None:
+                await self.save_population_settings(
+                    population_type=settings.population_type,
+                    score_delta=ScoreDeltaModel(
+                        regular_score=settings.initial_score.regular_score - saved.initial_score.regular_score,
+                        weekend_score=settings.initial_score.weekend_score - saved.initial_score.weekend_score
+                    )
+                )
+        return saved_user
 
     async def recalculate_score(self, population_type: PopulationType):
         new_score = await self.calculate_shifts_score(population_type=population_type)
         await self.update_score(population_type=population_type, score=new_score)
 
+    def _reset_score_operation(self,
+                               population_type: PopulationType,
+                               shifts_scores: Dict[Tuple[UserKey, PopulationType], ScoreDeltaModel]) -> UpdateOne:
+        """
+        Set the score of a population type to its initial score plus the sum of its shifts' scores
+        :param population_type: population type
+        :param shifts_scores: sums of shifts' scores, as returned by ShiftModel.sum_scores_by_user()
+        :return: update operation that saves the new score
+        """
+        settings = self.get_population_settings(population_type=population_type)
+        settings.score = settings.initial_score + shifts_scores.get((self.id, population_type), ScoreDeltaModel())
+        return UpdateOne(
+            {"_id": self.id, "population_settings.population_type": population_type.value},
+            {"$set": {"population_settings.$.score": settings.score.dict()}}
+        )
+
+    @classmethod
+    async def _bulk_write(cls, operations: List[UpdateOne], batch_size: int, max_concurrent_writes: int) -> int:
+        """
+        Apply update operations in unordered batches, with a bounded number of batches written at the same time
+        :param operations: update operations
+        :param batch_size: maximal number of operations in a batch
+        :param max_concurrent_writes: maximal number of batches that are written at the same time
+        :return: number of modified users
+        """
+        collection = cls.get_motor_collection()
+        semaphore = asyncio.Semaphore(max_concurrent_writes)
+
+        async def write_batch(batch: List[UpdateOne]) -> int:
+            async with semaphore:
+                result = await collection.bulk_write(batch, ordered=False)
+                return result.modified_count
+
+        modified_counts = await asyncio.gather(*(write_batch(operations[i:i + batch_size])
+                                                 for i in range(0, len(operations), batch_size)))
+        return sum(modified_counts)
+
+    @classmethod
+    async def bulk_recalculate_score(cls, users: List['UserModel'], population_type: PopulationType) -> int:
+        """
+        Recalculate the score of many guards with a single aggregation of their shifts' scores, and save them with
+        a single bulk write that only sets the score of the given population type. Users without settings for the
+        population type are skipped
+        :param users: users to recalculate their score
+        :param population_type: population type
+        :return: number of modified users
+        """
+        return await cls.bulk_recalculate_scores([(user, population_type) for user in users])
+
+    @classmethod
+    async def bulk_recalculate_scores(cls, user_populations: Iterable[Tuple['UserModel', PopulationType]]) -> int:
+        """
+        Recalculate the scores of many guards in possibly different population types, with a single aggregation of
+        their shifts' scores and a single bulk write. Users without settings for a population type are skipped
+        :param user_populations: pairs of user and population type to recalculate his score in
+        :return: number of modified scores
+        """
+        user_populations = list({(user.id, population_type): (user, population_type)
+                                 for user, population_type in user_populations
+                                 if user.get_population_settings(population_type=population_type) is not None
+                                 }.values())
+        if not user_populations:
+            return 0
+
+        population_types = {population_type for _, population_type in user_populations}
+        shifts_scores = await ShiftModel.sum_scores_by_user(
+            user_ids=list({user.id for user, _ in user_populations}),
+            population_type=next(iter(population_types)) if len(population_types) == 1 else None
+        )
+        operations = [user._reset_score_operation(population_type=population_type, shifts_scores=shifts_scores)
+                      for user, population_type in user_populations]
+
+        result = await cls.get_motor_collection().bulk_write(operations, ordered=False)
+        return result.modified_count
+
+    @classmethod
+    async def recalculate_all_scores(cls, batch_size: int = 500, max_concurrent_writes: int = 4) -> int:
+        """
+        Recalculate the score of all users in all of their populations, with a single aggregation of all shifts'
+        scores and batched bulk writes
+        :param batch_size: maximal number of users' scores in a single bulk write
+        :param max_concurrent_writes: maximal number of bulk writes at the same time
+        :return: number of modified scores
+        """
+        users = await cls.find_all().to_list()
+        shifts_scores = await ShiftModel.sum_scores_by_user()
+
+        operations = [user._reset_score_operation(population_type=population_type, shifts_scores=shifts_scores)
+                      for user in users
+                      for population_type in user.population_types
+                      if user.get_population_settings(population_type=population_type) is not None]
+        if not operations:
+            return 0
+
+        return await cls._bulk_write(operations, batch_size=batch_size, max_concurrent_writes=max_concurrent_writes)
+
     async def recalculate_all_populations_score(self):
         for population_type in self.population_types:
             await self.recalculate_score(population_type)
@@ -1,8 +1,14 @@
+import json
 from typing import List, Union
 
 from beanie import PydanticObjectId
+from beanie.odm.operators.find.comparison import In
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
 from fastapi_permissions import Allow, has_permission, permission_exception
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
 
 from assignments_model.constraints import SpecificShiftsInServiceConstraint, GuardsPerShiftConstraint, \
     NoSpecificDayAfterSpecificDayConstraint, SpecificDayPerGuardPerMonthConstraint, \
@@ -10,15 +16,21 @@ from assignments_model.constraints import SpecificShiftsInServiceConstraint, Gua
     LimitOnlyOneHolidayInService, NoSpecificShiftsAfterSpecificShiftsConstraint, \
     SpecificDayPerGuardPerMonthWithHistoryConstraint
 from assignments_model.models import OfficersRegularModel, OfficersWeekendModel, HogersWeekendModel, HogersRegularModel
-from auto_assign import auto_assign_shifts
+from assignments_model.telemetry import to_server_timing
+from auto_assign import auto_assign_shifts, auto_assign_shifts_batch, AutoAssignTask
+from config import settings
 from constants.permissions import Role, Action
 from models.branch import BranchModel
+from models.job import JobModel, JobStatus
 from models.permissions import UserRole, RoleManagerParameters
 from models.shift import ShiftModel
 from models.structs import PopulationType
 from models.user import UserModel
 from models.utils import user_role_to_string
 from utils.authorization_utils import Permission, get_active_user
+from utils.cache_utils import read_cache
+from utils.job_queue import JobQueue
+from utils.solution_stream import SolutionStream
 
 router = APIRouter(prefix="/assignments_model",
                    tags=["Auto Assignment"],
@@ -41,6 +53,23 @@ CONSTRAINTS_UNION = Union[
 ]
 
 
+class AutoAssignBatchItem(BaseModel):
+    """
+    Parameters of auto assignment of a single branch and population type, in a batch
+    """
+    branch_id: PydanticObjectId
+    population_type: PopulationType
+    db_shifts_ids: List[PydanticObjectId]
+    db_users_ids: List[PydanticObjectId]
+    constraints: List[CONSTRAINTS_UNION]
+    overwrite_manual_assignments: bool
+    repair_previous_assignments: bool = False
+
+
+assignment_jobs = JobQueue(max_concurrent_jobs=settings.max_concurrent_solves,
+                           retention_seconds=settings.assignment_jobs_retention_seconds)
+
+
 async def get_branch_by_id(branch_id: PydanticObjectId) -> BranchModel:
     branch = await BranchModel.get(branch_id)
     if branch is None:
@@ -48,9 +77,7 @@ async def get_branch_by_id(branch_id: PydanticObjectId) -> BranchModel:
     return branch
 
 
-async def has_permission_to_auto_assign(population_type: PopulationType,
-                                        user: UserModel = Depends(get_active_user),
-                                        branch: BranchModel = Depends(get_branch_by_id)):
+def check_permission_to_auto_assign(user: UserModel, branch: BranchModel, population_type: PopulationType):
     auto_assign_acl = [
         (Allow, user_role_to_string(role=Role.Admin), Action.Assign),
         (Allow, UserRole(role=Role.Manager,
@@ -66,6 +93,36 @@ async def has_permission_to_auto_assign(population_type: PopulationType,
         raise permission_exception
 
 
+async def has_permission_to_auto_assign(population_type: PopulationType,
+                                        user: UserModel = Depends(get_active_user),
+                                        branch: BranchModel = Depends(get_branch_by_id)):
+    check_permission_to_auto_assign(user=user, branch=branch, population_type=population_type)
+
+
+async def get_batch_tasks(items: List[AutoAssignBatchItem],
+                          user: UserModel = Depends(get_active_user)) -> List[AutoAssignTask]:
+    """
+    Fetch the branches of a batch in a single query, and check that the user can auto assign all of its items
+    """
+    branch_ids = list({item.branch_id for item in items})
+    branches_by_id = {branch.id: branch for branch in await BranchModel.find(In(BranchModel.id, branch_ids)).to_list()}
+
+    tasks = []
+    for item in items:
+        branch = branches_by_id.get(item.branch_id)
+        if branch is None:
+            raise HTTPException(status_code=404, detail=f"Branch {item.branch_id} not found")
+        check_permission_to_auto_assign(user=user, branch=branch, population_type=item.population_type)
+        tasks.append(AutoAssignTask(branch=branch,
+                                    population_type=item.population_type,
+                                    db_shifts_ids=item.db_shifts_ids,
+                                    db_users_ids=item.db_users_ids,
+                                    constraints=item.constraints,
+                                    overwrite_manual_assignments=item.overwrite_manual_assignments,
+                                    repair_previous_assignments=item.repair_previous_assignments))
+    return tasks
+
+
 @router.post("/", response_model=List[ShiftModel], dependencies=[Depends(has_permission_to_auto_assign)])
 async def auto_assign(
         population_type: PopulationType,
@@ -73,30 +130,192 @@ async def auto_assign(
         db_users_ids: List[PydanticObjectId],
         constraints: List[CONSTRAINTS_UNION],
         overwrite_manual_assignments: bool,
+        response: Response,
+        repair_previous_assignments: bool = False,
         branch: BranchModel = Depends(get_branch_by_id),
 ):
     """
-    Assign shifts to guards with automatic assignments model
+    Assign shifts to guards with automatic assignments model. Timings of the model's phases are returned in a
+    Server-Timing header
     :param branch: branch of guards to assign
     :param population_type: population type of guards and shifts
     :param db_shifts_ids: ids of ShiftModel objects in DB
     :param db_users_ids: ids of UserModel objects in DB
     :param constraints: List of constraint objects that should be enforced in the model
     :param overwrite_manual_assignments: whether already assigned shifts should be reassigned
+    :param repair_previous_assignments: whether reassigned shifts should stay as close as possible to their previous
+                                        assignments
     :return: list of assigned shifts
     """
     # TODO make it receive weekend constraints and regular constraints
 
+    def report_telemetry(telemetry):
+        response.headers["Server-Timing"] = to_server_timing(telemetry)
+
     return await auto_assign_shifts(
         db_shifts_ids=db_shifts_ids,
         db_users_ids=db_users_ids,
         overwrite_manual_assignments=overwrite_manual_assignments,
         population_type=population_type,
         constraints=constraints,
-        branch=branch
+        branch=branch,
+        repair_previous_assignments=repair_previous_assignments,
+        report_telemetry=report_telemetry
     )
 
 
+@router.post("/jobs", response_model=JobModel, dependencies=[Depends(has_permission_to_auto_assign)])
+async def submit_auto_assign_job(
+        population_type: PopulationType,
+        db_shifts_ids: List[PydanticObjectId],
+        db_users_ids: List[PydanticObjectId],
+        constraints: List[CONSTRAINTS_UNION],
+        overwrite_manual_assignments: bool,
+        repair_previous_assignments: bool = False,
+        branch: BranchModel = Depends(get_branch_by_id),
+        user: UserModel = Depends(get_active_user),
+):
+    """
+    Queue an automatic assignment of shifts to guards, and return immediately. Parameters are the same as of the
+    synchronous auto assignment
+    :return: the queued job, whose id can be used to query its status, solver telemetry, intermediate solutions and
+             result
+    """
+    solution_stream = SolutionStream()
+
+    async def run_job(report_progress):
+        def report_telemetry(telemetry):
+            report_progress(details={"solver_telemetry": [model_telemetry.dict() for model_telemetry in telemetry]})
+
+        async with solution_stream.collect():
+            return await auto_assign_shifts(
+                db_shifts_ids=db_shifts_ids,
+                db_users_ids=db_users_ids,
+                overwrite_manual_assignments=overwrite_manual_assignments,
+                population_type=population_type,
+                constraints=constraints,
+                branch=branch,
+                repair_previous_assignments=repair_previous_assignments,
+                report_progress=report_progress,
+                report_telemetry=report_telemetry,
+                solution_stream=solution_stream
+            )
+
+    return assignment_jobs.submit(user.id, run_job, context=solution_stream)
+
+
+@router.post("/batch", response_model=List[ShiftModel])
+async def auto_assign_batch(response: Response, tasks: List[AutoAssignTask] = Depends(get_batch_tasks)):
+    """
+    Assign shifts to guards in many branches and population types at once. Each item is an independent assignment
+    problem, and problems are solved in parallel. Assignments are saved only if all problems are solved
+    :param tasks: assignment problems, each of a different branch and population type
+    :return: list of assigned shifts of all items, in order of items
+    """
+    def report_telemetry(telemetry):
+        response.headers["Server-Timing"] = to_server_timing([model_telemetry
+                                                              for task_telemetry in telemetry
+                                                              for model_telemetry in task_telemetry])
+
+    return await auto_assign_shifts_batch(tasks=tasks, report_telemetry=report_telemetry)
+
+
+@router.post("/jobs/batch", response_model=JobModel)
+async def submit_auto_assign_batch_job(tasks: List[AutoAssignTask] = Depends(get_batch_tasks),
+                                       user: UserModel = Depends(get_active_user)):
+    """
+    Queue an automatic assignment of many branches and population types, and return immediately. Parameters are the
+    same as of the synchronous batch auto assignment
+    :return: the queued job, whose id can be used to query its status, solver telemetry, intermediate solutions and
+             result
+    """
+    solution_stream = SolutionStream()
+
+    async def run_job(report_progress):
+        def report_telemetry(telemetry):
+            report_progress(details={"solver_telemetry": [[model_telemetry.dict() for model_telemetry in task_telemetry]
+                                                          for task_telemetry in telemetry]})
+
+        async with solution_stream.collect():
+            return await auto_assign_shifts_batch(tasks=tasks,
+                                                  report_progress=report_progress,
+                                                  report_telemetry=report_telemetry,
+                                                  solution_stream=solution_stream)
+
+    return assignment_jobs.submit(user.id, run_job, context=solution_stream)
+
+
+def get_job_by_id(job_id: str, user: UserModel = Depends(get_active_user)) -> JobModel:
+    job = assignment_jobs.get(job_id=job_id, owner_id=user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=JobModel)
+async def get_auto_assign_job(job: JobModel = Depends(get_job_by_id)):
+    """
+    Get status and progress of an auto assignment job
+    """
+    return job
+
+
+def get_job_solution_stream(job: JobModel = Depends(get_job_by_id)) -> SolutionStream:
+    solution_stream = assignment_jobs.get_context(job.id)
+    if solution_stream is None:
+        raise HTTPException(status_code=404, detail="Job has no solutions stream")
+    return solution_stream
+
+
+@router.get("/jobs/{job_id}/solutions")
+async def stream_auto_assign_job_solutions(solution_stream: SolutionStream = Depends(get_job_solution_stream)):
+    """
+    Follow improving solutions of an auto assignment job as Server-Sent Events, from its first solution. Every
+    "solution" event holds the objective and bound of a model, and the assignments it added and removed since its
+    previous solution. A "done" event is sent when all solves of the job are finished
+    """
+    async def get_events():
+        async for event in solution_stream.follow():
+            yield f"event: solution\ndata: {json.dumps(jsonable_encoder(event))}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(get_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.post("/jobs/{job_id}/accept", response_model=JobModel)
+async def accept_auto_assign_job_solution(job: JobModel = Depends(get_job_by_id),
+                                          solution_stream: SolutionStream = Depends(get_job_solution_stream)):
+    """
+    Stop improving the solutions of an auto assignment job, and save the best ones so far. Models that weren't solved
+    yet stop at their first solution
+    """
+    solution_stream.accept()
+    return job
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobModel)
+async def cancel_auto_assign_job(job: JobModel = Depends(get_job_by_id),
+                                 solution_stream: SolutionStream = Depends(get_job_solution_stream)):
+    """
+    Stop the solves of an auto assignment job without saving any assignment. The job fails once its solves stop
+    """
+    solution_stream.cancel()
+    return job
+
+
+@router.get("/jobs/{job_id}/result", response_model=List[ShiftModel])
+async def get_auto_assign_job_result(job: JobModel = Depends(get_job_by_id)):
+    """
+    Get assigned shifts of a finished auto assignment job
+    :return: list of assigned shifts
+    """
+    if job.status == JobStatus.FAILED:
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != JobStatus.SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status.value}")
+    return assignment_jobs.get_result(job.id)
+
+
 @router.post("/clear_all_assignments", dependencies=[Permission(Action.Assign, DefaultAssignACL)])
 async def clear_all_assignments():
     """
@@ -107,10 +326,14 @@ async def clear_all_assignments():
 
 
 @router.get("/default_constraints/", response_model_exclude_none=True)
-async def get_site_default_constraints():
-    return {
-        "HogerRegular": HogersRegularModel.get_default_constraints(),
-        "HogerWeekend": HogersWeekendModel.get_default_constraints(),
-        "OfficerRegular": OfficersRegularModel.get_default_constraints(),
-        "OfficerWeekend": OfficersWeekendModel.get_default_constraints()
-    }
+async def get_site_default_constraints(request: Request):
+    async def get_default_constraints():
+        return {
+            "HogerRegular": HogersRegularModel.get_default_constraints(),
+            "HogerWeekend": HogersWeekendModel.get_default_constraints(),
+            "OfficerRegular": OfficersRegularModel.get_default_constraints(),
+            "OfficerWeekend": OfficersWeekendModel.get_default_constraints()
+        }
+
+    return await read_cache.respond(request=request, key="default_constraints", get_content=get_default_constraints,
+                                    exclude_none=True)
@@ -4,6 +4,7 @@ from beanie import PydanticObjectId
 from fastapi import HTTPException
 from fastapi import APIRouter, Depends
 from fastapi_permissions import Allow, Authenticated
+from starlette.requests import Request
 from models.user import UserModel
 
 from constants.permissions import Role, Action
@@ -12,6 +13,7 @@ from models.structs import PopulationType
 from models.score_params import ScoreParamsType
 from models.utils import user_role_to_string
 from utils.authorization_utils import Permission, get_active_user
+from utils.cache_utils import read_cache
 
 router = APIRouter(prefix="/branches", tags=["branches"], dependencies=[Depends(get_active_user)])
 DefaultBranchesACL = [
@@ -20,6 +22,7 @@ DefaultBranchesACL = [
     (Allow, user_role_to_string(role=Role.Admin), Action.Create),
     (Allow, user_role_to_string(role=Role.Admin), Action.Delete)
 ]
+BRANCHES_CACHE_KEY = "branches"
 
 
 async def get_branch_by_id(branch_id: PydanticObjectId) -> BranchModel:
@@ -30,13 +33,15 @@ async def get_branch_by_id(branch_id: PydanticObjectId) -> BranchModel:
 
 
 @router.get("/", response_model=List[BranchModel], dependencies=[Permission(Action.View, DefaultBranchesACL)])
-async def get_all_branches():
+async def get_all_branches(request: Request):
     """
     Get list of all branches in BranchModel format
     :return: list of branches as they are saved in DB
     """
-    branches = await BranchModel.find_all().sort(BranchModel.name).to_list()
-    return branches
+    async def get_branches():
+        return await BranchModel.find_all().sort(BranchModel.name).to_list()
+
+    return await read_cache.respond(request=request, key=BRANCHES_CACHE_KEY, get_content=get_branches)
 
 
 @router.put("/", response_model=BranchModel, dependencies=[Permission(Action.Create, DefaultBranchesACL)])
@@ -48,6 +53,7 @@ async def create_branch(base_branch: BaseBranchModel):
     """
     branch = BranchModel.from_base_branch(base_branch)
     await branch.create()
+    read_cache.invalidate(BRANCHES_CACHE_KEY)
     return branch
 
 
@@ -64,6 +70,7 @@ async def edit_branch(new_base_branch: BaseBranchModel,
     new_branch.id = old_branch.id
 
     await new_branch.replace()
+    read_cache.invalidate(BRANCHES_CACHE_KEY)
     return new_branch
 
 
@@ -78,4 +85,5 @@ async def delete_shift_type(branch: BranchModel = Permission(Action.Delete, get_
         raise HTTPException(status_code=423, detail='Cannot delete branch with users')
 
     await branch.delete()
+    read_cache.invalidate(BRANCHES_CACHE_KEY)
     return branch
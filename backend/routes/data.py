@@ -1,39 +1,50 @@
 from typing import List, Dict
 
 from fastapi import APIRouter, Depends
+from starlette.requests import Request
 from constants.permissions import Role
 
 from models.structs import PopulationType, Location
 from models.score_params import ScoreParamsType, TableSchema, score_type_to_table_schema
 from utils.authorization_utils import get_active_user
+from utils.cache_utils import read_cache
 
 router = APIRouter(tags=["Data"], dependencies=[Depends(get_active_user)])
 
 
 @router.get("/population_types/", response_model=List[PopulationType])
-async def get_population_types():
-    population_types = [population_type.value for population_type in PopulationType]
-    return population_types
+async def get_population_types(request: Request):
+    async def get_content():
+        return [population_type.value for population_type in PopulationType]
+
+    return await read_cache.respond(request=request, key="population_types", get_content=get_content)
 
 
 @router.get("/locations/", response_model=List[Location])
-async def get_locations():
-    locations = [location.value for location in Location]
-    return locations
+async def get_locations(request: Request):
+    async def get_content():
+        return [location.value for location in Location]
+
+    return await read_cache.respond(request=request, key="locations", get_content=get_content)
 
 
 @router.get("/roles/", response_model=List[Role])
-async def get_roles():
-    roles = [role.value for role in Role]
-    return roles
+async def get_roles(request: Request):
+    async def get_content():
+        return [role.value for role in Role]
+
+    return await read_cache.respond(request=request, key="roles", get_content=get_content)
 
 
 @router.get("/score_table_schemas/", response_model=Dict[ScoreParamsType, TableSchema])
-async def get_score_table_schemas():
+async def get_score_table_schemas(request: Request):
     """
     Gets a mapping of score types to score table schemas.
     Each schema consists of a list of table column objects,
     and each object contains properties of the column, like id, type and display name
     :return: Score table schemas of all score types.
     """
-    return score_type_to_table_schema
+    async def get_content():
+        return score_type_to_table_schema
+
+    return await read_cache.respond(request=request, key="score_table_schemas", get_content=get_content)
@@ -1,13 +1,14 @@
 import datetime
 
+from beanie.odm.operators.find.comparison import In
 from fastapi import APIRouter, Depends
 from icalendar import Calendar, Event
 from starlette.responses import StreamingResponse
 
-from models.shift_type import ShiftTypeModel
+from models.shift import ShiftModel, ShiftCalendarView
+from models.shift_type import ShiftTypeModel, ShiftTypeNameView
 from models.structs import Date
 from models.user import UserModel
-from routes.shifts import get_shifts
 from utils.authorization_utils import get_active_user
 
 router = APIRouter(prefix="/export", tags=["Exports"], dependencies=[Depends(get_active_user)])
@@ -17,10 +18,14 @@ router = APIRouter(prefix="/export", tags=["Exports"], dependencies=[Depends(get
 async def get_ics(start_date: Date,
                   end_date: Date,
                   user: UserModel = Depends(get_active_user)):
-    guard_shifts = await get_shifts(start_date=start_date, end_date=end_date, user_id=user.id)
-
-    # TODO: Filter only needed shift types based on guard's shifts
-    shift_types_list = await ShiftTypeModel.find_all().to_list()
+    guard_shifts = await ShiftModel.get_shifts(start_date=start_date,
+                                               end_date=end_date,
+                                               user_id=user.id,
+                                               projection_model=ShiftCalendarView)
+
+    shift_type_ids = list({shift.shift_type for shift in guard_shifts})
+    shift_types_list = await ShiftTypeModel.find(In(ShiftTypeModel.id, shift_type_ids)) \
+        .project(ShiftTypeNameView).to_list()
     shift_types = {shift_type.id: shift_type for shift_type in shift_types_list}
 
     calendar = Calendar()
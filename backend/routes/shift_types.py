@@ -3,6 +3,7 @@ from typing import List
 
 from fastapi import APIRouter, Depends
 from fastapi_permissions import Allow, Authenticated
+from starlette.requests import Request
 
 from beanie import PydanticObjectId
 
@@ -10,8 +11,10 @@ from constants.permissions import Role, Action
 from models.shift_type import ShiftTypeModel
 from models.utils import user_role_to_string
 from utils.authorization_utils import get_active_user, Permission
+from utils.cache_utils import read_cache
 
 router = APIRouter(prefix="/shift_types", tags=["Shift Types"], dependencies=[Depends(get_active_user)])
+SHIFT_TYPES_CACHE_KEY = "shift_types"
 
 ShiftTypesACL = [
     (Allow, Authenticated, Action.View),
@@ -27,9 +30,11 @@ async def get_shift_type_by_id(shift_type_id: PydanticObjectId) -> ShiftTypeMode
     return shift_type
 
 @router.get("/", response_model=List[ShiftTypeModel], dependencies=[Permission(Action.View, ShiftTypesACL)])
-async def get_all_shift_types():
-    shift_types = await ShiftTypeModel.find_all().to_list()
-    return shift_types
+async def get_all_shift_types(request: Request):
+    async def get_shift_types():
+        return await ShiftTypeModel.find_all().to_list()
+
+    return await read_cache.respond(request=request, key=SHIFT_TYPES_CACHE_KEY, get_content=get_shift_types)
 
 
 @router.put("/", response_model=ShiftTypeModel, dependencies=[Permission(Action.Create, ShiftTypesACL)])
@@ -40,6 +45,7 @@ async def create_shift_type(shift_type: ShiftTypeModel):
     :return: whether saved shift type in db
     """
     await shift_type.save()
+    read_cache.invalidate(SHIFT_TYPES_CACHE_KEY)
     return shift_type
 
 @router.put("/{shift_type_id}", response_model=ShiftTypeModel)
@@ -54,6 +60,7 @@ async def edit_shift_type(new_shift_type: ShiftTypeModel, old_shift_type: ShiftT
         raise HTTPException(status_code=422, detail="Shift Type ID mismatch")
     
     await new_shift_type.replace()
+    read_cache.invalidate(SHIFT_TYPES_CACHE_KEY)
     return new_shift_type
 
 @router.delete("/{shift_type_id}", response_model=ShiftTypeModel)
@@ -64,4 +71,5 @@ async def delete_shift_type(shift_type: ShiftTypeModel = Permission(Action.Delet
     :return: details about deletion result
     """
     await shift_type.delete()
+    read_cache.invalidate(SHIFT_TYPES_CACHE_KEY)
     return shift_type
@@ -1,20 +1,25 @@
 import datetime
-import itertools
 from typing import List, Optional, Dict
 
 from beanie import PydanticObjectId
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from starlette.responses import StreamingResponse
 
 from constants.permissions import Action
 from models.score import ScoreDeltaModel
-from models.shift import ShiftModel
+from models.score_ledger import apply_shift_change
+from models.shift import ShiftModel, ShiftsPage, CompactShiftsDateBucket
 from models.structs import Date, PopulationType, UserKey
 from models.user import UserModel
 from routes.users import get_user_by_id
 from utils.authorization_utils import Permission, get_active_user
+from utils.pagination_utils import after_date_cursor_filter, encode_date_cursor
 
 router = APIRouter(prefix="/shifts", tags=["Shifts"], dependencies=[Depends(get_active_user)])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+MAX_PAGE_SIZE = 1000
+
 
 async def get_shift_by_id(shift_id: PydanticObjectId) -> ShiftModel:
     shift = await ShiftModel.get(shift_id)
@@ -44,25 +49,133 @@ async def get_shifts(start_date: Optional[Date] = None,
 
 @router.get("/by_date/", response_model=Dict[datetime.date, List[ShiftModel]])
 async def group_shifts_by_date(start_date: Optional[Date] = None,
-                               end_date: Optional[Date] = None):
+                               end_date: Optional[Date] = None,
+                               branch_name: Optional[str] = None,
+                               population_type: Optional[PopulationType] = None):
     """
     Retrieve mapping of each date to all shifts in that date
     :param start_date: limit results to shifts from this date
     :param end_date: limit results to shifts until this date (inclusive)
+    :param branch_name: limit results by shift's branch name
+    :param population_type: filter shifts by specific population type
     :return: dict with mapping of each date to all shifts in that date
     """
-    filters = []
-    if start_date is not None:
-        filters.append(ShiftModel.date >= start_date)
-    if end_date is not None:
-        filters.append(ShiftModel.date <= end_date)
+    buckets = await ShiftModel.group_by_date(start_date=start_date,
+                                             end_date=end_date,
+                                             branch_name=branch_name,
+                                             population_type=population_type)
+    return {bucket.date.date(): bucket.shifts for bucket in buckets}
+
+
+@router.get("/by_date/compact", response_model=List[CompactShiftsDateBucket])
+async def group_compact_shifts_by_date(start_date: Optional[Date] = None,
+                                       end_date: Optional[Date] = None,
+                                       branch_name: Optional[str] = None,
+                                       population_type: Optional[PopulationType] = None):
+    """
+    Retrieve the id, type and assignee of all shifts, grouped by date
+    :param start_date: limit results to shifts from this date
+    :param end_date: limit results to shifts until this date (inclusive)
+    :param branch_name: limit results by shift's branch name
+    :param population_type: filter shifts by specific population type
+    :return: list of buckets of shifts of each date, ordered by date
+    """
+    return await ShiftModel.group_by_date(start_date=start_date,
+                                          end_date=end_date,
+                                          branch_name=branch_name,
+                                          population_type=population_type,
+                                          is_compact=True)
+
+
+@router.get("/page", response_model=ShiftsPage)
+async def get_shifts_page(start_date: Optional[Date] = None,
+                          end_date: Optional[Date] = None,
+                          branch_name: Optional[str] = None,
+                          user_id: Optional[UserKey] = None,
+                          population_type: Optional[PopulationType] = None,
+                          cursor: Optional[str] = None,
+                          limit: int = Query(200, gt=0, le=MAX_PAGE_SIZE)):
+    """
+    Retrieve a page of shifts, ordered by date and then by id
+    :param cursor: cursor of the page, as returned with the previous page. Omit it to get the first page
+    :param limit: maximal number of shifts in the page
+    :return: page of shifts and the cursor of the next page
+    """
+    extra_filters = [] if cursor is None else [after_date_cursor_filter(cursor)]
+    shifts = await ShiftModel.find_shifts(*extra_filters,
+                                          start_date=start_date,
+                                          end_date=end_date,
+                                          branch_name=branch_name,
+                                          user_id=user_id,
+                                          population_type=population_type).limit(limit + 1).to_list()
+
+    # One more shift than needed is fetched, to know whether there's a next page
+    next_cursor = None
+    if len(shifts) > limit:
+        shifts = shifts[:limit]
+        next_cursor = encode_date_cursor(date=shifts[-1].date, id_=shifts[-1].id)
+
+    return ShiftsPage(shifts=shifts, next_cursor=next_cursor)
+
+
+@router.get("/stream")
+async def stream_shifts(start_date: Optional[Date] = None,
+                        end_date: Optional[Date] = None,
+                        branch_name: Optional[str] = None,
+                        user_id: Optional[UserKey] = None,
+                        population_type: Optional[PopulationType] = None):
+    """
+    Stream shifts as newline delimited JSON, ordered by date. Each shift is sent as soon as it's read from DB
+    """
+    query = ShiftModel.find_shifts(start_date=start_date,
+                                   end_date=end_date,
+                                   branch_name=branch_name,
+                                   user_id=user_id,
+                                   population_type=population_type)
+
+    async def iter_lines():
+        async for shift in query:
+            yield shift.json(by_alias=True) + "\n"
+
+    return StreamingResponse(iter_lines(), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/by_date/stream")
+async def stream_shifts_by_date(start_date: Optional[Date] = None,
+                                end_date: Optional[Date] = None,
+                                branch_name: Optional[str] = None,
+                                population_type: Optional[PopulationType] = None):
+    """
+    Stream the shifts of each date as newline delimited JSON, one {"date": ..., "shifts": [...]} object per date
+    :param start_date: limit results to shifts from this date
+    :param end_date: limit results to shifts until this date (inclusive)
+    :param branch_name: limit results by shift's branch name
+    :param population_type: filter shifts by specific population type
+    """
+    query = ShiftModel.find_shifts(start_date=start_date,
+                                   end_date=end_date,
+                                   branch_name=branch_name,
+                                   population_type=population_type)
+
+    def to_line(date: datetime.date, shifts: List[ShiftModel]) -> str:
+        shifts_json = ",".join(shift.json(by_alias=True) for shift in shifts)
+        return f'{{"date": "{date.isoformat()}", "shifts": [{shifts_json}]}}\n'
+
+    async def iter_lines():
+        current_date = None
+        current_shifts = []
+        async for shift in query:
+            if shift.date.date() != current_date:
+                if current_shifts:
+                    yield to_line(current_date, current_shifts)
+                current_date = shift.date.date()
+                current_shifts = []
+            current_shifts.append(shift)
 
-    return_dict = {}
-    shifts = await ShiftModel.find(*filters).sort("+date").to_list()
-    for date, grouped_shifts in itertools.groupby(shifts, key=lambda shift: shift.date.date()):
-        return_dict[date] = list(grouped_shifts)
+        if current_shifts:
+            yield to_line(current_date, current_shifts)
 
-    return return_dict
+    return StreamingResponse(iter_lines(), media_type=NDJSON_MEDIA_TYPE)
 
 
 @router.put("/", response_model=ShiftModel)
@@ -73,9 +186,7 @@ async def create_shift(shift: ShiftModel = Permission(Action.Create, get_shift_m
     :return: details saved shift in DB
     """
     await shift.create()
-    if shift.assigned_user_id is not None:
-        user = await get_user_by_id(shift.assigned_user_id)
-        await user.recalculate_score(population_type=shift.population_type)
+    await apply_shift_change(old_shift=None, new_shift=shift)
     return shift
 
 
@@ -92,12 +203,7 @@ async def edit_shift(new_shift: ShiftModel, old_shift: ShiftModel = Permission(A
     await new_shift.replace()
 
     # TODO: Check there is no population mismatch that could cause error before comitting the shift to db.
-    if old_shift.assigned_user_id is not None:
-        user = await get_user_by_id(old_shift.assigned_user_id)
-        await user.recalculate_score(population_type=old_shift.population_type)
-    if new_shift.assigned_user_id is not None:
-        user = await get_user_by_id(new_shift.assigned_user_id)
-        await user.recalculate_score(population_type=new_shift.population_type)
+    await apply_shift_change(old_shift=old_shift, new_shift=new_shift)
     return new_shift
 
 
@@ -109,9 +215,7 @@ async def delete_shift(shift: ShiftModel = Permission(Action.Delete, get_shift_b
     :return: details about deletion result
     """
     await shift.delete()
-    if shift.assigned_user_id is not None:
-        user = await get_user_by_id(shift.assigned_user_id)
-        await user.recalculate_score(population_type=shift.population_type)
+    await apply_shift_change(old_shift=shift, new_shift=None)
     return shift
 
 
@@ -1,3 +1,4 @@
+import timeit
 from typing import List, Optional, Union
 
 from beanie import PydanticObjectId
@@ -11,10 +12,11 @@ from models.permissions import UserRole
 from constants.constants import USER_NOT_FOUND
 from constants.permissions import Role, Action
 from models.score import ScoreModel
+from models.score_ledger import score_difference
 from models.structs import PopulationType, Date
 from models.user import UserModel, DateRestrictionModel, OfficerGuardExtraParams, HogerGuardExtraParams
 from models.utils import user_role_to_string
-from utils.authorization_utils import get_active_user, Permission
+from utils.authorization_utils import get_active_user, Permission, get_active_user_from_db, invalidate_active_user
 
 router = APIRouter(prefix="/users", tags=["Users"], dependencies=[Depends(get_active_user)])
 DefaultUsersACL = [
@@ -57,8 +59,13 @@ async def save_user(user: UserModel = Permission(Action.CreateOrEdit, get_user_m
     """
     # TODO: Add route for weak creation/edit of user, so BranchManagers won't be able to modify website role and permissions
     if user.id:
-        await user.recalculate_all_populations_score()
-    await user.save()
+        previous_user = await user.save_without_scores()
+        if previous_user is not None:
+            # The user may have been renamed, and is cached by his previous username
+            invalidate_active_user(previous_user)
+    else:
+        await user.save()
+    invalidate_active_user(user)
     return user
 
 
@@ -70,11 +77,12 @@ async def delete_user(user: UserModel = Permission(Action.Delete, get_user_by_id
     :return: details about deletion result
     """
     await user.delete()
+    invalidate_active_user(user)
     return user
 
 
 @router.get("/me/", response_model=UserModel)
-async def get_my_user(user: UserModel = Depends(get_active_user)):
+async def get_my_user(user: UserModel = Depends(get_active_user_from_db)):
     """
     Retrieve a UserModel object by its id
     :param user: current active user
@@ -119,7 +127,7 @@ async def add_restrictions_to_user(user: UserModel,
     # TODO: add only non-duplicate restrictions
     population_settings.restrictions += new_restrictions
 
-    await user.save()
+    await user.save_restrictions(population_type=population_type)
     return user
 
 
@@ -139,7 +147,7 @@ async def update_user_restrictions(user: UserModel,
 
     population_settings.restrictions = restrictions
 
-    await user.save()
+    await user.save_restrictions(population_type=population_type)
     return user
 
 
@@ -162,7 +170,7 @@ async def get_restrictions(population_type: PopulationType,
 @router.patch("/me/restrictions", response_model=UserModel, tags=["Restrictions"])
 async def add_restrictions_to_me(population_type: PopulationType,
                                  new_restrictions: List[DateRestrictionModel],
-                                 user: UserModel = Depends(get_active_user),
+                                 user: UserModel = Depends(get_active_user_from_db),
                                  ):
     """
     Add new restrictions to current user
@@ -194,7 +202,7 @@ async def add_restrictions(population_type: PopulationType,
 @router.put("/me/restrictions", response_model=UserModel, tags=["Restrictions"])
 async def update_my_restrictions(population_type: PopulationType,
                                  restrictions: List[DateRestrictionModel],
-                                 user: UserModel = Depends(get_active_user)):
+                                 user: UserModel = Depends(get_active_user_from_db)):
     """
     Replace current user's restrictions with given restrictions
     :param user: current active user
@@ -238,12 +246,16 @@ async def update_score(population_type: PopulationType,
 
 @router.post("/update_all_scores")
 async def update_all_users_score():
-    users = await UserModel.find_all().to_list()
-    for user in users:
-        for population_type in user.population_types:
-            score = await user.calculate_shifts_score(population_type=population_type)
-            await user.update_score(population_type=population_type, score=score)
-    return None
+    """
+    Recalculate the scores of all users from their shifts
+    :return: number of modified scores and time it took in seconds
+    """
+    time_before_update = timeit.default_timer()
+    modified_count = await UserModel.recalculate_all_scores()
+    return {
+        "modified_count": modified_count,
+        "elapsed_seconds": timeit.default_timer() - time_before_update
+    }
 
 
 @router.post("/{user_id}/update_population_settings")
@@ -254,13 +266,13 @@ async def update_population_settings(population_type: PopulationType,
                                      join_date: Date = Body(...),
                                      user: UserModel = Permission(Action.ChangeScore, get_user_by_id)):
     population_settings = user.get_population_settings(population_type=population_type)
+    initial_score_delta = score_difference(new_score=initial_score, old_score=population_settings.initial_score)
     population_settings.initial_score = initial_score
     population_settings.score_multiplier = score_multiplier
     # TODO: check if population_type matches extra_params type
     population_settings.extra_params = extra_params
     population_settings.join_date = join_date
-    await user.save()
-    await user.recalculate_score(population_type=population_type)
+    await user.save_population_settings(population_type=population_type, score_delta=initial_score_delta)
 
 
 @router.delete("/{user_id}/roles/{role_index}")
@@ -270,12 +282,14 @@ async def delete_user_role(role_index: int, user: UserModel = Permission(Action.
         raise HTTPException(status_code=404, detail=f"Role index {role_index} not found")
     
     deleted_role = roles.pop(role_index)
-    await user.save()
+    await user.save_roles()
+    invalidate_active_user(user)
     return deleted_role
 
 @router.post("/{user_id}/roles")
 async def add_role(role: UserRole, user: UserModel = Permission(Action.Edit, get_user_by_id)):
     await role.verify()
     user.roles.append(role.to_string())
-    await user.save()
+    await user.save_roles()
+    invalidate_active_user(user)
     return user
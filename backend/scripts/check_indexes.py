@@ -0,0 +1,109 @@
+"""
+Check that the hot query shapes of the backend are answered by indexes, using explain().
+Exits with a non-zero code if any of them falls back to a full collection scan (COLLSCAN)
+"""
+import asyncio
+import logging
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Tuple
+
+BACKEND_FOLDER = os.path.dirname(os.path.dirname((os.path.abspath(__file__))))
+sys.path.append(BACKEND_FOLDER)
+
+from beanie import PydanticObjectId, init_beanie
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from models.branch import BranchModel
+from models.shift import ShiftModel
+from models.shift_type import ShiftTypeModel
+from models.structs import Date, PopulationType
+from models.user import UserModel
+
+logging.basicConfig(level=logging.INFO, format='[*] %(message)s')
+load_dotenv(os.path.join(BACKEND_FOLDER, ".env"))
+MODELS = [UserModel, ShiftModel, ShiftTypeModel, BranchModel]
+
+
+def iter_plan_stages(plan: Any) -> Iterator[str]:
+    """
+    Iterate over the names of all stages in an explained plan, or in any part of an explain() output
+    """
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for key, value in plan.items():
+            # Rejected plans aren't executed, so they don't matter
+            if key != "rejectedPlans":
+                yield from iter_plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from iter_plan_stages(item)
+
+
+def get_hot_queries() -> List[Tuple[str, Any, Dict[str, Any], List[Tuple[str, int]]]]:
+    """
+    Query shapes that are used by hot endpoints, as (name, document model, filter, sort)
+    """
+    some_id = PydanticObjectId()
+    start_date = Date.today()
+    end_date = Date.today()
+    population_type = PopulationType.HOGER.value
+
+    return [
+        ("get_shifts by date range", ShiftModel,
+         {"date": {"$gte": start_date, "$lte": end_date}}, [("date", 1)]),
+        ("get_shifts by branch and population", ShiftModel,
+         {"date": {"$gte": start_date, "$lte": end_date}, "branch": some_id, "population_type": population_type},
+         [("date", 1)]),
+        ("get_shifts by user", ShiftModel,
+         {"assigned_user_id": some_id, "population_type": population_type}, [("date", 1)]),
+        ("auto_assign shifts", ShiftModel,
+         {"_id": {"$in": [some_id]}, "branch": some_id}, []),
+        ("auto_assign users", UserModel,
+         {"_id": {"$in": [some_id]}, "branch": some_id}, []),
+        ("get_users by branch", UserModel,
+         {"branch": some_id}, [("name", 1)]),
+        ("get_users by population", UserModel,
+         {"population_types": population_type}, [("name", 1)]),
+        ("login by username", UserModel,
+         {"username": "username"}, []),
+        ("get_branches", BranchModel,
+         {}, [("name", 1)]),
+    ]
+
+
+async def check_indexes() -> bool:
+    """
+    Explain all hot queries
+    :return: whether all of them use indexes
+    """
+    client = AsyncIOMotorClient(os.getenv("DB_CONNECTION_STRING"))
+    # Beanie creates the declared indexes on initialization
+    await init_beanie(database=client[os.getenv("DB_NAME")], document_models=MODELS)
+
+    all_indexed = True
+    for name, document_model, query_filter, sort in get_hot_queries():
+        cursor = document_model.get_motor_collection().find(query_filter)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+
+        stages = set(iter_plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {})))
+        if "COLLSCAN" in stages:
+            all_indexed = False
+            logging.error(f'{name}: COLLSCAN ({", ".join(sorted(stages))})')
+        else:
+            logging.info(f'{name}: {", ".join(sorted(stages))}')
+
+    return all_indexed
+
+
+def main():
+    if not asyncio.run(check_indexes()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
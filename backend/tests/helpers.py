@@ -0,0 +1,55 @@
+"""
+Factories of small rosters that are shared by the tests
+"""
+import datetime
+
+from assignments_model.entities import Shift, ShiftCollection, HogerGuard, HogerGuardCollection
+from assignments_model.models import UnifiedScoreRegularModel
+from constants.constants import FairnessObjective
+from models.score import DayTypeEnum, ScoreModel
+from models.shift_type import ShiftTypeModel
+from models.structs import PopulationType
+
+START_DATE = datetime.date(2022, 1, 1)
+SHIFT_TYPES = [
+    ShiftTypeModel.construct(name=name,
+                             slots_count=1,
+                             population_type=PopulationType.HOGER,
+                             score_config={DayTypeEnum.REGULAR_DAY: 1,
+                                           DayTypeEnum.THURSDAY: 2,
+                                           DayTypeEnum.WEEKEND: 3})
+    for name in ("LOTEM", "YADIN")
+]
+
+
+def create_shifts(num_days: int = 40) -> ShiftCollection:
+    return ShiftCollection(
+        Shift(date=START_DATE + datetime.timedelta(days=day),
+              shift_type=shift_type,
+              is_holiday=day % 11 == 0)
+        for day in range(num_days)
+        for shift_type in SHIFT_TYPES
+    )
+
+
+def create_guards(num_guards: int = 6) -> HogerGuardCollection:
+    return HogerGuardCollection([
+        HogerGuard(name=f"guard_{i}",
+                   time_in_duty=i + 1,
+                   score_multiplier=1,
+                   score=ScoreModel(),
+                   num_holidays=i % 2)
+        for i in range(num_guards)
+    ])
+
+
+def create_model(num_days: int = 7,
+                 num_guards: int = 6,
+                 fairness_objective: FairnessObjective = FairnessObjective.DIVISION,
+                 explain_infeasibility: bool = False) -> UnifiedScoreRegularModel:
+    return UnifiedScoreRegularModel(shifts=create_shifts(num_days=num_days),
+                                    guards=create_guards(num_guards=num_guards),
+                                    num_search_workers=1,
+                                    timeout_in_seconds=5.0,
+                                    fairness_objective=fairness_objective,
+                                    explain_infeasibility=explain_infeasibility)
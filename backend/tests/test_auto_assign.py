@@ -0,0 +1,80 @@
+import pytest
+from beanie import PydanticObjectId
+
+from assignments_model.serialization import decode_solve_payload
+from auto_assign import AutoAssignTask, _create_problem
+from models.branch import BranchModel
+from models.score import ScoreModel, ScoreDeltaModel
+from models.shift import ShiftModel
+from models.structs import Date, PopulationType
+from models.user import UserModel, PopulationSettings, HogerGuardExtraParams
+from tests.helpers import create_shifts
+
+
+def create_db_user(branch_id: PydanticObjectId, name: str) -> UserModel:
+    # DB documents can't be validated without a DB, so they are created without validation
+    return UserModel.construct(
+        id=PydanticObjectId(),
+        username=name,
+        name=name,
+        branch=branch_id,
+        roles=[],
+        population_types=[PopulationType.HOGER],
+        population_settings=[PopulationSettings(population_type=PopulationType.HOGER,
+                                                score_multiplier=1,
+                                                restrictions=[],
+                                                extra_params=HogerGuardExtraParams(num_holidays=0),
+                                                score=ScoreModel(),
+                                                initial_score=ScoreModel(),
+                                                join_date=Date(2022, 1, 1))]
+    )
+
+
+def create_db_data(branch_id: PydanticObjectId, num_days: int = 3, num_users: int = 3):
+    shifts = create_shifts(num_days=num_days).to_list()
+    db_shifts = [ShiftModel.construct(id=PydanticObjectId(), branch=branch_id, assigned_user_id=None,
+                                      population_type=PopulationType.HOGER, score=ScoreDeltaModel())
+                 for _ in shifts]
+    for db_shift, shift in zip(db_shifts, shifts):
+        shift.id_ = db_shift.id
+    db_users = [create_db_user(branch_id=branch_id, name=f"user_{i}") for i in range(num_users)]
+    return db_shifts, db_users, {db_shift.id: shift for db_shift, shift in zip(db_shifts, shifts)}
+
+
+def create_task(branch: BranchModel, db_shifts, db_users, **kwargs) -> AutoAssignTask:
+    return AutoAssignTask(branch=branch,
+                          population_type=PopulationType.HOGER,
+                          db_shifts_ids=[db_shift.id for db_shift in db_shifts],
+                          db_users_ids=[db_user.id for db_user in db_users],
+                          constraints=[],
+                          **{"overwrite_manual_assignments": False, **kwargs})
+
+
+def test_problem_of_task_only_includes_its_shifts_and_users():
+    branch = BranchModel.construct(id=PydanticObjectId())
+    db_shifts, db_users, model_shifts_by_id = create_db_data(branch_id=branch.id)
+    other_db_shifts, other_db_users, other_model_shifts_by_id = create_db_data(branch_id=PydanticObjectId())
+    db_shifts[0].assigned_user_id = db_users[1].id
+
+    problem = _create_problem(task=create_task(branch, db_shifts, db_users),
+                              db_shifts_by_id={db_shift.id: db_shift for db_shift in db_shifts + other_db_shifts},
+                              db_users_by_id={db_user.id: db_user for db_user in db_users + other_db_users},
+                              model_shifts_by_id={**model_shifts_by_id, **other_model_shifts_by_id})
+    solve_input = decode_solve_payload(problem.payload)
+
+    assert [shift.id_ for shift in problem.shifts] == [db_shift.id for db_shift in db_shifts]
+    assert [guard.id_ for guard in problem.guards] == [db_user.id for db_user in db_users]
+    assert [(assignment.shift.id_, assignment.guard.id_) for assignment in solve_input.enforced_assignments] == \
+        [(db_shifts[0].id, db_users[1].id)]
+
+
+def test_task_with_shifts_of_another_branch_fails():
+    branch = BranchModel.construct(id=PydanticObjectId())
+    db_shifts, db_users, model_shifts_by_id = create_db_data(branch_id=branch.id)
+    other_db_shifts, _, other_model_shifts_by_id = create_db_data(branch_id=PydanticObjectId())
+
+    with pytest.raises(AssertionError):
+        _create_problem(task=create_task(branch, db_shifts + other_db_shifts, db_users),
+                        db_shifts_by_id={db_shift.id: db_shift for db_shift in db_shifts + other_db_shifts},
+                        db_users_by_id={db_user.id: db_user for db_user in db_users},
+                        model_shifts_by_id={**model_shifts_by_id, **other_model_shifts_by_id})
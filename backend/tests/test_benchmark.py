@@ -0,0 +1,43 @@
+import pytest
+
+from assignments_model.benchmark import BenchmarkScenario, benchmark_manager, generate_manager, MANAGERS
+
+
+def test_generated_roster_is_reproducible():
+    scenario = BenchmarkScenario(num_guards=10, num_days=14, restriction_density=0.2, seed=3)
+
+    first_manager = generate_manager(manager_name="HogerGuardsManager", scenario=scenario, num_search_workers=1)
+    second_manager = generate_manager(manager_name="HogerGuardsManager", scenario=scenario, num_search_workers=1)
+
+    assert [(shift.date, shift.shift_type.name, shift.is_holiday) for shift in first_manager.shifts] == \
+        [(shift.date, shift.shift_type.name, shift.is_holiday) for shift in second_manager.shifts]
+    assert [(guard.name, guard.restrictions) for guard in first_manager.guards] == \
+        [(guard.name, guard.restrictions) for guard in second_manager.guards]
+
+
+def test_models_get_their_default_constraints():
+    scenario = BenchmarkScenario(num_guards=10, num_days=14)
+
+    manager = generate_manager(manager_name="HogerGuardsManager", scenario=scenario, num_search_workers=1)
+    bare_manager = generate_manager(manager_name="HogerGuardsManager",
+                                    scenario=scenario.copy(update={"use_default_constraints": False}),
+                                    num_search_workers=1)
+
+    for model in (manager.weekends_model, manager.regular_model):
+        assert [type(constraint) for constraint in model.constraints] == \
+            [type(constraint) for constraint in model.get_default_constraints()]
+    assert not bare_manager.weekends_model.constraints and not bare_manager.regular_model.constraints
+
+
+@pytest.mark.parametrize("manager_name", list(MANAGERS))
+def test_benchmark_manager_solves_small_scenario(manager_name):
+    scenario = BenchmarkScenario(num_guards=8, num_days=7, num_shift_types=1)
+
+    result = benchmark_manager(manager_name=manager_name, scenario=scenario, num_search_workers=1,
+                               timeout_in_seconds=5)
+
+    for model_result in (result.weekends_model, result.regular_model):
+        assert model_result.status in ("OPTIMAL", "FEASIBLE")
+        assert model_result.error is None
+        assert model_result.num_variables > 0
+    assert result.peak_memory_mb > 0
@@ -0,0 +1,87 @@
+import asyncio
+from unittest import mock
+
+from beanie import PydanticObjectId
+from starlette.requests import Request
+
+from models.user import UserModel
+from routes.users import save_user
+from utils.authorization_utils import active_users_cache
+from utils.cache_utils import ResponseCache, TTLCache
+
+
+def create_request(if_none_match: str = None) -> Request:
+    headers = [] if if_none_match is None else [(b"if-none-match", if_none_match.encode())]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_cached_content_is_reused_until_invalidated():
+    async def run():
+        cache = ResponseCache(ttl_seconds=60)
+        calls = []
+
+        async def get_content():
+            calls.append(None)
+            return {"calls": len(calls)}
+
+        first = await cache.respond(request=create_request(), key="key", get_content=get_content)
+        second = await cache.respond(request=create_request(), key="key", get_content=get_content)
+        assert first.body == second.body == b'{"calls":1}'
+
+        cache.invalidate("key")
+        third = await cache.respond(request=create_request(), key="key", get_content=get_content)
+        assert third.body == b'{"calls":2}'
+        assert third.headers["etag"] != first.headers["etag"]
+
+    asyncio.run(run())
+
+
+def test_matching_etag_returns_not_modified():
+    async def run():
+        cache = ResponseCache(ttl_seconds=60)
+
+        async def get_content():
+            return ["a", None]
+
+        etag = (await cache.respond(request=create_request(), key="key", get_content=get_content)).headers["etag"]
+        not_modified = await cache.respond(request=create_request(f'"other", W/{etag}'), key="key",
+                                           get_content=get_content)
+        modified = await cache.respond(request=create_request('"other"'), key="key", get_content=get_content)
+
+        assert not_modified.status_code == 304 and not_modified.body == b""
+        assert modified.status_code == 200
+
+    asyncio.run(run())
+
+
+def test_ttl_cache_evicts_least_recently_used_and_returns_copies():
+    cache = TTLCache(max_size=2, ttl_seconds=60, copy=list)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    cache.get("a").append(3)
+    cache.put("c", [4])
+
+    assert cache.get("a") == [1]
+    assert cache.get("b") is None
+    assert cache.get("c") == [4]
+
+
+def test_ttl_cache_entries_expire():
+    cache = TTLCache(max_size=2, ttl_seconds=0)
+    cache.put("a", 1)
+
+    assert cache.get("a") is None
+
+
+def test_renamed_user_is_invalidated_by_previous_username():
+    user_id = PydanticObjectId()
+    previous_user = UserModel.construct(id=user_id, username="old_name")
+    user = UserModel.construct(id=user_id, username="new_name")
+    active_users_cache.put("old_name", previous_user)
+    active_users_cache.put("new_name", user)
+
+    with mock.patch.object(UserModel, "save_without_scores", mock.AsyncMock(return_value=previous_user)):
+        asyncio.run(save_user(user=user))
+
+    assert active_users_cache.get("old_name") is None
+    assert active_users_cache.get("new_name") is None
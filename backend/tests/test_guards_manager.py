@@ -0,0 +1,18 @@
+import pytest
+
+from assignments_model.guards_manager import HogerGuardsManager
+from tests.helpers import create_guards, create_shifts
+
+
+@pytest.mark.parametrize("is_pipelined", [True, False])
+def test_manager_assigns_every_shift_once(is_pipelined):
+    shifts = create_shifts(num_days=7)
+    manager = HogerGuardsManager(guards=create_guards(num_guards=6),
+                                 shifts=shifts,
+                                 constraints=[],
+                                 num_search_workers=1,
+                                 is_pipelined=is_pipelined)
+
+    assignments = manager.solve().to_list()
+
+    assert sorted(id(assignment.shift) for assignment in assignments) == sorted(id(shift) for shift in shifts)
@@ -0,0 +1,88 @@
+import asyncio
+
+from beanie import PydanticObjectId
+from fastapi import HTTPException
+
+from models.job import JobStatus
+from utils.job_queue import JobQueue
+
+
+def test_jobs_run_with_bounded_concurrency():
+    async def run():
+        queue = JobQueue(max_concurrent_jobs=2, retention_seconds=60)
+        owner_id = PydanticObjectId()
+        running = []
+        max_running = 0
+
+        async def job_function(report_progress, value):
+            nonlocal max_running
+            report_progress("working")
+            running.append(value)
+            max_running = max(max_running, len(running))
+            await asyncio.sleep(0.01)
+            running.remove(value)
+            return value * 2
+
+        jobs = [queue.submit(owner_id, job_function, i) for i in range(5)]
+        assert all(job.status == JobStatus.QUEUED for job in jobs)
+        await asyncio.sleep(0.2)
+
+        assert max_running == 2
+        assert all(job.status == JobStatus.SUCCEEDED and job.progress == "working" for job in jobs)
+        assert [queue.get_result(job.id) for job in jobs] == [0, 2, 4, 6, 8]
+        assert queue.get(jobs[0].id, owner_id) is jobs[0]
+        assert queue.get(jobs[0].id, PydanticObjectId()) is None
+
+    asyncio.run(run())
+
+
+def test_failed_job_keeps_error():
+    async def run():
+        queue = JobQueue(max_concurrent_jobs=1, retention_seconds=60)
+
+        async def job_function(report_progress):
+            raise ValueError("infeasible")
+
+        job = queue.submit(PydanticObjectId(), job_function)
+        await asyncio.sleep(0.05)
+
+        assert job.status == JobStatus.FAILED
+        assert "infeasible" in job.error
+        assert job.finished_at is not None
+
+    asyncio.run(run())
+
+
+def test_job_reports_details():
+    async def run():
+        queue = JobQueue(max_concurrent_jobs=1, retention_seconds=60)
+
+        async def job_function(report_progress):
+            report_progress("working")
+            report_progress(details={"telemetry": [1]})
+
+        job = queue.submit(PydanticObjectId(), job_function)
+        await asyncio.sleep(0.05)
+
+        assert job.progress == "working"
+        assert job.details == {"telemetry": [1]}
+
+    asyncio.run(run())
+
+
+def test_failed_job_keeps_structured_error_detail():
+    async def run():
+        queue = JobQueue(max_concurrent_jobs=1, retention_seconds=60)
+        detail = {"message": "Model is infeasible", "conflicts": [{"constraint": "Restriction"}]}
+
+        async def job_function(report_progress):
+            raise HTTPException(status_code=500, detail=detail)
+
+        job = queue.submit(PydanticObjectId(), job_function)
+        await asyncio.sleep(0.05)
+
+        assert job.status == JobStatus.FAILED
+        assert job.error == "Model is infeasible"
+        assert job.details == {"error_detail": detail}
+
+    asyncio.run(run())
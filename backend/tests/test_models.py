@@ -0,0 +1,168 @@
+import datetime
+import pickle
+
+import pytest
+
+from assignments_model.constraints import LimitOnlyOneHolidayInService, SpecificDayPerGuardPerMonthWithHistoryConstraint
+from assignments_model.diagnostics import ConflictingConstraint
+from assignments_model.entities import Assignment, Shift, ShiftCollection
+from assignments_model.errors import InfeasibleModelException
+from assignments_model.utils.model_utils import get_common_multiple_weights
+from constants.constants import FairnessObjective, Weekday
+from tests.helpers import create_model, START_DATE, SHIFT_TYPES
+
+
+def test_no_variables_for_restricted_dates():
+    model = create_model()
+    guard = model.guards[0]
+    guard.add_request(START_DATE)
+
+    assert all(shift.date != START_DATE for shift in model.vars_by_guard[guard])
+    assert len(model.assignment_vars) == len(model.shifts) * len(model.guards) - 2
+
+
+def test_restrictions_added_after_variables_are_applied():
+    model = create_model()
+    guard = model.guards[0]
+    model.add_hints([Assignment(shift=model.shifts.find(date=START_DATE)[0], guard=guard)])
+    guard.add_request(START_DATE)
+    model.build_model()
+
+    assignments = model.solve().to_list()
+
+    assert not any(assignment.guard is guard and assignment.shift.date == START_DATE for assignment in assignments)
+
+
+def test_no_variables_for_constraint_exclusions():
+    model = create_model()
+    model.add_constraints([LimitOnlyOneHolidayInService()])
+
+    for guard in model.guards:
+        guard_shifts = model.vars_by_guard[guard]
+        if guard.num_holidays > 0:
+            assert not any(shift.is_holiday for shift in guard_shifts)
+        else:
+            assert len(guard_shifts) == len(model.shifts)
+
+
+def test_solution_assigns_every_shift_once():
+    model = create_model()
+    model.guards[0].add_request(START_DATE)
+    model.build_model()
+
+    assignments = model.solve().to_list()
+
+    assert sorted(id(assignment.shift) for assignment in assignments) == sorted(id(shift) for shift in model.shifts)
+    assert not any(assignment.guard is model.guards[0] and assignment.shift.date == START_DATE
+                   for assignment in assignments)
+
+
+def test_history_over_day_limit_keeps_model_feasible():
+    model = create_model()
+    # START_DATE is a Saturday, so these are the 3 previous Fridays
+    model.guards[0].previous_shifts = ShiftCollection(Shift(date=START_DATE - datetime.timedelta(days=days),
+                                                            shift_type=SHIFT_TYPES[0],
+                                                            is_holiday=False)
+                                                      for days in (1, 8, 15))
+    model.add_constraints([SpecificDayPerGuardPerMonthWithHistoryConstraint(min_days_per_month=0,
+                                                                            max_days_per_month=2,
+                                                                            day=Weekday.FRIDAY_WEEKDAY,
+                                                                            history_days=60)])
+    model.build_model()
+
+    assignments = model.solve().to_list()
+
+    assert sorted(id(assignment.shift) for assignment in assignments) == sorted(id(shift) for shift in model.shifts)
+
+
+def test_common_multiple_weights():
+    assert get_common_multiple_weights([2, 3, 4], max_common_multiple=100) == [6, 4, 3]
+    assert get_common_multiple_weights([7, 11, 13], max_common_multiple=100) == [14, 9, 8]
+
+
+def test_linear_objective_has_no_divisions():
+    model = create_model(fairness_objective=FairnessObjective.LINEAR)
+    model.build_model()
+
+    assert not any(constraint.HasField("int_div") for constraint in model.model.Proto().constraints)
+    assignments = model.solve().to_list()
+    assert sorted(id(assignment.shift) for assignment in assignments) == sorted(id(shift) for shift in model.shifts)
+
+
+def test_linear_objective_prefers_guards_with_more_time_in_duty():
+    model = create_model(num_days=7, num_guards=3, fairness_objective=FairnessObjective.LINEAR)
+    model.build_model()
+
+    assignments = model.solve().to_list()
+
+    # Scores are divided by time in duty + 1 (2, 3 and 4), so the last guard should get the most score
+    scores_by_guard = {guard.name: 0 for guard in model.guards}
+    for assignment in assignments:
+        scores_by_guard[assignment.guard.name] += \
+            assignment.guard.calculate_score_for_shift(assignment.shift).regular_score
+    assert scores_by_guard["guard_2"] > scores_by_guard["guard_0"]
+
+
+def test_solution_has_telemetry():
+    model = create_model()
+    model.build_model()
+
+    telemetry = model.solve().telemetry[0]
+
+    assert telemetry.model == "UnifiedScoreRegularModel"
+    assert telemetry.status in ("OPTIMAL", "FEASIBLE")
+    assert telemetry.gap is not None and telemetry.num_conflicts is not None
+    assert [phase.name for phase in telemetry.phases] == ["base_constraints", "assignment_vars", "objective", "solve"]
+    assert telemetry.get_phase("assignment_vars").num_variables == len(model.assignment_vars)
+    assert [constraint.name for constraint in telemetry.constraints] == ["GuardsPerShiftConstraint",
+                                                                         "ShiftsPerGuardPerDayConstraint"]
+    assert telemetry.constraints[0].num_constraints == len(model.shifts)
+    assert telemetry.num_variables >= len(model.assignment_vars)
+
+
+def test_enforcing_ineligible_assignment_is_infeasible():
+    model = create_model()
+    guard = model.guards[0]
+    guard.add_request(START_DATE)
+    model.enforce_assignment(Assignment(shift=model.shifts.find(date=START_DATE)[0], guard=guard))
+    model.build_model()
+
+    with pytest.raises(InfeasibleModelException) as exc_info:
+        model.solve()
+    assert exc_info.value.conflicts == []
+
+
+def test_explained_infeasibility_names_conflicting_constraints():
+    model = create_model(explain_infeasibility=True)
+    guard = model.guards[0]
+    guard.add_request(START_DATE)
+    shift = model.shifts.find(date=START_DATE)[0]
+    model.enforce_assignment(Assignment(shift=shift, guard=guard))
+    model.build_model()
+
+    with pytest.raises(InfeasibleModelException) as exc_info:
+        model.solve()
+
+    conflicts = {(conflict.constraint, conflict.guard_name, conflict.shift_date)
+                 for conflict in exc_info.value.conflicts}
+    assert conflicts == {("Restriction", guard.name, START_DATE), ("EnforcedAssignment", guard.name, START_DATE)}
+
+
+def test_infeasible_model_exception_is_picklable():
+    exception = InfeasibleModelException("infeasible", conflicts=[ConflictingConstraint(constraint="Restriction")])
+
+    unpickled = pickle.loads(pickle.dumps(exception))
+
+    assert str(unpickled) == "infeasible"
+    assert unpickled.conflicts == exception.conflicts
+
+
+def test_hints_cover_other_guards_of_hinted_shift():
+    model = create_model()
+    shift = model.shifts[0]
+    model.add_hints([Assignment(shift=shift, guard=model.guards[1])], is_repair=True)
+
+    assert model.hints[shift, model.guards[1]] is True
+    assert sum(model.hints.values()) == 1
+    assert len(model.hints) == len(model.vars_by_shift[shift])
+    assert model.solver.parameters.repair_hint
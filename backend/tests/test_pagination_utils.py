@@ -0,0 +1,29 @@
+import datetime
+
+import pytest
+from beanie import PydanticObjectId
+from fastapi import HTTPException
+
+from utils.pagination_utils import encode_date_cursor, decode_date_cursor, after_date_cursor_filter
+
+
+def test_cursor_round_trip():
+    date = datetime.datetime(2022, 1, 2)
+    id_ = PydanticObjectId()
+
+    assert decode_date_cursor(encode_date_cursor(date=date, id_=id_)) == (date, id_)
+
+
+def test_after_cursor_filter_breaks_date_ties_by_id():
+    date = datetime.datetime(2022, 1, 2)
+    id_ = PydanticObjectId()
+
+    assert after_date_cursor_filter(encode_date_cursor(date=date, id_=id_)) == {
+        "$or": [{"date": {"$gt": date}}, {"date": date, "_id": {"$gt": id_}}]
+    }
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", encode_date_cursor(datetime.datetime(2022, 1, 2), "x" * 24)])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException):
+        decode_date_cursor(cursor)
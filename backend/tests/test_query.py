@@ -0,0 +1,38 @@
+from assignments_model.query import ShiftQuery, UnionQuery
+from models.score import DayTypeEnum
+from tests.helpers import create_shifts
+
+
+def test_union_query_is_ordered_and_non_repeating():
+    shifts = create_shifts()
+    query = UnionQuery(queries=[ShiftQuery(is_holiday=True),
+                                ShiftQuery(day_types=(DayTypeEnum.WEEKEND,))])
+
+    found = query.evaluate(shifts)
+
+    assert found.to_list() == [shift for shift in shifts if shift.is_holiday or shift.is_weekend()]
+
+
+def test_query_results_are_memoized_per_collection():
+    shifts = create_shifts()
+    query = ShiftQuery(shift_types=("LOTEM",))
+
+    assert query.evaluate(shifts) is ShiftQuery(shift_types=("LOTEM",)).evaluate(shifts)
+    assert query.evaluate(shifts) is not query.evaluate(create_shifts())
+
+
+def test_query_is_recompiled_after_change():
+    shifts = create_shifts()
+    query = ShiftQuery(is_holiday=True)
+    holiday_shifts = query.evaluate(shifts)
+
+    query.is_holiday = False
+
+    assert query.evaluate(shifts).to_list() == [shift for shift in shifts if shift not in holiday_shifts]
+
+
+def test_empty_union_query_is_empty():
+    shifts = create_shifts()
+
+    assert len(ShiftQuery().evaluate(shifts)) == len(shifts)
+    assert len(UnionQuery(queries=[]).evaluate(shifts)) == 0
@@ -0,0 +1,80 @@
+import datetime
+
+import pytest
+
+from assignments_model.entities import ShiftCollection, Assignment
+from assignments_model.errors import InfeasibleModelException
+from assignments_model.guards_manager import HogerGuardsManager
+from assignments_model.rolling_horizon import split_horizon, RollingHorizonManager, get_horizon_span
+from tests.helpers import create_guards, create_shifts, START_DATE
+
+
+def test_windows_overlap_and_commit_on_sundays():
+    shifts = create_shifts(num_days=70)
+
+    windows = split_horizon(shifts, window_days=35, overlap_days=7)
+
+    assert [window.commit_end_date for window in windows] == [datetime.date(2022, 1, 23),
+                                                              datetime.date(2022, 2, 20),
+                                                              None]
+    assert all(window.commit_end_date.weekday() == 6 for window in windows[:-1])
+    for window, next_window in zip(windows, windows[1:]):
+        assert min(next_window.shifts.all_dates()) == window.commit_end_date
+        assert max(window.shifts.all_dates()) > window.commit_end_date
+    assert max(windows[-1].shifts.all_dates()) == START_DATE + datetime.timedelta(days=69)
+
+
+def test_short_horizon_is_a_single_window():
+    shifts = create_shifts(num_days=30)
+
+    windows = split_horizon(shifts, window_days=35, overlap_days=7)
+
+    assert len(windows) == 1 and windows[0].commit_end_date is None
+    assert get_horizon_span(shifts) == 30
+
+
+def test_window_must_be_longer_than_overlap():
+    with pytest.raises(ValueError):
+        split_horizon(create_shifts(num_days=30), window_days=7, overlap_days=7)
+
+
+def test_rolling_horizon_assigns_every_shift_once_and_carries_guards():
+    shifts = create_shifts(num_days=40)
+    guards = create_guards(num_guards=6)
+    scores_before = sum(guard.score.regular_score + guard.score.weekend_score for guard in guards)
+
+    def create_manager(window_shifts: ShiftCollection, explain_infeasibility: bool = False) -> HogerGuardsManager:
+        return HogerGuardsManager(guards=guards, shifts=window_shifts, constraints=[], num_search_workers=1,
+                                  timeout_in_seconds=1.0, explain_infeasibility=explain_infeasibility)
+
+    manager = RollingHorizonManager(shifts=shifts, create_manager=create_manager, window_days=21, overlap_days=7)
+    assignments = manager.solve()
+
+    assert len(manager.windows) > 1
+    assert len(assignments.telemetry) == 2 * len(manager.windows)
+    assert sorted(id(assignment.shift) for assignment in assignments) == sorted(id(shift) for shift in shifts)
+    assert sum(len(guard.previous_shifts) for guard in guards) == len(shifts)
+    assert sum(guard.score.regular_score + guard.score.weekend_score for guard in guards) > scores_before
+
+
+def test_only_infeasible_window_is_explained():
+    shifts = create_shifts(num_days=40)
+    guards = create_guards(num_guards=6)
+    # A restricted date that is only part of the second window
+    date = START_DATE + datetime.timedelta(days=21)
+    guards[0].add_request(date)
+    explained_windows = []
+
+    def create_manager(window_shifts: ShiftCollection, explain_infeasibility: bool = False) -> HogerGuardsManager:
+        explained_windows.append(explain_infeasibility)
+        return HogerGuardsManager(guards=guards, shifts=window_shifts, constraints=[], num_search_workers=1,
+                                  timeout_in_seconds=1.0, explain_infeasibility=explain_infeasibility)
+
+    manager = RollingHorizonManager(shifts=shifts, create_manager=create_manager, window_days=21, overlap_days=7,
+                                    explain_infeasibility=True)
+    manager.enforce_assignments([Assignment(shift=shifts.find(date=date)[0], guard=guards[0])])
+    with pytest.raises(InfeasibleModelException) as exc_info:
+        manager.solve()
+
+    assert explained_windows == [False, False, True]
+    assert {conflict.constraint for conflict in exc_info.value.conflicts} == {"Restriction", "EnforcedAssignment"}
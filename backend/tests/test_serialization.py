@@ -0,0 +1,79 @@
+import pickle
+from unittest import mock
+
+import pytest
+
+from assignments_model.constraints import LimitOnlyOneHolidayInService
+from assignments_model.entities import Assignment
+from assignments_model.errors import InfeasibleModelException
+from assignments_model.serialization import encode_solve_payload, decode_solve_payload, decode_assignments
+from auto_assign import get_solver_executor, solve_payload, create_guards_manager
+from constants.constants import FairnessObjective
+from models.structs import PopulationType
+from tests.helpers import create_guards, create_shifts, START_DATE
+
+
+def test_payload_round_trip():
+    shifts = create_shifts(num_days=7).to_list()
+    guards = create_guards(num_guards=3).to_list()
+    guards[0].add_request(START_DATE)
+    guards[1].previous_shifts.append(shifts[0])
+
+    payload = encode_solve_payload(population_type=PopulationType.HOGER,
+                                   shifts=shifts,
+                                   guards=guards,
+                                   constraints=[LimitOnlyOneHolidayInService()],
+                                   enforced_assignments=[Assignment(shift=shifts[3], guard=guards[2])])
+    solve_input = decode_solve_payload(pickle.loads(pickle.dumps(payload)))
+
+    assert [(shift.date, shift.shift_type.name, shift.is_holiday) for shift in solve_input.shifts] == \
+           [(shift.date, shift.shift_type.name, shift.is_holiday) for shift in shifts]
+    assert [guard.name for guard in solve_input.guards] == [guard.name for guard in guards]
+    assert solve_input.guards[0].restrictions == [START_DATE]
+    assert solve_input.guards[1].previous_shifts[0] is solve_input.shifts[0]
+    assert solve_input.enforced_assignments[0].shift is solve_input.shifts[3]
+    assert solve_input.enforced_assignments[0].guard is solve_input.guards[2]
+    assert isinstance(solve_input.constraints[0], LimitOnlyOneHolidayInService)
+
+
+def test_solve_in_solver_process():
+    shifts = create_shifts(num_days=7).to_list()
+    guards = create_guards(num_guards=6).to_list()
+    payload = encode_solve_payload(population_type=PopulationType.HOGER,
+                                   shifts=shifts,
+                                   guards=guards,
+                                   constraints=[])
+
+    rows, telemetry = get_solver_executor().submit(solve_payload, payload, 1).result()
+    assignments = decode_assignments(rows, shifts=shifts, guards=guards)
+
+    assert sorted(id(assignment.shift) for assignment in assignments) == sorted(id(shift) for shift in shifts)
+    assert [model_telemetry.model for model_telemetry in telemetry] == ["HogersWeekendModel", "HogersRegularModel"]
+
+
+def test_infeasible_payload_is_explained_in_solver_process():
+    shifts = create_shifts(num_days=7).to_list()
+    guards = create_guards(num_guards=6).to_list()
+    guards[0].add_request(START_DATE)
+    payload = encode_solve_payload(population_type=PopulationType.HOGER,
+                                   shifts=shifts,
+                                   guards=guards,
+                                   constraints=[],
+                                   enforced_assignments=[Assignment(shift=shifts[0], guard=guards[0])])
+
+    with pytest.raises(InfeasibleModelException) as exc_info:
+        get_solver_executor().submit(solve_payload, payload, 1, FairnessObjective.DIVISION, True).result()
+
+    assert {conflict.constraint for conflict in exc_info.value.conflicts} == {"Restriction", "EnforcedAssignment"}
+
+
+def test_feasible_payload_is_solved_without_explanation():
+    payload = encode_solve_payload(population_type=PopulationType.HOGER,
+                                   shifts=create_shifts(num_days=7).to_list(),
+                                   guards=create_guards(num_guards=6).to_list(),
+                                   constraints=[])
+
+    with mock.patch("auto_assign.create_guards_manager", wraps=create_guards_manager) as create_manager:
+        solve_payload(payload, 1, FairnessObjective.DIVISION, True)
+
+    assert [call.kwargs["explain_infeasibility"] for call in create_manager.call_args_list] == [False]
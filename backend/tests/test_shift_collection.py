@@ -0,0 +1,57 @@
+import datetime
+
+from assignments_model.entities import Shift
+from models.score import DayTypeEnum
+from tests.helpers import create_shifts, START_DATE, SHIFT_TYPES
+
+
+def test_find_by_single_date():
+    shifts = create_shifts()
+    date = START_DATE + datetime.timedelta(days=5)
+
+    found = shifts.find(date=date)
+
+    assert [shift.date for shift in found] == [date, date]
+
+
+def test_find_by_date_range_keeps_order():
+    shifts = create_shifts()
+    start_date = START_DATE + datetime.timedelta(days=3)
+    end_date = START_DATE + datetime.timedelta(days=9)
+
+    found = shifts.find(start_date=start_date, end_date=end_date)
+
+    assert found.to_list() == [shift for shift in shifts if start_date <= shift.date <= end_date]
+
+
+def test_find_intersects_all_criteria():
+    shifts = create_shifts()
+    start_date = START_DATE + datetime.timedelta(days=10)
+
+    found = shifts.find(start_date=start_date, shift_types=("YADIN",), weekdays=[4, 5], is_holiday=False)
+
+    assert found.to_list() == [shift for shift in shifts
+                               if shift.date >= start_date
+                               and shift.shift_type.name == "YADIN"
+                               and shift.date.weekday() in (4, 5)
+                               and not shift.is_holiday]
+
+
+def test_find_by_day_types():
+    shifts = create_shifts()
+
+    found = shifts.find(day_types=(DayTypeEnum.THURSDAY, DayTypeEnum.WEEKEND))
+
+    assert found.to_list() == [shift for shift in shifts
+                               if shift.day_type in (DayTypeEnum.THURSDAY, DayTypeEnum.WEEKEND)]
+
+
+def test_find_after_append_sees_new_shift():
+    shifts = create_shifts(num_days=3)
+    date = START_DATE + datetime.timedelta(days=100)
+    assert not shifts.find(date=date)
+
+    new_shift = Shift(date=date, shift_type=SHIFT_TYPES[0])
+    shifts.append(new_shift)
+
+    assert shifts.find(date=date).to_list() == [new_shift]
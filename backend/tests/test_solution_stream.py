@@ -0,0 +1,123 @@
+import asyncio
+import queue
+import threading
+import timeit
+
+import pytest
+from beanie import PydanticObjectId
+
+from assignments_model.errors import SolveCancelledException
+from assignments_model.serialization import encode_solve_payload, decode_assignments
+from assignments_model.solution_stream import SolutionChannel
+from auto_assign import get_solver_executor, solve_payload
+from constants.constants import FairnessObjective
+from models.structs import PopulationType
+from tests.helpers import create_model, create_guards, create_shifts
+from utils.solution_stream import SolutionStream
+
+
+def create_channel() -> SolutionChannel:
+    return SolutionChannel(queue=queue.Queue(), accepted=threading.Event(), cancelled=threading.Event())
+
+
+def get_events(channel: SolutionChannel) -> list:
+    events = []
+    while not channel.queue.empty():
+        events.append(channel.queue.get())
+    return events
+
+
+def test_solutions_are_published_as_differences():
+    model = create_model()
+    for entity in list(model.shifts) + list(model.guards):
+        entity.id_ = PydanticObjectId()
+    model.build_model()
+    channel = create_channel()
+
+    assignments = model.solve(solution_channel=channel)
+
+    events = get_events(channel)
+    assert [event.solution_number for event in events] == list(range(1, len(events) + 1))
+    assert all(event.model == "UnifiedScoreRegularModel" for event in events)
+    current = set()
+    for event in events:
+        current = (current - set(event.removed)) | set(event.added)
+    assert len(current) == len(model.shifts)
+    assert current == {(assignment.shift.id_, assignment.guard.id_) for assignment in assignments}
+
+
+def test_accepted_solve_stops_at_next_solution():
+    model = create_model()
+    model.build_model()
+    channel = create_channel()
+    channel.accepted.set()
+
+    assignments = model.solve(solution_channel=channel)
+
+    assert len(get_events(channel)) == 1
+    assert len(assignments.to_list()) == len(model.shifts)
+
+
+def test_cancelled_solve_raises():
+    model = create_model()
+    model.build_model()
+    channel = create_channel()
+    channel.cancelled.set()
+
+    with pytest.raises(SolveCancelledException):
+        model.solve(solution_channel=channel)
+
+
+def test_cancel_stops_running_solve():
+    # Big enough that the solve runs until its 5 seconds timeout
+    model = create_model(num_days=28, num_guards=20)
+    model.build_model()
+    channel = create_channel()
+    threading.Timer(0.5, channel.cancelled.set).start()
+
+    start_time = timeit.default_timer()
+    with pytest.raises(SolveCancelledException):
+        model.solve(solution_channel=channel)
+    assert timeit.default_timer() - start_time < 2
+
+
+def test_accept_stops_running_solve_with_best_solution():
+    model = create_model(num_days=28, num_guards=20)
+    model.build_model()
+    channel = create_channel()
+    threading.Timer(0.5, channel.accepted.set).start()
+
+    start_time = timeit.default_timer()
+    assignments = model.solve(solution_channel=channel)
+    assert timeit.default_timer() - start_time < 2
+    assert len(assignments.to_list()) == len(model.shifts)
+
+
+def test_stream_collects_solutions_of_solver_process():
+    shifts = create_shifts(num_days=7).to_list()
+    guards = create_guards(num_guards=6).to_list()
+    payload = encode_solve_payload(population_type=PopulationType.HOGER, shifts=shifts, guards=guards, constraints=[])
+
+    async def run():
+        solution_stream = SolutionStream()
+        followed = []
+
+        async def follow():
+            async for event in solution_stream.follow():
+                followed.append(event)
+
+        follower = asyncio.ensure_future(follow())
+        async with solution_stream.collect():
+            rows, _ = await asyncio.get_event_loop().run_in_executor(
+                get_solver_executor(), solve_payload, payload, 1, FairnessObjective.DIVISION, False,
+                solution_stream.create_channel(task_index=3))
+        await asyncio.wait_for(follower, timeout=5)
+        return rows, solution_stream, followed
+
+    rows, solution_stream, followed = asyncio.run(run())
+
+    assert solution_stream.is_closed
+    assert followed == solution_stream.events
+    assert {event.model for event in followed} == {"HogersWeekendModel", "HogersRegularModel"}
+    assert all(event.task_index == 3 for event in followed)
+    assert len(decode_assignments(rows, shifts=shifts, guards=guards)) == len(shifts)
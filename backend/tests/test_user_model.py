@@ -0,0 +1,62 @@
+import asyncio
+from unittest import mock
+
+from beanie import PydanticObjectId
+
+from models.score import ScoreModel
+from models.structs import Date, PopulationType
+from models.user import UserModel, PopulationSettings, HogerGuardExtraParams, DateRestrictionModel
+
+
+def create_user(initial_score: ScoreModel = ScoreModel()) -> UserModel:
+    # DB documents can't be validated without a DB, so they are created without validation
+    return UserModel.construct(
+        id=PydanticObjectId(),
+        username="user",
+        name="user",
+        branch=PydanticObjectId(),
+        roles=[],
+        population_types=[PopulationType.HOGER],
+        population_settings=[PopulationSettings(population_type=PopulationType.HOGER,
+                                                score_multiplier=1,
+                                                restrictions=[],
+                                                extra_params=HogerGuardExtraParams(num_holidays=0),
+                                                score=ScoreModel(regular_score=5),
+                                                initial_score=initial_score,
+                                                join_date=Date(2022, 1, 1))]
+    )
+
+
+def get_set_fields(collection: mock.Mock) -> list:
+    return [field
+            for call in collection.update_one.call_args_list
+            for field in call.args[1].get("$set", {})]
+
+
+def test_restrictions_and_roles_are_saved_without_scores():
+    user = create_user()
+    user.get_population_settings(PopulationType.HOGER).restrictions.append(DateRestrictionModel(date=Date(2022, 1, 2)))
+    user.roles.append("role")
+    collection = mock.Mock(update_one=mock.AsyncMock())
+
+    with mock.patch.object(UserModel, "get_motor_collection", return_value=collection):
+        asyncio.run(user.save_restrictions(population_type=PopulationType.HOGER))
+        asyncio.run(user.save_roles())
+
+    assert get_set_fields(collection) == ["population_settings.$.restrictions", "roles"]
+
+
+def test_saved_user_keeps_score_and_gets_initial_score_change():
+    saved_user = create_user()
+    user = create_user(initial_score=ScoreModel(regular_score=2, weekend_score=1))
+    user.id = saved_user.id
+    collection = mock.Mock(update_one=mock.AsyncMock())
+
+    with mock.patch.object(UserModel, "get_motor_collection", return_value=collection), \
+            mock.patch.object(UserModel, "get", mock.AsyncMock(return_value=saved_user)):
+        asyncio.run(user.save_without_scores())
+
+    assert not any(field.split(".")[-1] == "score" for field in get_set_fields(collection))
+    increments = [call.args[1]["$inc"] for call in collection.update_one.call_args_list if "$inc" in call.args[1]]
+    assert increments == [{"population_settings.$.score.regular_score": 2,
+                           "population_settings.$.score.weekend_score": 1}]
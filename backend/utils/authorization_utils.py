@@ -7,7 +7,9 @@ from fastapi_permissions import Everyone, Authenticated, configure_permissions,
 from jose import jwt, JWTError
 from starlette import status
 
+from config import settings
 from models.user import UserModel
+from utils.cache_utils import TTLCache
 
 SECRET_KEY = "SUPERSECRET"  # TODO: replace with environment variable
 HASH_ALGORITHM = "HS256"
@@ -35,6 +37,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Maps username to user. Users are copied in and out of the cache, so requests can't modify each other's users
+active_users_cache = TTLCache(max_size=settings.auth_cache_max_size,
+                              ttl_seconds=settings.auth_cache_ttl_seconds,
+                              copy=lambda user: user.copy(deep=True))
+
 authorization_exception = HTTPException(
     status_code=status.HTTP_403_FORBIDDEN,
     detail="Insufficient permissions"
@@ -59,12 +66,37 @@ async def get_active_user(token: str = Depends(oauth2_scheme)) -> UserModel:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = await UserModel.find_one(UserModel.username == username)
+    user = active_users_cache.get(username)
     if user is None:
-        raise credentials_exception
+        user = await UserModel.find_one(UserModel.username == username)
+        if user is None:
+            raise credentials_exception
+        active_users_cache.put(username, user)
     return user
 
 
+def invalidate_active_user(user: UserModel):
+    """
+    Remove a user from the cache of authenticated users, after his roles, or the user himself, were changed
+    :param user: changed user
+    """
+    active_users_cache.invalidate(user.username)
+
+
+async def get_active_user_from_db(user: UserModel = Depends(get_active_user)) -> UserModel:
+    """
+    Get the current version of the active user from DB, for routes that return or save the user himself, since the
+    cached user may be a few seconds old
+    :param user: active user
+    :return: user from DB
+    """
+    db_user = await UserModel.get(user.id)
+    if db_user is None:
+        invalidate_active_user(user)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    return db_user
+
+
 def get_active_principals(user: UserModel = Depends(get_active_user)):
     """
     Dependency that retrieves security principals of active user
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Hashable, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from starlette import status
+from starlette.requests import Request
+from starlette.responses import Response
+
+from config import settings
+
+
+class CachedContent(NamedTuple):
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check whether the client already has the current version of a resource, according to its If-None-Match header
+    :param request: request of the client
+    :param etag: ETag of the current version of the resource
+    :return: True if the resource wasn't modified since the client fetched it
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    client_etags = [client_etag.strip() for client_etag in if_none_match.split(",")]
+    # Weak comparison is enough for a GET
+    return "*" in client_etags or etag in [client_etag[2:] if client_etag.startswith("W/") else client_etag
+                                          for client_etag in client_etags]
+
+
+class ResponseCache:
+    """
+    In-process cache of serialized JSON responses of read-mostly endpoints, with ETag support.
+    Routes that modify a cached resource invalidate its key. Every process has its own cache, so the TTL bounds how
+    long another process may serve a stale response
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, CachedContent] = {}
+
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    async def _get_content(self,
+                           key: str,
+                           get_content: Callable[[], Awaitable[Any]],
+                           exclude_none: bool) -> CachedContent:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            content = jsonable_encoder(await get_content(), exclude_none=exclude_none)
+            body = json.dumps(content, ensure_ascii=False,
+                              separators=(",", ":")).encode("utf-8")
+            entry = CachedContent(body=body,
+                                  etag=f'"{hashlib.sha1(body).hexdigest()}"',
+                                  expires_at=time.monotonic() + self.ttl_seconds)
+            self._entries[key] = entry
+        return entry
+
+    async def respond(self,
+                      request: Request,
+                      key: str,
+                      get_content: Callable[[], Awaitable[Any]],
+                      exclude_none: bool = False) -> Response:
+        """
+        Respond with cached content, or with 304 Not Modified if the client already has it
+        :param request: request of the client
+        :param key: key of the cached resource
+        :param get_content: coroutine function that gets the resource when it isn't cached
+        :param exclude_none: whether None values should be omitted from the content
+        :return: response
+        """
+        entry = await self._get_content(key=key, get_content=get_content, exclude_none=exclude_none)
+        # Clients must revalidate on every use, so invalidated content is never used by them
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+
+        if etag_matches(request=request, etag=entry.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+class TTLCache:
+    """
+    In-process LRU cache whose entries expire after a fixed time
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, copy: Optional[Callable[[Any], Any]] = None):
+        """
+        :param max_size: maximal number of entries, the least recently used entry is evicted when it's exceeded
+        :param ttl_seconds: how long an entry is valid after it's added
+        :param copy: function that copies values when they are returned, so callers can't modify cached values
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.copy = copy
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a cached value
+        :param key: key of the value
+        :return: the value, or None if it isn't cached or has expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value if self.copy is None else self.copy(value)
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value if self.copy is None else self.copy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+read_cache = ResponseCache(ttl_seconds=settings.read_cache_ttl_seconds)
@@ -0,0 +1,111 @@
+import asyncio
+import datetime
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from beanie import PydanticObjectId
+from fastapi import HTTPException
+
+from models.job import JobModel, JobStatus
+
+# A job function receives a callback for reporting its progress, followed by its own arguments
+JobFunction = Callable[..., Awaitable[Any]]
+
+
+class JobQueue:
+    """
+    In-process queue of background jobs, that runs a bounded number of jobs at the same time.
+    Jobs and their results are kept in memory for a limited time after they are finished
+    """
+
+    def __init__(self, max_concurrent_jobs: int, retention_seconds: float):
+        """
+        :param max_concurrent_jobs: maximal number of jobs that run at the same time, the rest wait in queue
+        :param retention_seconds: how long a finished job can be queried before it's discarded
+        """
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.retention = datetime.timedelta(seconds=retention_seconds)
+
+        self._jobs: Dict[str, JobModel] = {}
+        self._results: Dict[str, Any] = {}
+        self._contexts: Dict[str, Any] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Created on first submit, so it's bound to the running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def submit(self, owner_id: PydanticObjectId, function: JobFunction, *args, context: Any = None,
+               **kwargs) -> JobModel:
+        """
+        Queue a job, must be called from a running event loop
+        :param owner_id: id of the user that submitted the job, only he can query it
+        :param function: coroutine function of the job, called with a progress callback and the given arguments.
+                         The callback receives the current stage of the job and/or details to add to the job
+        :param context: object that is shared by the job and requests about it (e.g. a stream of its intermediate
+                        results), kept as long as the job
+        :return: the queued job
+        """
+        self._discard_expired_jobs()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+
+        job = JobModel(id=uuid.uuid4().hex, owner_id=owner_id)
+        self._jobs[job.id] = job
+        if context is not None:
+            self._contexts[job.id] = context
+        self._tasks[job.id] = asyncio.ensure_future(self._run(job, function, *args, **kwargs))
+        return job
+
+    async def _run(self, job: JobModel, function: JobFunction, *args, **kwargs):
+        def report_progress(progress: Optional[str] = None, details: Optional[Dict[str, Any]] = None):
+            if progress is not None:
+                job.progress = progress
+            if details is not None:
+                job.details.update(details)
+
+        try:
+            async with self._semaphore:
+                job.status = JobStatus.RUNNING
+                self._results[job.id] = await function(report_progress, *args, **kwargs)
+                job.status = JobStatus.SUCCEEDED
+        except HTTPException as e:
+            job.status = JobStatus.FAILED
+            if isinstance(e.detail, dict):
+                # Structured errors, e.g. conflicting constraints of an infeasible solve, are kept in the details
+                job.error = str(e.detail.get("message", e.detail))
+                job.details.update(error_detail=e.detail)
+            else:
+                job.error = str(e.detail)
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = repr(e)
+        finally:
+            job.finished_at = datetime.datetime.utcnow()
+            self._tasks.pop(job.id, None)
+
+    def get(self, job_id: str, owner_id: PydanticObjectId) -> Optional[JobModel]:
+        """
+        Get a job by its id
+        :param job_id: id of the job
+        :param owner_id: id of the user that queries the job
+        :return: the job, or None if it doesn't exist or isn't owned by the user
+        """
+        self._discard_expired_jobs()
+        job = self._jobs.get(job_id)
+        if job is None or job.owner_id != owner_id:
+            return None
+        return job
+
+    def get_result(self, job_id: str) -> Any:
+        return self._results.get(job_id)
+
+    def get_context(self, job_id: str) -> Any:
+        return self._contexts.get(job_id)
+
+    def _discard_expired_jobs(self):
+        now = datetime.datetime.utcnow()
+        expired_job_ids = [job_id for job_id, job in self._jobs.items()
+                           if job.is_finished() and now - job.finished_at > self.retention]
+        for job_id in expired_job_ids:
+            del self._jobs[job_id]
+            self._results.pop(job_id, None)
+            self._contexts.pop(job_id, None)
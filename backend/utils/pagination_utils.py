@@ -0,0 +1,44 @@
+import base64
+import datetime
+from typing import Tuple
+
+from beanie import PydanticObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+CURSOR_SEPARATOR = "|"
+
+
+def encode_date_cursor(date: datetime.datetime, id_: PydanticObjectId) -> str:
+    """
+    Encode the position of a document in a (date, _id) ordering as an opaque cursor
+    :param date: date of the last document in the page
+    :param id_: id of the last document in the page
+    :return: cursor for the next page
+    """
+    raw_cursor = f"{date.isoformat()}{CURSOR_SEPARATOR}{id_}"
+    return base64.urlsafe_b64encode(raw_cursor.encode()).decode()
+
+
+def decode_date_cursor(cursor: str) -> Tuple[datetime.datetime, PydanticObjectId]:
+    """
+    Decode a cursor created by encode_date_cursor()
+    :param cursor: cursor of a page
+    :return: date and id of the last document in the previous page
+    """
+    try:
+        raw_date, raw_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(CURSOR_SEPARATOR)
+        return datetime.datetime.fromisoformat(raw_date), PydanticObjectId(raw_id)
+    except (ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_date_cursor_filter(cursor: str) -> dict:
+    """
+    Filter of documents that come after a cursor in a (date, _id) ordering
+    :param cursor: cursor of a page
+    :return: Mongo filter
+    """
+    date, id_ = decode_date_cursor(cursor)
+    return {"$or": [{"date": {"$gt": date}},
+                    {"date": date, "_id": {"$gt": id_}}]}
@@ -0,0 +1,106 @@
+import asyncio
+import contextlib
+import multiprocessing
+import multiprocessing.managers
+from typing import AsyncIterator, List, Optional
+
+from assignments_model.solution_stream import SolutionChannel, SolutionEvent
+
+# Shared by all streams, it owns the queues and events that solver processes use to reach the server
+_sync_manager: Optional[multiprocessing.managers.SyncManager] = None
+
+
+def get_sync_manager() -> multiprocessing.managers.SyncManager:
+    """
+    Get the multiprocessing manager of solution channels, starting it on first use.
+    It's spawned rather than forked, like the solver processes
+    :return: started manager
+    """
+    global _sync_manager
+    if _sync_manager is None:
+        _sync_manager = multiprocessing.get_context("spawn").Manager()
+    return _sync_manager
+
+
+class SolutionStream:
+    """
+    Server side of the solution channels of a job: collects improving solutions that its solves publish, lets any
+    number of requests follow them, and passes the client's accept or cancel back to the solves
+    """
+
+    def __init__(self):
+        manager = get_sync_manager()
+        self._queue = manager.Queue()
+        self._accepted = manager.Event()
+        self._cancelled = manager.Event()
+
+        self.events: List[SolutionEvent] = []
+        self.is_closed = False
+        self._changed = asyncio.Condition()
+
+    def create_channel(self, task_index: int = 0) -> SolutionChannel:
+        """
+        Create a channel for a single solve of the job
+        :param task_index: index of assignment problem, in a batch of problems that are solved together
+        :return: channel that can be passed to a solver process
+        """
+        return SolutionChannel(queue=self._queue, accepted=self._accepted, cancelled=self._cancelled,
+                               task_index=task_index)
+
+    def accept(self):
+        """
+        Ask the solves to stop and keep their best solution so far
+        """
+        self._accepted.set()
+
+    def cancel(self):
+        """
+        Ask the solves to stop and drop their solutions
+        """
+        self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @contextlib.asynccontextmanager
+    async def collect(self):
+        """
+        Collect published solutions while the wrapped solves run, and close the stream after them
+        """
+        collector = asyncio.ensure_future(self._collect())
+        try:
+            yield self
+        finally:
+            # The queue is closed in order, so solutions that were published before are still collected
+            self._queue.put(None)
+            await collector
+
+    async def _collect(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            # Reading blocks on the manager's connection, so it's done in a thread
+            event = await loop.run_in_executor(None, self._queue.get)
+            async with self._changed:
+                if event is None:
+                    self.is_closed = True
+                else:
+                    self.events.append(event)
+                self._changed.notify_all()
+            if event is None:
+                return
+
+    async def follow(self) -> AsyncIterator[SolutionEvent]:
+        """
+        Iterate over all solutions of the stream, from the first one, until it's closed
+        """
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: position < len(self.events) or self.is_closed)
+                events = self.events[position:]
+                is_closed = self.is_closed
+            for event in events:
+                yield event
+            position += len(events)
+            if is_closed:
+                return